@@ -1,42 +1,68 @@
-import time
+import os
+import json
 import logging
-from typing import Dict
-from groq import Groq
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Union
 from scraping import scrape_essential_info
-from config import Bing_api_key, groq_api_key
+from cache import response_cache, hash_key, LLM_TTL
+from metrics import metrics, timed
+from singleflight import flights
+from records import PageRecord
+from settings import defaults
+from context import build_context, estimate_tokens, CONTEXT_TOKEN_BUDGET
+from ratelimit import (Failure, call_with_retries, limiter_for, RETRY_ATTEMPTS, RETRY_BASE_DELAY,
+                       INVALID_INPUT, ERROR)
 
+if TYPE_CHECKING:
+    from groq import Groq
 
-# Configure logging for better debugging and tracking
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-def format_scraped_data(extracted_data: Dict) -> str:
+MODEL = "llama3-8b-8192"
+
+# Groq API base URL (override with GROQ_BASE_URL, e.g. to use the stub in stubs.py)
+GROQ_BASE_URL = os.environ.get("GROQ_BASE_URL") or None
+CONTEXT_WINDOW = 8192
+
+# Answers are a single email / phone number / address, so a small completion budget is enough
+ANSWER_MAX_TOKENS = int(os.environ.get("LLM_ANSWER_MAX_TOKENS", 256))
+
+# Upper bound on entities packed into one batched prompt; 1 disables batching (PIPELINE_LLM_BATCH_SIZE,
+# see settings.Config)
+LLM_BATCH_SIZE = defaults.llm_batch_size
+
+# Answer of the model when the content does not hold the requested data; never cached, so a
+# later run (e.g. after the page changed or the context grew) asks again
+NOT_FOUND = "notfound"
+
+# Completion tokens reserved per entity in a batch, and for the JSON envelope
+BATCH_ANSWER_TOKENS = 64
+BATCH_OVERHEAD_TOKENS = 128
+
+SYSTEM_PROMPT = "When asked for information, respond strictly with the factual data requested. Do not provide any extra context, elaboration, or explanation. The answer should be in the simplest form possible—just the specific data without additional commentary. If asked for an email address, respond only with the email itself, such as 'email@company.com'. If a phone number is requested, respond only with the phone number, like '123-456-7890'. The goal is to focus purely on the raw information without any accompanying text or clarifications."
+
+BATCH_SYSTEM_PROMPT = SYSTEM_PROMPT + " You will receive several numbered documents, each followed by its own question. Answer every question using only its own document. Respond with a JSON object of the form {\"answers\": [{\"id\": 1, \"answer\": \"...\"}]} containing exactly one entry per document, where id is the document number. If a document does not contain the answer, use \"notfound\" as the answer."
+
+
+@timed("format")
+def format_scraped_data(extracted_data: Union[PageRecord, Dict], query: Optional[str] = None, budget: int = CONTEXT_TOKEN_BUDGET) -> str:
     """
     Format the extracted structured data into a readable string for querying the LLM.
 
+    Candidates are deduplicated, ranked by relevance to the query and cut to a token budget
+    (see context.build_context) so prompts stay small and predictable.
+
     Args:
-        extracted_data (dict): The structured data extracted from the scrape_essential_info function.
+        extracted_data (PageRecord): The data extracted by scrape_essential_info (a dict is converted).
+        query (str): The question that will be asked, used to rank candidates (optional).
+        budget (int): Maximum estimated tokens of the formatted content.
 
     Returns:
         str: A formatted string representing the structured content.
     """
     try:
-        # Extract metadata and format it
-        metadata_section = f"Website URL: {extracted_data['metadata']['website_url']}\n" \
-                           f"Page Title: {extracted_data['metadata']['page_title']}\n" \
-                           f"Industry/Sector: {extracted_data['metadata']['industry_sector']}\n"
-
-        # Extract contact information and format it
-        contact_info_section = "Contact Information:\n"
-        contact_info_section += f"Emails: {', '.join(extracted_data['contact_information']['emails'])}\n"
-        contact_info_section += f"Phone Numbers: {', '.join(extracted_data['contact_information']['phone_numbers'])}\n"
-        contact_info_section += f"Addresses: {', '.join(extracted_data['contact_information']['addresses'])}\n"
-
-        # Extract and format social media links
-        social_media_section = "Social Media Links:\n" + "\n".join(extracted_data['social_media'])
-
-        # Combine all sections into one string
-        scraped_text = f"{metadata_section}\n{contact_info_section}\n{social_media_section}"
-        logging.info("Formatted scraped data for LLM query.")
+        scraped_text, report = build_context(extracted_data, query=query, budget=budget)
+        logging.info(f"Formatted scraped data for LLM query (~{report['tokens']} tokens, "
+                     f"{report['dropped']} candidates dropped).")
         return scraped_text
 
     except KeyError as e:
@@ -47,85 +73,319 @@ def format_scraped_data(extracted_data: Dict) -> str:
         raise RuntimeError("An error occurred while processing the data.")
 
 
-def query_llm_from_text(extracted_data: Dict, query: str, api_key: str, retries: int = 2, delay: int = 10) -> str:
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def make_client(api_key: str) -> "Groq":
+    """
+    Create a Groq client whose retries are left to the shared rate limiter (see ratelimit.py).
+    """
+    # The SDK is imported on first use, so starting the service or a CLI does not pay for it
+    from groq import Groq
+    return Groq(api_key=api_key, base_url=GROQ_BASE_URL, max_retries=0)
+
+
+def get_client(api_key: str) -> "Groq":
+    """
+    Return the shared Groq client of an API key, creating it on first use.
+
+    One client (and its connection pool) serves every call and thread, instead of a new
+    client per request. A changed GROQ_BASE_URL gets a client of its own.
+    """
+    key = (api_key, GROQ_BASE_URL)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = make_client(api_key)
+    return client
+
+
+def build_user_message(scraped_text: str, query: str) -> str:
+    """
+    Build the user message for a single entity.
+    """
+    return f"Content:\n\n\"\"\"\n{scraped_text}\n\"\"\"\n\nQuestion: {query}"
+
+
+def llm_cache_key(scraped_text: str, query: str) -> str:
+    """
+    Cache key of the answer to `query` over `scraped_text`, shared by the single and batched paths.
+    """
+    return hash_key(MODEL, SYSTEM_PROMPT, build_user_message(scraped_text, query))
+
+
+def cache_answer(cache_key: str, answer: str):
+    """
+    Store an LLM answer in the response cache, unless it is NOT_FOUND.
+    """
+    if answer.strip().lower() != NOT_FOUND:
+        response_cache.set("llm", cache_key, answer, ttl=LLM_TTL)
+
+
+def _chat_completion(client, messages: List[Dict], max_tokens: int, retries: int, delay: float,
+                     json_mode: bool = False) -> Union[str, Failure]:
+    """
+    Send a chat completion through the shared Groq rate limiter, retrying transient errors.
+
+    Returns:
+        str: The answer text, or a Failure once every attempt has failed.
+    """
+    extra = {"response_format": {"type": "json_object"}} if json_mode else {}
+    # Reserve the prompt plus the largest possible completion against the tokens-per-minute quota
+    reserved = sum(estimate_tokens(message["content"]) for message in messages) + max_tokens
+    limiter = limiter_for("groq")
+
+    def attempt() -> str:
+        logging.info("Querying LLM...")
+
+        # Send request to Groq API
+        response = client.chat.completions.create(
+            messages=messages,
+            model=MODEL,
+            max_tokens=max_tokens,
+            temperature=0,   # Set to 0 for factual responses
+            top_p=1,
+            frequency_penalty=0,
+            presence_penalty=0,
+            **extra
+        )
+
+        # Log the response for inspection
+        logging.debug(f"Response structure: {response}")
+
+        usage = getattr(response, 'usage', None)
+        limiter.settle(reserved, getattr(usage, 'total_tokens', None))
+        metrics.inc("llm_tokens_total", getattr(usage, 'prompt_tokens', None) or 0, kind="prompt")
+        metrics.inc("llm_tokens_total", getattr(usage, 'completion_tokens', None) or 0, kind="completion")
+
+        if hasattr(response, 'choices') and len(response.choices) > 0:
+            logging.info("LLM query successful.")
+            return response.choices[0].message.content.strip()
+        raise ValueError("No choices in response. Unable to retrieve answer.")
+
+    return call_with_retries("groq", attempt, tokens=reserved, attempts=retries, base_delay=delay)
+
+
+@timed("llm")
+def query_llm_from_text(extracted_data: Union[PageRecord, Dict], query: str, api_key: str, retries: int = RETRY_ATTEMPTS,
+                        delay: float = RETRY_BASE_DELAY, use_cache: bool = True) -> Union[str, Failure]:
     """
     Function to query the LLM with structured extracted data.
 
     Args:
-        extracted_data (dict): The structured data from scrape_essential_info function.
+        extracted_data (PageRecord): The data from scrape_essential_info (a dict is converted).
         query (str): The query for the LLM based on the extracted content.
         api_key (str): API key for accessing the LLM.
-        retries (int): Number of retries in case of failure (default is 3).
-        delay (int): Delay in seconds between retries (default is 10).
+        retries (int): Maximum number of attempts (default is RETRY_ATTEMPTS).
+        delay (float): Base of the exponential backoff between attempts, in seconds.
+        use_cache (bool): Reuse and store answers in the response cache (default is True).
 
     Returns:
-        str: The answer from the LLM based on the query.
+        str: The answer from the LLM based on the query, or a Failure describing why there is none.
     """
-    model = "llama3-8b-8192"
-    client = Groq(api_key=api_key)
+    client = get_client(api_key)
 
     try:
         # Format the extracted data into a readable string
-        scraped_text = format_scraped_data(extracted_data)
-        # scraped_text = extracted_data
+        scraped_text = format_scraped_data(extracted_data, query=query)
         
         logging.info(f"Data fromatted Succesfully....")
 
         # Prepare the message for the LLM
         messages = [
-            {"role": "system", "content": "When asked for information, respond strictly with the factual data requested. Do not provide any extra context, elaboration, or explanation. The answer should be in the simplest form possible—just the specific data without additional commentary. If asked for an email address, respond only with the email itself, such as 'email@company.com'. If a phone number is requested, respond only with the phone number, like '123-456-7890'. The goal is to focus purely on the raw information without any accompanying text or clarifications."},
-            {"role": "user", "content": f"Content:\n\n\"\"\"\n{scraped_text}\n\"\"\"\n\nQuestion: {query}"}
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": build_user_message(scraped_text, query)}
         ]
 
-        # Retry logic for querying the LLM
-        for attempt in range(retries):
-            try:
-                logging.info(f"Attempting to query LLM (Attempt {attempt + 1} of {retries})...")
-
-                # Send request to Groq API
-                response = client.chat.completions.create(
-                    messages=messages,
-                    model=model,
-                    max_tokens=8000,  # Adjust as needed based on expected response length
-                    temperature=0,   # Set to 0 for factual responses
-                    top_p=1,
-                    frequency_penalty=0,
-                    presence_penalty=0
-                )
-
-                # Log the response for inspection
-                logging.debug(f"Response structure: {response}")
-
-                # Assuming the response is an object, use a method or attribute to access the content
-                # Replace this line with the appropriate way to get the answer from the response object
-                if hasattr(response, 'choices') and len(response.choices) > 0:
-                    answer = response.choices[0].message.content.strip()  # Adjust based on actual response structure
-                    logging.info("LLM query successful.")
-                    return answer
-                else:
-                    raise ValueError("No choices in response. Unable to retrieve answer.")
-
-            except Exception as e:
-                logging.error(f"Error occurred during LLM query (Attempt {attempt + 1}): {e}")
-                if attempt < retries - 1:
-                    logging.info(f"Retrying in {delay} seconds...")
-                    time.sleep(delay)
-                else:
-                    logging.warning(f"Max retries reached. Unable to complete the query.")
-                    return "Rate limit exceeded or unable to complete the query. Please try again later."
+        # Identical model, prompt and content always give the same answer (temperature is 0)
+        cache_key = llm_cache_key(scraped_text, query)
+        if use_cache:
+            cached = response_cache.get("llm", cache_key)
+            if cached is not None:
+                logging.info("LLM cache hit.")
+                return cached["value"]
+
+        def complete() -> Union[str, Failure]:
+            answer = _chat_completion(client, messages, ANSWER_MAX_TOKENS, retries, delay)
+            if use_cache and not isinstance(answer, Failure):
+                cache_answer(cache_key, answer)
+            return answer
+
+        # Identical prompts sent at the same time (e.g. overlapping uploads) share one completion
+        return flights["llm"].do((api_key, cache_key, use_cache), complete)
 
     except ValueError as e:
         logging.error(f"Error during data processing: {e}")
-        return str(e)
+        return Failure("groq", INVALID_INPUT, str(e))
     except Exception as e:
         logging.error(f"Unexpected error during LLM query process: {e}")
-        return "An unexpected error occurred."
+        return Failure("groq", ERROR, f"An unexpected error occurred: {e}")
+
+
+def plan_batches(token_counts: List[int], max_batch_size: int = LLM_BATCH_SIZE,
+                 context_window: int = CONTEXT_WINDOW) -> List[List[int]]:
+    """
+    Group entities into batches that fit the model's context window.
+
+    Each batch holds at most `max_batch_size` entities, and its prompt plus the space reserved
+    for the answers must stay within `context_window` tokens. Entities are kept in order.
+
+    Args:
+        token_counts (list): Estimated prompt tokens of each entity's document and question.
+        max_batch_size (int): Upper bound on entities per request.
+        context_window (int): Context size of the model in tokens.
+
+    Returns:
+        list: Lists of positions into `token_counts`, one per batch.
+    """
+    budget = context_window - estimate_tokens(BATCH_SYSTEM_PROMPT) - BATCH_OVERHEAD_TOKENS
+    batches = []
+    current = []
+    used = 0
+    for position, tokens in enumerate(token_counts):
+        cost = tokens + BATCH_ANSWER_TOKENS
+        if current and (len(current) >= max_batch_size or used + cost > budget):
+            batches.append(current)
+            current = []
+            used = 0
+        current.append(position)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def parse_batch_answers(content: str, size: int) -> Dict[int, str]:
+    """
+    Parse and validate the JSON answer of a batched prompt.
+
+    Args:
+        content (str): The raw model output, expected to be {"answers": [{"id": 1, "answer": "..."}]}.
+        size (int): Number of documents in the batch (ids run from 1 to size).
+
+    Returns:
+        dict: Valid answers by document id; malformed or out-of-range entries are left out.
+    """
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        logging.warning("Batched LLM answer is not valid JSON.")
+        return {}
+
+    entries = data.get("answers") if isinstance(data, dict) else data
+    if not isinstance(entries, list):
+        return {}
+
+    answers = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        try:
+            document_id = int(entry.get("id"))
+        except (TypeError, ValueError):
+            continue
+        answer = entry.get("answer")
+        if 1 <= document_id <= size and isinstance(answer, str) and answer.strip():
+            answers[document_id] = answer.strip()
+    return answers
 
 
+@timed("llm")
+def _batch_completion(client, api_key: str, messages: List[Dict], size: int, retries: int,
+                      delay: float) -> Union[str, Failure]:
+    """
+    Send one batched prompt of `size` documents; identical batches in flight share the request.
+    """
+    key = (api_key, hash_key(MODEL, *(message["content"] for message in messages)))
+    return flights["llm"].do(key, _chat_completion, client, messages,
+                             BATCH_ANSWER_TOKENS * size + BATCH_OVERHEAD_TOKENS, retries, delay, json_mode=True)
 
 
+def query_llm_batch(items: List[Tuple[PageRecord, str]], api_key: str, retries: int = RETRY_ATTEMPTS,
+                    delay: float = RETRY_BASE_DELAY, use_cache: bool = True,
+                    max_batch_size: int = LLM_BATCH_SIZE) -> List[Union[str, Failure]]:
+    """
+    Answer several (extracted data, query) pairs with as few LLM requests as possible.
+
+    The formatted content of several entities is packed into one prompt asking for a JSON
+    answer per entity. Batch sizes adapt to the context window of the model. Entities whose
+    answer is missing or malformed in a parsed reply are retried with a single-entity call;
+    when the batched request itself fails, every entity of the batch gets that Failure.
+
+    Args:
+        items (list): (extracted_data, query) pairs.
+        api_key (str): API key for accessing the LLM.
+        retries (int): Maximum number of attempts per request (default is RETRY_ATTEMPTS).
+        delay (float): Base of the exponential backoff between attempts, in seconds.
+        use_cache (bool): Reuse and store answers in the response cache (default is True).
+        max_batch_size (int): Upper bound on entities per request.
+
+    Returns:
+        list: One answer (or Failure) per item, in the same order as `items`.
+    """
+    client = get_client(api_key)
+    answers = [None] * len(items)
+    pending = []
+
+    for position, (extracted_data, query) in enumerate(items):
+        try:
+            scraped_text = format_scraped_data(extracted_data, query=query)
+        except (ValueError, RuntimeError) as e:
+            answers[position] = Failure("groq", INVALID_INPUT, str(e))
+            continue
+        if use_cache:
+            cached = response_cache.get("llm", llm_cache_key(scraped_text, query))
+            if cached is not None:
+                answers[position] = cached["value"]
+                continue
+        pending.append((position, scraped_text, query))
+
+    token_counts = [estimate_tokens(text) + estimate_tokens(query) for _, text, query in pending]
+    for batch in plan_batches(token_counts, max_batch_size=max_batch_size):
+        members = [pending[index] for index in batch]
+        if len(members) == 1:
+            position, _, query = members[0]
+            answers[position] = query_llm_from_text(items[position][0], query, api_key, retries=retries,
+                                                    delay=delay, use_cache=use_cache)
+            continue
+
+        documents = "\n\n".join(
+            f"Document {number}:\n\"\"\"\n{text}\n\"\"\"\nQuestion {number}: {query}"
+            for number, (_, text, query) in enumerate(members, start=1)
+        )
+        messages = [
+            {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+            {"role": "user", "content": documents}
+        ]
+        logging.info(f"Querying LLM for {len(members)} entities in one request.")
+        content = _batch_completion(client, api_key, messages, len(members), retries, delay)
+        if isinstance(content, Failure):
+            # The request was already retried; splitting the batch would only repeat the failure N times
+            for position, _, _ in members:
+                answers[position] = content
+            continue
+        parsed = parse_batch_answers(content, len(members))
+
+        for number, (position, text, query) in enumerate(members, start=1):
+            if number in parsed:
+                answers[position] = parsed[number]
+                if use_cache:
+                    cache_answer(llm_cache_key(text, query), parsed[number])
+            else:
+                # Fall back to a single-entity request for missing or malformed answers
+                logging.warning(f"No valid batched answer for document {number}, querying it on its own.")
+                answers[position] = query_llm_from_text(items[position][0], query, api_key, retries=retries,
+                                                        delay=delay, use_cache=use_cache)
+    return answers
+
 
 if __name__ == "__main__":
+    from settings import configure_logging
+    configure_logging()
+
     # Example for testing the module functionality
     # test_data = {
     #     "metadata": {
@@ -149,7 +409,7 @@ if __name__ == "__main__":
     url = "https://www.ril.com/contact-us"
     test_data= scrape_essential_info(url=url)
     
-    api_key = groq_api_key
+    api_key = defaults.groq_api_key
     
     
     query = "what is email this company?"
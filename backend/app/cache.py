@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional
+from metrics import metrics
+from settings import defaults
+
+
+# Location and size bound of the on-disk cache (CACHE_PATH, CACHE_MAX_BYTES, CACHE_ENABLED; see settings.Config)
+CACHE_PATH = defaults.cache_path
+CACHE_MAX_BYTES = defaults.cache_max_bytes
+CACHE_ENABLED = defaults.cache_enabled
+
+# Time-to-live in seconds of each cache layer
+SEARCH_TTL = int(os.environ.get("CACHE_SEARCH_TTL", 7 * 24 * 3600))
+PAGE_TTL = int(os.environ.get("CACHE_PAGE_TTL", 24 * 3600))
+LLM_TTL = int(os.environ.get("CACHE_LLM_TTL", 30 * 24 * 3600))
+
+
+def open_database(path: str, *schema: str) -> sqlite3.Connection:
+    """
+    Open one of the on-disk SQLite stores (response cache, entity and site indexes, checkpoints).
+
+    The stores call this on first use rather than at import, so importing a module never
+    touches the disk. The connection is in autocommit mode (transactions are explicit), uses
+    the WAL journal and may be shared between threads behind the store's own lock.
+
+    Args:
+        path (str): Database file; its directory is created when missing.
+        *schema (str): Statements run on every open, e.g. CREATE TABLE IF NOT EXISTS.
+
+    Returns:
+        sqlite3.Connection: The open connection.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    for statement in schema:
+        conn.execute(statement)
+    return conn
+
+
+def hash_key(*parts: str) -> str:
+    """
+    Build a stable cache key from several strings.
+
+    Args:
+        *parts (str): The values identifying the cached item (e.g. model, prompt, content).
+
+    Returns:
+        str: Hex SHA-256 digest of the parts.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def _byte_length(encoded) -> int:
+    return len(encoded) if isinstance(encoded, bytes) else len(encoded.encode("utf-8"))
+
+
+class ResponseCache:
+    """
+    SQLite-backed key/value cache with per-entry TTLs and size-bounded LRU eviction.
+
+    Entries live in namespaces ("search", "page", "llm"). Expired entries are kept until
+    evicted so callers can revalidate them (e.g. with a conditional GET).
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES, enabled: bool = CACHE_ENABLED):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._conn = None
+        self.counters = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = open_database(
+                self.path,
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " namespace TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " meta TEXT,"
+                " size INTEGER NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))",
+                "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)",
+            )
+        return self._conn
+
+    def _count(self, namespace: str, counter: str):
+        stats = self.counters.setdefault(namespace, {"hits": 0, "misses": 0, "stale": 0, "writes": 0})
+        stats[counter] += 1
+        metrics.inc("cache_requests_total", layer=namespace, result=counter)
+
+    def get(self, namespace: str, key: str, allow_stale: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Look up an entry.
+
+        Args:
+            namespace (str): The cache layer.
+            key (str): The entry key.
+            allow_stale (bool): Also return expired entries (flagged with "stale": True).
+
+        Returns:
+            dict: {"value", "meta", "stale"} or None on a miss.
+        """
+        if not self.enabled:
+            return None
+        try:
+            with self._lock:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT value, meta, expires_at FROM entries WHERE namespace = ? AND key = ?",
+                    (namespace, key)).fetchone()
+                if row is None:
+                    self._count(namespace, "misses")
+                    return None
+                stale = row[2] < time.time()
+                if stale and not allow_stale:
+                    self._count(namespace, "misses")
+                    return None
+                conn.execute("UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                             (time.time(), namespace, key))
+                self._count(namespace, "stale" if stale else "hits")
+            # Binary values (raw page bodies) are stored as BLOBs, everything else as JSON
+            value = row[0] if isinstance(row[0], bytes) else json.loads(row[0])
+            return {"value": value, "meta": json.loads(row[1]) if row[1] else {}, "stale": stale}
+        except sqlite3.Error as e:
+            logging.error(f"Cache read failed for {namespace}:{key}: {e}")
+            return None
+
+    def set(self, namespace: str, key: str, value: Any, ttl: int, meta: Optional[Dict] = None):
+        """
+        Store an entry, evicting the least recently used entries if the cache is full.
+
+        Args:
+            namespace (str): The cache layer.
+            key (str): The entry key.
+            value: Any JSON-serializable value, or bytes stored as-is.
+            ttl (int): Seconds before the entry expires.
+            meta (dict): Optional JSON-serializable metadata (e.g. HTTP validators).
+        """
+        if not self.enabled:
+            return
+        encoded = value if isinstance(value, bytes) else json.dumps(value)
+        encoded_meta = json.dumps(meta) if meta else None
+        # Sizes are counted in stored (UTF-8) bytes, not characters
+        size = _byte_length(encoded) + _byte_length(encoded_meta or "")
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                # The write and the eviction share one transaction, so other processes using
+                # the same file (e.g. several server workers) see a cache within its bound
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO entries (namespace, key, value, meta, size, expires_at, accessed_at)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (namespace, key, encoded, encoded_meta, size, now + ttl, now))
+                    self._evict(conn)
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                self._count(namespace, "writes")
+        except sqlite3.Error as e:
+            logging.error(f"Cache write failed for {namespace}:{key}: {e}")
+
+    def touch(self, namespace: str, key: str, ttl: int, meta: Optional[Dict] = None):
+        """
+        Extend the lifetime of an entry (e.g. after a 304 Not Modified response).
+        """
+        if not self.enabled:
+            return
+        try:
+            with self._lock:
+                conn = self._connect()
+                now = time.time()
+                if meta is None:
+                    conn.execute("UPDATE entries SET expires_at = ?, accessed_at = ? WHERE namespace = ? AND key = ?",
+                                 (now + ttl, now, namespace, key))
+                else:
+                    conn.execute(
+                        "UPDATE entries SET expires_at = ?, accessed_at = ?, meta = ? WHERE namespace = ? AND key = ?",
+                        (now + ttl, now, json.dumps(meta), namespace, key))
+        except sqlite3.Error as e:
+            logging.error(f"Cache update failed for {namespace}:{key}: {e}")
+
+    def _evict(self, conn: sqlite3.Connection):
+        # Drop least recently used entries until the cache fits its size bound again. The total
+        # is read from the table rather than kept in memory, where it drifts across processes
+        total = self._size(conn)
+        while total > self.max_bytes:
+            rows = conn.execute(
+                "SELECT namespace, key, size FROM entries ORDER BY accessed_at LIMIT 64").fetchall()
+            if not rows:
+                break
+            for namespace, key, size in rows:
+                conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    @staticmethod
+    def _size(conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def stats(self) -> Dict:
+        """
+        Return hit/miss counters per layer and the current cache size (read from the database).
+        """
+        with self._lock:
+            try:
+                size = self._size(self._connect()) if self.enabled else 0
+            except sqlite3.Error as e:
+                logging.error(f"Cache size query failed: {e}")
+                size = 0
+            return {
+                "enabled": self.enabled,
+                "size_bytes": size,
+                "max_bytes": self.max_bytes,
+                "layers": {namespace: dict(stats) for namespace, stats in self.counters.items()},
+            }
+
+
+# Shared cache used by the search, scraping and LLM modules
+response_cache = ResponseCache()
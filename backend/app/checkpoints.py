@@ -0,0 +1,227 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import deque
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+from cache import hash_key, open_database
+from pipeline import iter_pipeline, DEFAULT_MAX_WORKERS, DEFAULT_LLM_BATCH_SIZE
+from records import EntityResult, dumps, loads
+from settings import env_flag
+
+
+# Location of the checkpoint database (override with CHECKPOINT_PATH); CHECKPOINT_ENABLED=0 disables it
+CHECKPOINT_PATH = os.environ.get("CHECKPOINT_PATH", os.path.join("checkpoints", "runs.sqlite3"))
+CHECKPOINT_ENABLED = env_flag("CHECKPOINT_ENABLED")
+
+# Entity states
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+
+def file_digest(path: str, block_size: int = 1024 * 1024) -> str:
+    """
+    SHA-256 of a file's bytes, read in blocks so large uploads are never loaded whole.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_run_id(file_hash: str, query: str, column: Optional[str] = None) -> str:
+    """
+    Identify a batch run by its input file, selected column and query.
+    """
+    return hash_key(file_hash, column or "", query)[:32]
+
+
+class CheckpointStore:
+    """
+    SQLite-backed record of batch runs and the state of every entity in them.
+
+    Each entity is stored as pending when it enters the pipeline and replaced by its
+    result (done or failed) as soon as it finishes, so a run interrupted at any point
+    can be resumed, and its partial results exported.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_PATH, enabled: bool = CHECKPOINT_ENABLED):
+        self.path = path
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = open_database(
+                self.path,
+                "CREATE TABLE IF NOT EXISTS runs ("
+                " run_id TEXT PRIMARY KEY,"
+                " query TEXT NOT NULL,"
+                " file_hash TEXT,"
+                " column_name TEXT,"
+                " created_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL)",
+                "CREATE TABLE IF NOT EXISTS entities ("
+                " run_id TEXT NOT NULL,"
+                " entity TEXT NOT NULL,"
+                " position INTEGER NOT NULL,"
+                " state TEXT NOT NULL,"
+                " result TEXT,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " updated_at REAL NOT NULL,"
+                " PRIMARY KEY (run_id, entity))",
+                "CREATE INDEX IF NOT EXISTS entities_position ON entities (run_id, position)",
+            )
+        return self._conn
+
+    def start_run(self, run_id: str, query: str, file_hash: Optional[str] = None,
+                  column: Optional[str] = None, restart: bool = False):
+        """
+        Register a run, or reuse the existing one with the same id.
+
+        Args:
+            restart (bool): Forget the results of a previous run with the same id.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            if restart:
+                conn.execute("DELETE FROM entities WHERE run_id = ?", (run_id,))
+                conn.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+            conn.execute(
+                "INSERT OR IGNORE INTO runs (run_id, query, file_hash, column_name, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)", (run_id, query, file_hash, column, now, now))
+
+    def lookup(self, run_id: str, entity: str) -> Optional[EntityResult]:
+        """
+        Return the stored result of a finished entity, or None if it still has to be processed.
+        """
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT result FROM entities WHERE run_id = ? AND entity = ? AND state = ?",
+                (run_id, entity, DONE)).fetchone()
+        return EntityResult.from_dict(loads(row[0])) if row else None
+
+    def mark_pending(self, run_id: str, entity: str, position: int):
+        """
+        Record that an entity has entered the pipeline.
+        """
+        now = time.time()
+        with self._lock:
+            self._connect().execute(
+                "INSERT INTO entities (run_id, entity, position, state, attempts, updated_at)"
+                " VALUES (?, ?, ?, ?, 1, ?)"
+                " ON CONFLICT (run_id, entity) DO UPDATE SET"
+                " position = excluded.position, state = excluded.state, attempts = attempts + 1,"
+                " updated_at = excluded.updated_at",
+                (run_id, entity, position, PENDING, now))
+
+    def save_result(self, run_id: str, entity: str, result: EntityResult):
+        """
+        Store the result of an entity; results with an error are kept as failed and retried on resume.
+        """
+        state = FAILED if result.error else DONE
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("UPDATE entities SET state = ?, result = ?, updated_at = ? WHERE run_id = ? AND entity = ?",
+                         (state, dumps(result), now, run_id, entity))
+            conn.execute("UPDATE runs SET updated_at = ? WHERE run_id = ?", (now, run_id))
+
+    def progress(self, run_id: str) -> Optional[Dict]:
+        """
+        Return the run's query and its number of pending, done and failed entities.
+        """
+        with self._lock:
+            conn = self._connect()
+            run = conn.execute("SELECT query, column_name, created_at, updated_at FROM runs WHERE run_id = ?",
+                               (run_id,)).fetchone()
+            if run is None:
+                return None
+            counts = dict(conn.execute("SELECT state, COUNT(*) FROM entities WHERE run_id = ? GROUP BY state",
+                                       (run_id,)).fetchall())
+        return {
+            "run_id": run_id,
+            "query": run[0],
+            "column": run[1],
+            "created_at": run[2],
+            "updated_at": run[3],
+            PENDING: counts.get(PENDING, 0),
+            DONE: counts.get(DONE, 0),
+            FAILED: counts.get(FAILED, 0),
+        }
+
+    def export(self, run_id: str, page_size: int = 1000) -> Iterator[EntityResult]:
+        """
+        Yield the finished and failed results of a run in input order, a page at a time.
+        """
+        last = -1
+        while True:
+            with self._lock:
+                rows = self._connect().execute(
+                    "SELECT position, result FROM entities WHERE run_id = ? AND position > ? AND result IS NOT NULL"
+                    " ORDER BY position LIMIT ?", (run_id, last, page_size)).fetchall()
+            if not rows:
+                return
+            for position, result in rows:
+                yield EntityResult.from_dict(loads(result))
+            last = rows[-1][0]
+
+
+def iter_resumable(entities: Iterable[str], query: str, run_id: str, store: Optional[CheckpointStore] = None,
+                   max_workers: int = DEFAULT_MAX_WORKERS, use_cache: bool = True,
+                   llm_batch_size: int = DEFAULT_LLM_BATCH_SIZE) -> Iterator[Tuple[int, EntityResult]]:
+    """
+    Like iter_pipeline, but checkpointing every result so an interrupted run can be resumed.
+
+    Entities already finished in an earlier attempt of the run are yielded from the store
+    without touching the network; pending and failed ones go through the pipeline again.
+
+    Args:
+        entities (Iterable[str]): The entities to process, in input order.
+        query (str): The user's question.
+        run_id (str): Identifier of the run (see make_run_id).
+        store (CheckpointStore): Where checkpoints are kept (the shared store by default).
+        max_workers (int): Maximum number of entities processed in parallel.
+        use_cache (bool): Use the response cache (default is True).
+        llm_batch_size (int): Entities answered per LLM request (1 disables batching).
+
+    Yields:
+        tuple: (input position, EntityResult) with finished entities first as they are read.
+    """
+    store = store or checkpoint_store
+    resumed = deque()  # (position, stored result) of entities skipped while feeding the pipeline
+    sent = []          # (input position, entity) of each entity sent to the pipeline
+
+    def todo() -> Iterator[str]:
+        for position, entity in enumerate(entities):
+            result = store.lookup(run_id, entity)
+            if result is not None:
+                resumed.append((position, result))
+                continue
+            store.mark_pending(run_id, entity, position)
+            sent.append((position, entity))
+            yield entity
+
+    skipped = 0
+    for index, result in iter_pipeline(todo(), query, max_workers=max_workers, use_cache=use_cache,
+                                       llm_batch_size=llm_batch_size):
+        position, entity = sent[index]
+        store.save_result(run_id, entity, result)
+        while resumed:
+            skipped += 1
+            yield resumed.popleft()
+        yield position, result
+    while resumed:
+        skipped += 1
+        yield resumed.popleft()
+    if skipped:
+        logging.info(f"Run {run_id}: reused {skipped} finished entities from the checkpoint.")
+
+
+checkpoint_store = CheckpointStore()
@@ -0,0 +1,210 @@
+import os
+import re
+from typing import Iterable, List, Optional
+
+
+# Country calling code used to turn national numbers into E.164 (e.g. "1", "91"); empty keeps them national
+DEFAULT_COUNTRY_CODE = os.environ.get("DEFAULT_COUNTRY_CODE", "")
+
+# All patterns are compiled once. They start with a literal or a character class so the
+# engine can skip ahead quickly, and every character run is length-capped, so no position
+# can cost more than a bounded amount of work however long the input is.
+
+# Characters allowed in the local part of an address (left of "@")
+EMAIL_LOCAL_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789._%+-")
+
+# label.label.tld right after the "@", labels capped at their RFC length
+EMAIL_DOMAIN_RE = re.compile(
+    r"(?:[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?\.){1,8}[A-Za-z]{2,24}(?![A-Za-z0-9-])"
+)
+
+# "name [at] domain [dot] com", "name (at) domain (dot) com", "name {at} domain"
+OBFUSCATED_RE = re.compile(r"[\[({<][ \t]{0,3}([Aa][Tt]|[Dd][Oo][Tt])[ \t]{0,3}[\])}>]")
+AT_ENTITIES = ('&#64;', '&#x40;', '&#X40;', '&commat;')
+
+# "+<digits>", or a short leading group (country/area code), a separator and the rest of
+# the number, or a hyphenated 7-digit local number ("555-1234"); unbroken digit runs
+# without "+" (ids, timestamps) never become candidates
+PHONE_RE = re.compile(
+    r"\+\d{7,15}"
+    r"|[+(\d]\d{0,4}\)?[\-. \u00a0]{1,3}\(?\d[\d\-. ()\u00a0]{3,20}\d"
+    r"|\d{3}-\d{4}"
+)
+PHONE_SEPARATOR_RE = re.compile(r"[\-. ()\u00a0]+")
+PHONE_SEPARATORS = frozenset("-. \u00a0")
+
+# Characters that, right before a candidate, mean it is part of a longer token (ids, decimals, words)
+PHONE_GLUED_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_+.-")
+
+# Shapes that look like phone numbers but are dates or IP addresses
+DATE_RE = re.compile(r"^(?:\d{4}[-./]\d{1,2}[-./]\d{1,2}|\d{1,2}[-./]\d{1,2}[-./]\d{2,4})$")
+DOTTED_RE = re.compile(r"^\d{1,3}(?:\.\d{1,3}){3,}$")
+TRUNK_PREFIX_RE = re.compile(r"\(0\)")
+
+# File extensions that show up as "TLDs" in asset names such as logo@2x.png
+ASSET_SUFFIXES = ('.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.css', '.js', '.ico', '.avif')
+
+
+def dedup(values: Iterable[str], key=None) -> List[str]:
+    """
+    Removes duplicates while keeping the first occurrence, so results are deterministic.
+
+    Args:
+        values (Iterable[str]): The values to deduplicate.
+        key (callable): Optional function giving the comparison key of a value.
+
+    Returns:
+        List[str]: The unique values in first-seen order.
+    """
+    seen = set()
+    unique = []
+    for value in values:
+        marker = key(value) if key else value
+        if marker not in seen:
+            seen.add(marker)
+            unique.append(value)
+    return unique
+
+
+def deobfuscate(text: str) -> str:
+    """
+    Undoes common email obfuscations: "&#64;" entities, "[at]" and "[dot]" spellings.
+
+    Args:
+        text (str): The text to clean.
+
+    Returns:
+        str: The text with obfuscated addresses written normally.
+    """
+    for entity in AT_ENTITIES:
+        if entity in text:
+            text = text.replace(entity, '@')
+    # Replace each bracketed "at"/"dot" together with the blanks around it
+    pieces = []
+    position = 0
+    for match in OBFUSCATED_RE.finditer(text):
+        pieces.append(text[position:match.start()].rstrip(' \t'))
+        pieces.append('@' if match.group(1).lower() == 'at' else '.')
+        position = match.end()
+        while position < len(text) and text[position] in ' \t':
+            position += 1
+    if not pieces:
+        return text
+    pieces.append(text[position:])
+    return ''.join(pieces)
+
+
+def normalize_email(local: str, domain: str) -> str:
+    # Domains are case-insensitive, local parts are kept as written
+    return f"{local.strip('.')}@{domain.lower()}"
+
+
+def find_emails(text: str) -> List[str]:
+    """
+    Extracts email addresses, including lightly obfuscated ones.
+
+    Only the neighbourhood of each "@" is examined, so the cost grows with the number of
+    "@" signs rather than with the length of the text.
+
+    Args:
+        text (str): The text (or raw HTML) to search.
+
+    Returns:
+        List[str]: Unique addresses in first-seen order.
+    """
+    text = deobfuscate(text)
+    emails = []
+    at = text.find('@')
+    while at != -1:
+        # Walk back over the local part; a run longer than 64 characters is not an address
+        start = at
+        limit = max(0, at - 65)
+        while start > limit and text[start - 1] in EMAIL_LOCAL_CHARS:
+            start -= 1
+        local = text[start:at].strip('.')
+        domain_match = EMAIL_DOMAIN_RE.match(text, at + 1)
+        if local and at - start <= 64 and domain_match:
+            domain = domain_match.group(0)
+            if not domain.lower().endswith(ASSET_SUFFIXES):
+                emails.append(normalize_email(local, domain))
+        at = text.find('@', at + 1)
+    return dedup(emails, key=str.lower)
+
+
+def normalize_phone(raw: str, default_country_code: str = DEFAULT_COUNTRY_CODE) -> Optional[str]:
+    """
+    Normalizes a phone number candidate to an E.164-style string.
+
+    Numbers written with "+" or a "00" international prefix become "+<digits>". National
+    numbers get `default_country_code` (dropping a leading trunk "0") when one is set and
+    are returned as bare digits otherwise.
+
+    Args:
+        raw (str): The matched candidate, e.g. "+44 (0)20 7946 0958".
+        default_country_code (str): Calling code for national numbers, e.g. "1".
+
+    Returns:
+        str: The normalized number, or None if the candidate is not a plausible phone number.
+    """
+    candidate = raw.strip()
+    if DATE_RE.match(candidate) or DOTTED_RE.match(candidate):
+        return None
+    if candidate.count('(') != candidate.count(')') or '+' in candidate[1:]:
+        return None
+
+    groups = [group for group in PHONE_SEPARATOR_RE.split(candidate.lstrip('+')) if group]
+    # An unbroken digit run without "+" is an id or a timestamp, not a written phone number
+    if len(groups) < 2 and not candidate.startswith('+'):
+        return None
+    # Subscriber numbers end in a group of at least three digits (rules out SKUs like 372808-58)
+    if len(groups) > 1 and len(groups[-1]) < 3:
+        return None
+    # Dots only separate groups in "555.123.4567" style numbers; otherwise they are decimals
+    if '.' in candidate:
+        if any(sep in candidate for sep in ' -\u00a0') or len(groups) < 3 or min(map(len, groups)) < 2:
+            return None
+
+    international = candidate.startswith('+')
+    if international:
+        candidate = TRUNK_PREFIX_RE.sub('', candidate)
+    digits = ''.join(ch for ch in candidate if ch.isdigit())
+    if not international and digits.startswith('00'):
+        international = True
+        digits = digits[2:]
+
+    # E.164 numbers have at most 15 digits, real subscriber numbers at least 7
+    if not 7 <= len(digits) <= 15 or len(set(digits)) == 1:
+        return None
+    if international:
+        return f"+{digits}"
+    if default_country_code:
+        return f"+{default_country_code}{digits.lstrip('0')}"
+    return digits
+
+
+def find_phone_numbers(text: str, default_country_code: str = DEFAULT_COUNTRY_CODE) -> List[str]:
+    """
+    Extracts and normalizes phone numbers.
+
+    Args:
+        text (str): The text (or raw HTML) to search.
+        default_country_code (str): Calling code applied to national numbers.
+
+    Returns:
+        List[str]: Unique normalized numbers in first-seen order.
+    """
+    numbers = []
+    length = len(text)
+    for match in PHONE_RE.finditer(text):
+        start, end = match.span()
+        # Skip candidates that are a slice of a longer token or digit sequence
+        if start and (text[start - 1] in PHONE_GLUED_CHARS or
+                      (start > 1 and text[start - 1] in PHONE_SEPARATORS and text[start - 2].isdigit())):
+            continue
+        if end < length and (text[end].isdigit() or
+                             (end + 1 < length and text[end] in PHONE_SEPARATORS and text[end + 1].isdigit())):
+            continue
+        number = normalize_phone(match.group(0), default_country_code)
+        if number:
+            numbers.append(number)
+    return dedup(numbers)
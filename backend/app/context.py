@@ -0,0 +1,199 @@
+import os
+import re
+from typing import Dict, List, Optional, Tuple, Union
+from resolver import classify_intent, STREET_CUES, POSTAL_CODE
+from records import PageRecord, as_page_record
+from extraction import ADDRESS_KEYWORDS, SOCIAL_PLATFORMS
+
+
+# Token budget of the formatted page content sent to the LLM (override with CONTEXT_TOKEN_BUDGET)
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", 1500))
+
+# Longest single candidate kept (address candidates can be whole page sections)
+MAX_CANDIDATE_TOKENS = int(os.environ.get("CONTEXT_MAX_CANDIDATE_TOKENS", 120))
+
+# Approximates a BPE tokenizer: digits in groups of three, words in pieces of up to six letters,
+# every other symbol on its own
+TOKEN_RE = re.compile(r"\d{1,3}|[^\W\d_]{1,6}|[^\w\s]|_")
+WORD_RE = re.compile(r"[a-z0-9]{3,}")
+
+GENERIC_MAILBOXES = ('info', 'contact', 'sales', 'enquiries', 'enquiry', 'hello', 'support', 'office')
+
+# Words of the query that say nothing about the entity
+STOP_WORDS = {'what', 'the', 'and', 'for', 'company', 'email', 'mail', 'phone', 'number', 'address',
+              'contact', 'this', 'that', 'with', 'from', 'about', 'where', 'which', 'who', 'how', 'its',
+              'their', 'get', 'find', 'give', 'tell', 'information', 'details', 'official'}
+
+# Budget priority of the fields for each query intent (the field asked for is filled first)
+FIELD_PRIORITY = {
+    "email": ['emails', 'phone_numbers', 'social_media', 'addresses'],
+    "phone": ['phone_numbers', 'emails', 'social_media', 'addresses'],
+    "address": ['addresses', 'phone_numbers', 'emails', 'social_media'],
+    "social": ['social_media', 'emails', 'phone_numbers', 'addresses'],
+    None: ['emails', 'phone_numbers', 'addresses', 'social_media'],
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the number of tokens of a text locally, without a tokenizer download.
+
+    Args:
+        text (str): The text to measure.
+
+    Returns:
+        int: The approximate token count.
+    """
+    return sum(1 for _ in TOKEN_RE.finditer(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cuts a text after `max_tokens` estimated tokens, marking the cut with an ellipsis.
+    """
+    for count, match in enumerate(TOKEN_RE.finditer(text), start=1):
+        if count > max_tokens:
+            return text[:match.start()].rstrip() + " ..."
+    return text
+
+
+def query_terms(query: str) -> set:
+    """
+    Returns the words of the query that can identify the entity (e.g. its name).
+    """
+    return {word for word in WORD_RE.findall(query.lower()) if word not in STOP_WORDS}
+
+
+def dedup_candidates(candidates: List[str]) -> List[str]:
+    """
+    Drops repeated candidates and candidates that merely wrap a shorter one.
+
+    Address candidates come from nested elements, so an outer div repeats the text of the
+    inner ones; only the innermost (most specific) text is kept.
+
+    Args:
+        candidates (List[str]): The raw candidates, in page order.
+
+    Returns:
+        List[str]: The remaining candidates, in page order.
+    """
+    normalized = []
+    seen = set()
+    for candidate in candidates:
+        key = " ".join(candidate.split()).lower().rstrip('/')
+        if key and key not in seen:
+            seen.add(key)
+            normalized.append((candidate.strip(), key))
+
+    # Check containment from the shortest candidate up
+    kept_keys = []
+    for _, key in sorted(normalized, key=lambda item: len(item[1])):
+        if not any(shorter in key for shorter in kept_keys):
+            kept_keys.append(key)
+    kept = set(kept_keys)
+    return [candidate for candidate, key in normalized if key in kept]
+
+
+def score_candidate(field: str, candidate: str, terms: set, query: str) -> float:
+    """
+    Scores how likely a candidate is to answer the query (higher is better).
+    """
+    lowered = candidate.lower()
+    score = sum(2.0 for term in terms if term in lowered)
+    if field == 'emails':
+        local = lowered.split('@')[0]
+        score += 1.0 if local in GENERIC_MAILBOXES else 0.0
+    elif field == 'phone_numbers':
+        score += 0.5 if candidate.startswith('+') else 0.0
+    elif field == 'addresses':
+        score += 2.0 if STREET_CUES.search(candidate) else 0.0
+        score += 2.0 if POSTAL_CODE.search(candidate) else 0.0
+        score += sum(0.5 for keyword in ADDRESS_KEYWORDS if keyword in lowered)
+        # Long blocks are usually navigation or page sections rather than an address
+        score -= len(candidate) / 400
+    elif field == 'social_media':
+        score += 3.0 if any(platform in lowered and platform in query.lower()
+                            for platform in SOCIAL_PLATFORMS) else 0.0
+    return score
+
+
+def rank_candidates(field: str, candidates: List[str], query: str) -> List[Tuple[int, str]]:
+    """
+    Deduplicates candidates and orders them by relevance to the query (stable for ties).
+
+    Returns:
+        list: (page position, candidate) pairs, best first.
+    """
+    terms = query_terms(query)
+    scored = [(score_candidate(field, candidate, terms, query), position, candidate)
+              for position, candidate in enumerate(dedup_candidates(candidates))]
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return [(position, candidate) for _, position, candidate in scored]
+
+
+def build_context(extracted_data: Union[PageRecord, Dict], query: Optional[str] = None,
+                  budget: int = CONTEXT_TOKEN_BUDGET) -> Tuple[str, Dict]:
+    """
+    Formats the extracted data for the LLM within a token budget.
+
+    Candidates of each field are deduplicated and ranked by relevance to the query; the
+    field the query asks for is filled first, then the others, until the budget is spent.
+
+    Args:
+        extracted_data (PageRecord): The data from scrape_essential_info (a dict is converted).
+        query (str): The user's question, used for ranking (optional).
+        budget (int): Maximum estimated tokens of the formatted text.
+
+    Returns:
+        tuple: (formatted text, report) where the report holds the estimated "tokens", the
+               "budget", and per field the number of candidates "kept" and "dropped".
+
+    Raises:
+        KeyError: If extracted_data is a dict without the page URL.
+    """
+    record = as_page_record(extracted_data)
+    fields = {
+        'emails': record.emails,
+        'phone_numbers': record.phone_numbers,
+        'addresses': record.addresses,
+        'social_media': record.social_media,
+    }
+
+    metadata_section = f"Website URL: {record.url}\n" \
+                       f"Page Title: {truncate_to_tokens(str(record.title), 40)}\n" \
+                       f"Industry/Sector: {truncate_to_tokens(str(record.industry_sector), 80)}\n"
+    template = f"{metadata_section}\nContact Information:\nEmails: \nPhone Numbers: \nAddresses: \n\nSocial Media Links:\n"
+    used = estimate_tokens(template)
+
+    selected = {field: [] for field in fields}
+    report = {"budget": budget, "fields": {}}
+    for field in FIELD_PRIORITY[classify_intent(query) if query else None]:
+        ranked = rank_candidates(field, fields[field], query or "")
+        for position, candidate in ranked:
+            if field == 'addresses':
+                candidate = truncate_to_tokens(candidate, MAX_CANDIDATE_TOKENS)
+            cost = estimate_tokens(candidate) + 1  # plus the separator
+            if used + cost > budget:
+                continue  # a shorter, lower ranked candidate may still fit
+            selected[field].append((position, candidate))
+            used += cost
+        report["fields"][field] = {
+            "total": len(fields[field]),
+            "unique": len(ranked),
+            "kept": len(selected[field]),
+            "dropped": len(fields[field]) - len(selected[field]),
+        }
+
+    # Keep the page order of the selected candidates so the layout stays familiar
+    selected = {field: [candidate for _, candidate in sorted(values)] for field, values in selected.items()}
+
+    contact_info_section = "Contact Information:\n"
+    contact_info_section += f"Emails: {', '.join(selected['emails'])}\n"
+    contact_info_section += f"Phone Numbers: {', '.join(selected['phone_numbers'])}\n"
+    contact_info_section += f"Addresses: {', '.join(selected['addresses'])}\n"
+    social_media_section = "Social Media Links:\n" + "\n".join(selected['social_media'])
+
+    text = f"{metadata_section}\n{contact_info_section}\n{social_media_section}"
+    report["tokens"] = estimate_tokens(text)
+    report["dropped"] = sum(stats["dropped"] for stats in report["fields"].values())
+    return text, report
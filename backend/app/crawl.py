@@ -0,0 +1,301 @@
+import os
+import re
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse, urldefrag
+from urllib.robotparser import RobotFileParser
+from fetch import fetcher, USER_AGENT
+from scraping import scrape_page
+from records import PageRecord, CONTACT_FIELDS
+from settings import env_flag
+
+
+# Follow likely contact pages of a search hit (CRAWL_ENABLED=0 scrapes the hit alone)
+CRAWL_ENABLED = env_flag("CRAWL_ENABLED")
+
+# Budget per site: pages fetched (the search hit included) and total bytes downloaded
+CRAWL_MAX_PAGES = int(os.environ.get("CRAWL_MAX_PAGES", 4))
+CRAWL_MAX_BYTES = int(os.environ.get("CRAWL_MAX_BYTES", 3 * 1024 * 1024))
+
+# Link depth followed from the search hit (1: only pages it links to, plus the sitemap)
+CRAWL_MAX_DEPTH = int(os.environ.get("CRAWL_MAX_DEPTH", 1))
+
+# Pages crawled at once across all sites (override with CRAWL_POOL_SIZE)
+CRAWL_POOL_SIZE = int(os.environ.get("CRAWL_POOL_SIZE", 16))
+
+# robots.txt files are kept this long, and sitemaps are read up to this size
+ROBOTS_TTL = int(os.environ.get("CRAWL_ROBOTS_TTL", 3600))
+SITEMAP_MAX_BYTES = int(os.environ.get("CRAWL_SITEMAP_MAX_BYTES", 1024 * 1024))
+
+# Paths and anchor texts of pages that usually hold contact details, strongest first
+CONTACT_CUES = re.compile(r"contact|kontakt|contacto|contatti|reach[\s_-]?us|get[\s_-]?in[\s_-]?touch|impressum|"
+                          r"imprint|legal[\s_-]?notice|mentions[\s_-]?legales", re.IGNORECASE)
+ABOUT_CUES = re.compile(r"about|ueber[\s_-]?uns|who[\s_-]?we[\s_-]?are|company|locations?|offices?|"
+                        r"head[\s_-]?quarters|support", re.IGNORECASE)
+
+# Links that are never pages worth scraping
+SKIPPED_EXTENSIONS = ('.pdf', '.jpg', '.jpeg', '.png', '.gif', '.svg', '.webp', '.zip', '.doc', '.docx',
+                      '.xls', '.xlsx', '.ppt', '.pptx', '.mp4', '.mp3', '.css', '.js', '.xml', '.ico')
+
+SITEMAP_LOC_RE = re.compile(r"<loc>\s*([^<\s]+)\s*</loc>", re.IGNORECASE)
+
+_pool = ThreadPoolExecutor(max_workers=CRAWL_POOL_SIZE, thread_name_prefix="crawl")
+
+
+def site_of(url: str) -> str:
+    """
+    The site a URL belongs to: its host without a leading "www.".
+    """
+    host = urlparse(url).netloc.lower().split(':')[0]
+    return host[4:] if host.startswith('www.') else host
+
+
+def link_score(url: str, text: str = "") -> float:
+    """
+    How likely a same-site link is to lead to contact details (0 for no cue at all).
+    """
+    path = urlparse(url).path
+    score = 0.0
+    if CONTACT_CUES.search(path) or CONTACT_CUES.search(text):
+        score += 3.0
+    elif ABOUT_CUES.search(path) or ABOUT_CUES.search(text):
+        score += 1.5
+    if score:
+        # Prefer short, top-level paths such as /contact over deep article URLs
+        score -= 0.2 * path.strip('/').count('/')
+    return score
+
+
+def normalize_link(base: str, href: str) -> Optional[str]:
+    """
+    Resolve a link against its page and drop fragments; None for non-HTTP or non-page links.
+    """
+    href = (href or "").strip()
+    if not href or href.startswith(('mailto:', 'tel:', 'javascript:', 'data:')):
+        return None
+    url = urldefrag(urljoin(base, href))[0]
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or parsed.path.lower().endswith(SKIPPED_EXTENSIONS):
+        return None
+    return url
+
+
+class RobotsCache:
+    """
+    Per-site robots.txt rules, fetched through the shared fetcher and kept for ROBOTS_TTL seconds.
+
+    Sites whose robots.txt is missing or unreadable are treated as allowing everything.
+    """
+
+    def __init__(self, ttl: int = ROBOTS_TTL, user_agent: str = USER_AGENT):
+        self.ttl = ttl
+        self.user_agent = user_agent
+        self._rules = {}
+        self._lock = threading.Lock()
+
+    def rules(self, url: str) -> Optional[RobotFileParser]:
+        parsed = urlparse(url)
+        root = f"{parsed.scheme}://{parsed.netloc}"
+        with self._lock:
+            cached = self._rules.get(root)
+        if cached is not None and time.time() - cached[0] < self.ttl:
+            return cached[1]
+
+        parser = None
+        try:
+            response = fetcher.get(root + "/robots.txt", max_bytes=512 * 1024)
+            if response.status_code == 200:
+                parser = RobotFileParser(root + "/robots.txt")
+                parser.parse(response.text.splitlines())
+            elif response.status_code in (401, 403):
+                # Same convention as urllib.robotparser: an access-controlled robots.txt disallows all
+                parser = RobotFileParser(root + "/robots.txt")
+                parser.disallow_all = True
+        except Exception as e:
+            logging.info(f"No robots.txt for {root}: {e}")
+        with self._lock:
+            self._rules[root] = (time.time(), parser)
+        return parser
+
+    def allowed(self, url: str) -> bool:
+        parser = self.rules(url)
+        return parser is None or parser.can_fetch(self.user_agent, url)
+
+    def sitemaps(self, url: str) -> List[str]:
+        parser = self.rules(url)
+        return list(parser.site_maps() or []) if parser is not None else []
+
+
+robots = RobotsCache()
+
+
+class CrawlBudget:
+    """
+    Pages and bytes a crawl of one site may still spend, shared by its concurrent fetches.
+    """
+
+    def __init__(self, max_pages: int = CRAWL_MAX_PAGES, max_bytes: int = CRAWL_MAX_BYTES):
+        self.pages = max_pages
+        self.bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def take_page(self) -> Optional[int]:
+        """
+        Reserve one page; returns the bytes it may use, or None once the budget is spent.
+        """
+        with self._lock:
+            if self.pages <= 0 or self.bytes <= 0:
+                return None
+            self.pages -= 1
+            return self.bytes
+
+    def spend(self, size: int):
+        with self._lock:
+            self.bytes -= size
+
+
+def sitemap_links(url: str, budget: CrawlBudget, cancel: Optional[threading.Event] = None) -> List[str]:
+    """
+    Same-site page URLs listed in the site's sitemaps (robots.txt entries or /sitemap.xml).
+
+    Sitemap indexes are followed one level deep. Sitemap bytes count against the budget,
+    and no further sitemap is read once `cancel` is set.
+    """
+    parsed = urlparse(url)
+    queue = robots.sitemaps(url) or [f"{parsed.scheme}://{parsed.netloc}/sitemap.xml"]
+    site = site_of(url)
+    pages = []
+    seen = set()
+    while queue and len(seen) < 4:
+        if cancel is not None and cancel.is_set():
+            break
+        sitemap = queue.pop(0)
+        if sitemap in seen or site_of(sitemap) != site:
+            continue
+        seen.add(sitemap)
+        try:
+            response = fetcher.get(sitemap, max_bytes=min(SITEMAP_MAX_BYTES, max(1, budget.bytes)))
+        except Exception as e:
+            logging.info(f"Could not read sitemap {sitemap}: {e}")
+            continue
+        if response.status_code != 200:
+            continue
+        budget.spend(len(response.content))
+        text = response.text
+        locations = SITEMAP_LOC_RE.findall(text)
+        if "<sitemapindex" in text[:2048].lower():
+            # Child sitemaps about pages or contacts come first
+            queue.extend(sorted(locations, key=lambda loc: -link_score(loc)))
+        else:
+            pages.extend(loc for loc in locations if site_of(loc) == site)
+    return pages
+
+
+def merge_records(records: List[Tuple[str, PageRecord]]) -> PageRecord:
+    """
+    Merge the extracted data of several pages of one site into a single record.
+
+    The first record provides the metadata; contact fields and social links are
+    concatenated without duplicates, in page order. `pages` lists the URLs the record
+    was built from.
+    """
+    first_url, first = records[0]
+    merged = PageRecord(url=first.url, title=first.title, industry_sector=first.industry_sector,
+                        pages=[url for url, _ in records])
+    for name in CONTACT_FIELDS + ('social_media',):
+        values = getattr(merged, name)
+        seen = set()
+        for _, record in records:
+            for value in getattr(record, name):
+                if value not in seen:
+                    seen.add(value)
+                    values.append(value)
+    return merged
+
+
+def crawl_site(url: str, use_cache: bool = True, is_enough: Optional[Callable[[PageRecord], bool]] = None,
+               max_pages: int = CRAWL_MAX_PAGES, max_bytes: int = CRAWL_MAX_BYTES,
+               max_depth: int = CRAWL_MAX_DEPTH, cancel: Optional[threading.Event] = None) -> Optional[PageRecord]:
+    """
+    Scrape a search hit and the likely contact pages of its site, merged into one record.
+
+    Contact and about pages are discovered from the hit's links and the site's sitemap,
+    ranked by URL and anchor text cues, and fetched concurrently (each wave one level
+    deeper) until the page or byte budget is spent. robots.txt is honored for every page
+    but the search hit itself. Setting `cancel` stops the crawl between pages, keeping
+    what was scraped so far.
+
+    Args:
+        url (str): The search hit.
+        use_cache (bool): Use the response cache for page fetches (default is True).
+        is_enough (callable): Stops the crawl once it returns True for the merged record.
+        max_pages (int): Pages fetched per site, the search hit included.
+        max_bytes (int): Bytes downloaded per site.
+        max_depth (int): Link depth followed from the search hit.
+        cancel (threading.Event): Set by the caller when the crawl's result is no longer needed.
+
+    Returns:
+        PageRecord: The merged record, or None if the hit failed.
+    """
+    def cancelled() -> bool:
+        return cancel is not None and cancel.is_set()
+
+    budget = CrawlBudget(max_pages, max_bytes)
+    allowance = budget.take_page()
+    landing = scrape_page(url, use_cache=use_cache, max_bytes=allowance)
+    if landing is None:
+        return None
+    record, links, size = landing
+    budget.spend(size)
+    records = [(url, record)]
+    if not CRAWL_ENABLED or max_pages <= 1 or cancelled() or (is_enough and is_enough(record)):
+        return merge_records(records)
+
+    site = site_of(url)
+    visited = {url}
+    # (page the link was found on, href, anchor text): relative links resolve against their own page
+    frontier = [(url, href, text) for href, text in links]
+    for depth in range(max(1, max_depth)):
+        candidates = {}
+        for base, href, text in frontier:
+            link = normalize_link(base, href)
+            if link and link not in visited and site_of(link) == site:
+                candidates[link] = max(candidates.get(link, 0.0), link_score(link, text))
+        if depth == 0:
+            for link in sitemap_links(url, budget, cancel):
+                if link not in visited:
+                    candidates[link] = max(candidates.get(link, 0.0), link_score(link))
+
+        if cancelled():
+            break
+        ranked = [link for link, score in sorted(candidates.items(), key=lambda item: -item[1]) if score > 0]
+        ranked = [link for link in ranked if robots.allowed(link)][:max(0, budget.pages)]
+        if not ranked or cancelled():
+            break
+        visited.update(ranked)
+
+        def fetch(link: str):
+            if cancelled():
+                return None
+            allowance = budget.take_page()
+            if allowance is None:
+                return None
+            page = scrape_page(link, use_cache=use_cache, max_bytes=allowance)
+            if page is not None:
+                budget.spend(page[2])
+            return page
+
+        frontier = []
+        for link, page in zip(ranked, _pool.map(fetch, ranked)):
+            if page is None:
+                continue
+            records.append((link, page[0]))
+            frontier.extend((link, href, text) for href, text in page[1])
+
+        if cancelled() or (is_enough and is_enough(merge_records(records))):
+            break
+    logging.info(f"Crawled {len(records)} page(s) of {site}.")
+    return merge_records(records)
@@ -0,0 +1,197 @@
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+import unicodedata
+from typing import Dict, Optional
+from cache import hash_key, open_database
+from resolver import classify_intent
+from context import query_terms
+from records import PageRecord, dumps, loads
+from settings import env_flag
+
+
+# Location of the entity index (override with ENTITY_INDEX_PATH); ENTITY_INDEX_ENABLED=0 disables it
+ENTITY_INDEX_PATH = os.environ.get("ENTITY_INDEX_PATH", os.path.join("index", "entities.sqlite3"))
+ENTITY_INDEX_ENABLED = env_flag("ENTITY_INDEX_ENABLED")
+
+# How long a resolved page (URL and extracted record) and an answer are reused, in seconds
+ENTITY_RECORD_TTL = int(os.environ.get("ENTITY_RECORD_TTL", 7 * 24 * 3600))
+ENTITY_ANSWER_TTL = int(os.environ.get("ENTITY_ANSWER_TTL", 30 * 24 * 3600))
+
+# Legal forms dropped from the end of a name ("Reliance Industries Ltd." -> "reliance industries")
+LEGAL_SUFFIXES = {'ltd', 'limited', 'inc', 'incorporated', 'corp', 'corporation', 'co', 'company', 'llc', 'llp',
+                  'lp', 'plc', 'pvt', 'private', 'pte', 'pty', 'gmbh', 'ag', 'kg', 'se', 'sa', 'sas', 'sarl',
+                  'srl', 'spa', 'bv', 'nv', 'oy', 'ab', 'as', 'kk', 'bhd', 'sdn', 'tbk', 'sl'}
+LEADING_ARTICLES = {'the'}
+
+# Words that only name the field asked for (the intent), not which value of it
+INTENT_WORDS = {'emails', 'mails', 'ids', 'phones', 'telephone', 'telephones', 'tel', 'mobile', 'mobiles',
+                'numbers', 'call', 'social', 'media', 'profile', 'addresses', 'located', 'location', 'locations',
+                'headquarter', 'headquarters', 'headquartered', 'head', 'office', 'offices', 'are', 'you', 'can',
+                'please', 'main', 'primary', 'general'}
+
+# Dotted abbreviations ("S.A.", "N.V.", "Co.") are joined before punctuation is stripped
+ABBREVIATION_RE = re.compile(r"\b(?:[a-z]\.){2,}")
+NON_WORD_RE = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_entity(name: str) -> str:
+    """
+    Index key of an entity name: case, accents, punctuation and legal suffixes are ignored.
+
+    "Reliance Industries Ltd.", "RELIANCE INDUSTRIES LIMITED" and "reliance industries"
+    all map to "reliance industries". A name made only of legal words keeps them.
+    """
+    text = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode("ascii").lower()
+    text = text.replace("&", " and ")
+    text = ABBREVIATION_RE.sub(lambda match: match.group(0).replace(".", ""), text)
+    words = [word for word in NON_WORD_RE.split(text) if word]
+    stripped = list(words)
+    while len(stripped) > 1 and stripped[-1] in LEGAL_SUFFIXES:
+        stripped.pop()
+    while len(stripped) > 1 and stripped[0] in LEADING_ARTICLES:
+        stripped.pop(0)
+    return " ".join(stripped or words)
+
+
+def intent_key(query: str) -> str:
+    """
+    Key of the answers a query shares: its field intent ("email", "phone", ...) plus the words
+    qualifying it, so "What is the email of company" and "company email address" share an
+    answer but "email of the CEO" ("email:ceo") does not. Queries without an intent are keyed
+    by the query itself.
+    """
+    intent = classify_intent(query)
+    if intent is not None:
+        qualifiers = sorted(set(query_terms(query)) - INTENT_WORDS)
+        return ":".join([intent] + qualifiers)
+    return "query:" + hash_key(" ".join(query.lower().split()))[:16]
+
+
+class EntityIndex:
+    """
+    SQLite-backed index of everything learned about an entity, shared across uploads.
+
+    Entities are keyed by normalize_entity, so different spellings of one company share
+    their entry. Each entry keeps the last resolved URL and extracted record (reused to
+    skip search and scraping) and the answer to each query intent (reused to skip the
+    whole pipeline), with the time each was stored.
+    """
+
+    def __init__(self, path: str = ENTITY_INDEX_PATH, enabled: bool = ENTITY_INDEX_ENABLED,
+                 record_ttl: int = ENTITY_RECORD_TTL, answer_ttl: int = ENTITY_ANSWER_TTL):
+        self.path = path
+        self.enabled = enabled
+        self.record_ttl = record_ttl
+        self.answer_ttl = answer_ttl
+        self._lock = threading.Lock()
+        self._conn = None
+        self.counters = {"answer_hits": 0, "record_hits": 0, "misses": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = open_database(
+                self.path,
+                "CREATE TABLE IF NOT EXISTS entities ("
+                " key TEXT PRIMARY KEY,"
+                " name TEXT NOT NULL,"
+                " url TEXT,"
+                " record TEXT,"
+                " record_at REAL)",
+                "CREATE TABLE IF NOT EXISTS answers ("
+                " key TEXT NOT NULL,"
+                " intent TEXT NOT NULL,"
+                " answer TEXT NOT NULL,"
+                " source TEXT,"
+                " url TEXT,"
+                " answered_at REAL NOT NULL,"
+                " PRIMARY KEY (key, intent))",
+            )
+        return self._conn
+
+    def lookup(self, entity: str, query: str) -> Dict:
+        """
+        Find what is known about an entity for a query.
+
+        Returns:
+            dict: "answer" ({"answer", "source", "url", "answered_at"}) if a fresh answer to the
+                  query's intent is stored, else "record" ({"url", "record", "record_at"}, the record a
+                  PageRecord) if a fresh extracted record is stored; empty if neither is.
+        """
+        if not self.enabled:
+            return {}
+        key = normalize_entity(entity)
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                row = conn.execute("SELECT answer, source, url, answered_at FROM answers WHERE key = ? AND intent = ?",
+                                   (key, intent_key(query))).fetchone()
+                if row is not None and now - row[3] < self.answer_ttl:
+                    self.counters["answer_hits"] += 1
+                    return {"answer": {"answer": row[0], "source": row[1], "url": row[2], "answered_at": row[3]}}
+                row = conn.execute("SELECT url, record, record_at FROM entities WHERE key = ? AND record IS NOT NULL",
+                                   (key,)).fetchone()
+                if row is not None and now - row[2] < self.record_ttl:
+                    self.counters["record_hits"] += 1
+                    return {"record": {"url": row[0], "record": PageRecord.from_dict(loads(row[1])), "record_at": row[2]}}
+                self.counters["misses"] += 1
+        except sqlite3.Error as e:
+            logging.error(f"Entity index read failed for {entity}: {e}")
+        return {}
+
+    def save_record(self, entity: str, url: Optional[str], record: PageRecord):
+        """
+        Store the page an entity was resolved to and the data extracted from it.
+        """
+        if not self.enabled:
+            return
+        try:
+            with self._lock:
+                self._connect().execute(
+                    "INSERT INTO entities (key, name, url, record, record_at) VALUES (?, ?, ?, ?, ?)"
+                    " ON CONFLICT (key) DO UPDATE SET name = excluded.name, url = excluded.url,"
+                    " record = excluded.record, record_at = excluded.record_at",
+                    (normalize_entity(entity), entity, url, dumps(record), time.time()))
+        except sqlite3.Error as e:
+            logging.error(f"Entity index write failed for {entity}: {e}")
+
+    def save_answer(self, entity: str, query: str, answer: str, source: str, url: Optional[str] = None):
+        """
+        Store the answer to a query's intent for an entity.
+        """
+        if not self.enabled:
+            return
+        key = normalize_entity(entity)
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute("INSERT OR IGNORE INTO entities (key, name) VALUES (?, ?)", (key, entity))
+                conn.execute(
+                    "INSERT OR REPLACE INTO answers (key, intent, answer, source, url, answered_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)", (key, intent_key(query), answer, source, url, time.time()))
+        except sqlite3.Error as e:
+            logging.error(f"Entity index write failed for {entity}: {e}")
+
+    def stats(self) -> Dict:
+        """
+        Return the lookup counters and the number of indexed entities and answers.
+        """
+        stats = {"enabled": self.enabled, **self.counters}
+        if not self.enabled:
+            return stats
+        try:
+            with self._lock:
+                conn = self._connect()
+                stats["entities"] = conn.execute("SELECT COUNT(*) FROM entities").fetchone()[0]
+                stats["answers"] = conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        except sqlite3.Error as e:
+            logging.error(f"Entity index read failed: {e}")
+        return stats
+
+
+# Shared index used by the pipeline
+entity_index = EntityIndex()
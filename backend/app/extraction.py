@@ -0,0 +1,327 @@
+import os
+import json
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from urllib.parse import unquote
+from contacts import dedup, find_emails, find_phone_numbers
+from records import PageRecord
+from settings import env_flag
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+
+
+# Keywords marking a div/p as an address candidate
+ADDRESS_KEYWORDS = ['address', 'location', 'headquarters', 'office', 'contact']
+
+# Substrings marking a link as a social media profile
+SOCIAL_PLATFORMS = ['facebook', 'twitter', 'linkedin', 'instagram']
+
+# Parser backend: "html.parser" (default), "lxml", "html5lib" or "auto" (lxml when installed).
+# lxml is several times faster but repairs malformed markup differently from html.parser,
+# so results on broken pages can differ from the default backend.
+HTML_PARSER = os.environ.get("HTML_PARSER", "html.parser")
+
+# Strip boilerplate before extraction (see walk_document); PAGE_REDUCTION_ENABLED=0 scans the raw page
+PAGE_REDUCTION_ENABLED = env_flag("PAGE_REDUCTION_ENABLED")
+
+# Elements whose content is never visible text (the JSON-LD scripts are read, not walked)
+SKIPPED_TAGS = frozenset(['script', 'style', 'noscript', 'template', 'svg', 'iframe', 'canvas', 'object'])
+
+# Elements whose text is navigation, not page content (their links are still collected)
+NOISE_TAGS = frozenset(['nav'])
+
+# Elements, and id/class words, marking a footer, contact or address block
+CONTACT_TAGS = frozenset(['footer', 'address'])
+CONTACT_MARKERS = ('contact', 'address', 'footer', 'impressum', 'location')
+
+# schema.org types whose email, telephone and address describe the entity
+JSON_LD_TYPES = frozenset(['Organization', 'Corporation', 'LocalBusiness', 'ProfessionalService', 'Store',
+                           'NGO', 'GovernmentOrganization', 'EducationalOrganization', 'ContactPoint'])
+POSTAL_ADDRESS_KEYS = ('streetAddress', 'addressLocality', 'addressRegion', 'postalCode', 'addressCountry')
+
+# Zones of the document text
+BODY, NOISE, CONTACT = 0, 1, 2
+
+
+def _resolve_parser(name: str) -> str:
+    if name != "auto":
+        return name
+    try:
+        import lxml  # noqa: F401
+        return "lxml"
+    except ImportError:
+        return "html.parser"
+
+
+def parse_html(html: str, parser: str = None) -> "BeautifulSoup":
+    """
+    Parses a page with the configured parser backend.
+
+    Args:
+        html (str): The page HTML.
+        parser (str): Parser backend, defaults to HTML_PARSER.
+
+    Returns:
+        BeautifulSoup: The parsed document.
+    """
+    # bs4 is imported on first use, so starting the service or a CLI does not pay for it
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(html, _resolve_parser(parser or HTML_PARSER))
+
+
+def parse_json_ld(text: str) -> Dict:
+    """
+    Reads the organization contact data of a schema.org JSON-LD block.
+
+    Only Organization-like nodes (and the ContactPoint / PostalAddress nodes inside them)
+    are used, so people, products or articles described on the page are ignored.
+
+    Args:
+        text (str): The content of a <script type="application/ld+json"> element.
+
+    Returns:
+        dict: 'emails', 'phone_numbers' and 'addresses' (PostalAddress parts joined by commas).
+    """
+    found = {'emails': [], 'phone_numbers': [], 'addresses': []}
+    try:
+        data = json.loads(text, strict=False)
+    except ValueError:
+        return found
+
+    def visit(node, inside: bool):
+        if isinstance(node, list):
+            for item in node:
+                visit(item, inside)
+            return
+        if not isinstance(node, dict):
+            return
+        types = node.get('@type')
+        types = set(types) if isinstance(types, list) else {types}
+        inside = inside or bool(types & JSON_LD_TYPES)
+        if inside:
+            for email in _as_list(node.get('email')):
+                found['emails'].append(str(email).removeprefix('mailto:'))
+            for phone in _as_list(node.get('telephone')):
+                found['phone_numbers'].append(str(phone).removeprefix('tel:'))
+            if 'PostalAddress' in types:
+                parts = [node.get(key) for key in POSTAL_ADDRESS_KEYS]
+                address = ", ".join(str(part).strip() for part in parts if isinstance(part, (str, int)) and str(part).strip())
+                if address:
+                    found['addresses'].append(address)
+            elif isinstance(node.get('address'), str):
+                found['addresses'].append(node['address'])
+        for key, value in node.items():
+            if isinstance(value, (dict, list)):
+                visit(value, inside)
+
+    visit(data, False)
+    return found
+
+
+def _as_list(value) -> List:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def walk_document(soup: "BeautifulSoup", reduce: bool = False) -> Dict:
+    """
+    Collects address candidates, social links, the title and meta tags in one traversal.
+
+    The result matches what separate find_all/get_text passes would produce: address
+    candidates are the stripped text of every matching div (in document order) followed
+    by every matching p, social links are the matching hrefs of all anchors.
+
+    Instead of calling get_text() on every div and p (quadratic for nested divs), every
+    text node is stripped once into a flat list and each div/p records the slice of that
+    list it spans.
+
+    With `reduce`, boilerplate is left out on the way: script, style, svg and similar
+    subtrees are not entered, navigation text is not used, and only the innermost
+    matching blocks (plus <address> elements) become address candidates instead of every
+    enclosing div. Footer, <address> and contact-marked elements are collected as the
+    contact section, and JSON-LD organization data and mailto:/tel: links are read.
+
+    Args:
+        soup (BeautifulSoup): The parsed document.
+        reduce (bool): Strip boilerplate as described above (default is False).
+
+    Returns:
+        dict: 'addresses', 'social_links', 'page_title', 'industry_sector' and 'links'
+              ((href, anchor text) of every link, for the crawler). With `reduce`, also
+              'text': the contact section, JSON-LD values and mailto:/tel: targets first,
+              then the remaining visible text, for the email and phone patterns.
+    """
+    from bs4 import CData, NavigableString, Tag
+
+    # Only these string types count as text for get_text() (no comments, scripts or styles)
+    text_string_types = (NavigableString, CData)
+
+    pieces = []
+    zones = []  # zone of each piece (BODY, NOISE or CONTACT)
+    blocks = []  # [start, end, enclosing block, tag] of every div, p (and address with `reduce`)
+    link_spans = []
+    social_links = []
+    structured = {'emails': [], 'phone_numbers': [], 'addresses': []}
+    title_tag = None
+    meta_description = None
+    meta_keywords = None
+
+    # Iterative depth-first walk: each stack entry is (children iterator, span being filled,
+    # zone of the children, innermost enclosing block)
+    stack = [(iter(soup.contents), None, BODY, None)]
+    while stack:
+        children, span, zone, block = stack[-1]
+        node = next(children, None)
+        if node is None:
+            stack.pop()
+            if span is not None:
+                span[1] = len(pieces)
+            continue
+
+        if isinstance(node, Tag):
+            name = node.name
+            span = None
+            child_zone = zone
+            child_block = block
+            if reduce:
+                if name in SKIPPED_TAGS:
+                    if name == 'script' and node.get('type') == 'application/ld+json' and node.string:
+                        for key, values in parse_json_ld(node.string).items():
+                            structured[key].extend(values)
+                    continue
+                if name in NOISE_TAGS:
+                    child_zone = NOISE
+                elif zone == BODY and (name in CONTACT_TAGS or _is_contact_marked(node)):
+                    child_zone = CONTACT
+            if name == 'div' or name == 'p' or (reduce and name == 'address'):
+                if child_zone != NOISE:
+                    span = child_block = [len(pieces), None, block, name]
+                    blocks.append(span)
+            elif name == 'a':
+                link = node.get('href')
+                if link is not None:
+                    if any(platform in link for platform in SOCIAL_PLATFORMS):
+                        social_links.append(link)
+                    if reduce:
+                        scheme = link[:7].lower()
+                        if scheme == 'mailto:':
+                            structured['emails'].append(unquote(link[7:].split('?', 1)[0]))
+                        elif scheme[:4] == 'tel:':
+                            structured['phone_numbers'].append(unquote(link[4:]))
+                    span = [len(pieces), None, link]
+                    link_spans.append(span)
+            elif name == 'title':
+                if title_tag is None:
+                    title_tag = node
+            elif name == 'meta':
+                meta_name = node.get('name')
+                if meta_name == 'description' and meta_description is None:
+                    meta_description = node
+                elif meta_name == 'keywords' and meta_keywords is None:
+                    meta_keywords = node
+            stack.append((iter(node.contents), span, child_zone, child_block))
+        elif type(node) in text_string_types:
+            text = node.strip()
+            if text:
+                pieces.append(text)
+                zones.append(zone)
+
+    addresses = []
+    if reduce:
+        # Keep the innermost matching blocks: an enclosing div only repeats their text
+        matched = []
+        for span in blocks:
+            text = "".join(pieces[span[0]:span[1]])
+            if text and (span[3] == 'address' or any(keyword in text.lower() for keyword in ADDRESS_KEYWORDS)):
+                matched.append((span, text))
+        enclosing = set()
+        for span, _ in matched:
+            parent = span[2]
+            while parent is not None and id(parent) not in enclosing:
+                enclosing.add(id(parent))
+                parent = parent[2]
+        addresses = dedup(structured['addresses'] + [text for span, text in matched if id(span) not in enclosing])
+    else:
+        for start, end, _, _ in [span for span in blocks if span[3] == 'div'] + [span for span in blocks if span[3] == 'p']:
+            text = "".join(pieces[start:end])
+            lowered = text.lower()
+            if any(keyword in lowered for keyword in ADDRESS_KEYWORDS):
+                addresses.append(text)
+
+    # Extract industry sector or business category from meta description or meta keywords
+    industry_sector = None
+    if meta_description:
+        industry_sector = meta_description.get('content', '')
+    if not industry_sector and meta_keywords:
+        industry_sector = meta_keywords.get('content', '')
+
+    links = [(span[2], " ".join(pieces[span[0]:span[1]])) for span in link_spans]
+
+    page_info = {
+        'addresses': addresses,
+        'social_links': social_links,
+        'page_title': title_tag.string if title_tag else "No title",
+        'industry_sector': industry_sector,
+        'links': links,
+    }
+    if reduce:
+        # One piece per line, so text of neighbouring elements never runs into a match
+        page_info['text'] = "\n".join(
+            structured['emails'] + structured['phone_numbers']
+            + [piece for piece, piece_zone in zip(pieces, zones) if piece_zone == CONTACT]
+            + [piece for piece, piece_zone in zip(pieces, zones) if piece_zone == BODY])
+    return page_info
+
+
+def _is_contact_marked(node) -> bool:
+    # id/class naming a footer, contact or address block (e.g. <div class="site-footer">)
+    marker = node.get('id') or ""
+    classes = node.get('class')
+    if classes:
+        marker += " " + " ".join(classes)
+    marker = marker.lower()
+    return bool(marker) and any(word in marker for word in CONTACT_MARKERS)
+
+
+def extract_page(content: bytes, url: str, parser: Optional[str] = None,
+                 encoding: str = "utf-8") -> Tuple[PageRecord, List]:
+    """
+    Parses a downloaded page and extracts its structured data.
+
+    Pure function of the page bytes and URL, so it can run in a worker process
+    (see parsing.py). The bytes are decoded here, once. The record holds only plain strings and lists: the title is
+    converted from a NavigableString, which would otherwise keep the whole tree alive.
+
+    Args:
+        content (bytes): The raw page HTML (or a memoryview of it).
+        url (str): The page URL.
+        parser (str): Parser backend, defaults to HTML_PARSER.
+        encoding (str): Encoding of the bytes, e.g. fetch.FetchResponse.charset; unknown ones are read as UTF-8.
+
+    Returns:
+        tuple: (extracted PageRecord, (href, anchor text) links)
+    """
+    try:
+        html = str(content, encoding, errors='replace')
+    except LookupError:
+        html = str(content, 'utf-8', errors='replace')
+
+    # Parse the page once and collect everything but the regex matches in a single traversal
+    page_info = walk_document(parse_html(html, parser), reduce=PAGE_REDUCTION_ENABLED)
+    title = page_info['page_title']
+
+    # The patterns scan the reduced text instead of the raw markup (scripts, styles, svg paths)
+    text = page_info.get('text', html)
+
+    # Prepare the data for LLM use: Returning the data in a structured format
+    record = PageRecord(
+        url=url,
+        title=str(title) if title is not None else None,
+        industry_sector=page_info['industry_sector'],
+        emails=find_emails(text),
+        phone_numbers=find_phone_numbers(text),
+        addresses=page_info['addresses'],
+        social_media=page_info['social_links'],
+    )
+    return record, page_info['links']
@@ -0,0 +1,188 @@
+import os
+import re
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Optional, Tuple
+from urllib.parse import urlparse
+from crawl import crawl_site
+from resolver import classify_intent, candidates_for
+from records import PageRecord
+
+
+# Search results fetched per entity (override with FANOUT_TOP_K; 1 only scrapes the top hit)
+FANOUT_TOP_K = int(os.environ.get("FANOUT_TOP_K", 3))
+
+# Page fetches running at once across all entities (override with FANOUT_POOL_SIZE)
+FANOUT_POOL_SIZE = int(os.environ.get("FANOUT_POOL_SIZE", 32))
+
+# A page at least this confident ends the fan-out of its entity (override with FANOUT_CONFIDENCE)
+FANOUT_CONFIDENCE = float(os.environ.get("FANOUT_CONFIDENCE", 0.8))
+
+CONTACT_PATH = re.compile(r"contact|reach-?us|get-?in-?touch|impressum|imprint|support|locations?|offices?",
+                          re.IGNORECASE)
+ABOUT_PATH = re.compile(r"about|company|corporate|who-?we-?are|investors?", re.IGNORECASE)
+
+# Directories and social networks rarely hold a company's own contact details
+AGGREGATOR_DOMAINS = ('wikipedia.org', 'linkedin.com', 'facebook.com', 'twitter.com', 'x.com', 'instagram.com',
+                      'youtube.com', 'crunchbase.com', 'bloomberg.com', 'zoominfo.com', 'glassdoor.com',
+                      'indeed.com', 'yelp.com', 'justdial.com', 'zaubacorp.com', 'tofler.in', 'dnb.com',
+                      'moneycontrol.com', 'economictimes.indiatimes.com', 'reuters.com')
+
+NAME_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Words of a company name that do not identify it
+LEGAL_WORDS = {'the', 'and', 'of', 'company', 'co', 'corp', 'corporation', 'inc', 'incorporated', 'ltd',
+               'limited', 'llc', 'llp', 'plc', 'pvt', 'private', 'public', 'group', 'holdings', 'gmbh', 'ag',
+               'sa', 'bv', 'nv', 'srl', 'spa', 'pte', 'pty', 'industries', 'international'}
+
+# A domain matching the entity at least this well is taken to be the entity's own site
+OWN_SITE_MATCH = 0.7
+
+_pool = ThreadPoolExecutor(max_workers=FANOUT_POOL_SIZE, thread_name_prefix="fanout")
+
+
+def name_tokens(entity: str) -> List[str]:
+    """
+    Distinctive lowercase words of an entity name (legal suffixes and filler removed).
+    """
+    return [word for word in NAME_WORD_RE.findall(str(entity).lower()) if word not in LEGAL_WORDS]
+
+
+def domain_match(url: str, entity: str) -> float:
+    """
+    How well the URL's domain matches the entity name, from 0 (unrelated) to 1 (name is the domain).
+    """
+    host = urlparse(url).netloc.lower().split(':')[0]
+    if host.startswith('www.'):
+        host = host[4:]
+    label = host.split('.')[0] if host else ""
+    tokens = name_tokens(entity)
+    if not label or not tokens:
+        return 0.0
+    compact = "".join(tokens)
+    if label == compact or label == tokens[0]:
+        return 1.0
+    if compact in label or (label in compact and len(label) >= 4):
+        return 0.8
+    # Acronyms such as "ril" for Reliance Industries Limited
+    acronym = "".join(word[0] for word in NAME_WORD_RE.findall(str(entity).lower()) if word not in ('the', 'and', 'of'))
+    if len(acronym) >= 2 and label == acronym:
+        return 0.7
+    return sum(1 for token in tokens if len(token) >= 3 and token in label) / len(tokens) * 0.6
+
+
+def score_url(url: str, entity: str, rank: int = 0) -> float:
+    """
+    Cheap prior of how likely a search result is to hold the entity's contact data.
+
+    Combines contact/about-page cues in the path, how well the domain matches the entity
+    and the search rank, without fetching anything.
+    """
+    parsed = urlparse(url)
+    host = parsed.netloc.lower()
+    score = 3.0 * domain_match(url, entity)
+    if CONTACT_PATH.search(parsed.path):
+        score += 2.0
+    elif ABOUT_PATH.search(parsed.path):
+        score += 1.0
+    if any(host == domain or host.endswith('.' + domain) for domain in AGGREGATOR_DOMAINS):
+        score -= 3.0
+    return score - 0.3 * rank
+
+
+def rank_urls(urls: List[str], entity: str, top_k: int = FANOUT_TOP_K) -> List[str]:
+    """
+    Pick the `top_k` most promising distinct URLs of the search results, best first.
+    """
+    unique = list(dict.fromkeys(urls))
+    ranked = sorted(enumerate(unique), key=lambda item: -score_url(item[1], entity, item[0]))
+    return [url for _, url in ranked[:max(1, top_k)]]
+
+
+def page_confidence(query: str, entity: str, url: str, extracted: Optional[PageRecord]) -> float:
+    """
+    How confident we are that a scraped page answers the query, from 0 to 1.
+
+    1 when the query's field has exactly one candidate (the rule-based resolver can answer),
+    high when it has candidates on the entity's own domain, lower on other domains.
+    """
+    if not extracted:
+        return 0.0
+    intent = classify_intent(query)
+    if intent is None:
+        found = extracted.emails or extracted.phone_numbers or extracted.addresses
+        count = 1 if found else 0
+    else:
+        count = len(candidates_for(intent, query, extracted))
+    if count == 0:
+        return 0.1 if extracted.emails or extracted.phone_numbers or extracted.addresses else 0.0
+    own_site = domain_match(url, entity) >= OWN_SITE_MATCH
+    if count == 1 and intent is not None:
+        return 1.0 if own_site else 0.8
+    return 0.8 if own_site else 0.5
+
+
+def scrape_best(urls: List[str], query: str, entity: str, use_cache: bool = True, top_k: int = FANOUT_TOP_K,
+                confidence: float = FANOUT_CONFIDENCE) -> Tuple[Optional[str], Optional[PageRecord], List[str]]:
+    """
+    Scrape the most promising search results concurrently and keep the best page.
+
+    The top `top_k` URLs (by score_url) are crawled at once (see crawl.crawl_site, which
+    follows a hit's contact pages when the hit alone is not enough). As soon as one page reaches
+    `confidence`, the fetches that have not started are cancelled and the crawls still
+    running are told to stop before their next page (robots.txt, sitemap or contact page)
+    and are no longer waited for. Otherwise the most confident page wins, ties going
+    to the better ranked URL.
+
+    Args:
+        urls (list): Search results, in search order.
+        query (str): The user's question without the entity name, used to judge the pages.
+        entity (str): The entity looked up, used to score domains.
+        use_cache (bool): Use the response cache for the page fetches (default is True).
+        top_k (int): Number of results fetched.
+        confidence (float): Confidence that ends the fan-out early.
+
+    Returns:
+        tuple: (chosen URL, its extracted data, log lines); URL and data are None if no page had data.
+    """
+    logs = []
+    candidates = rank_urls(urls, entity, top_k)
+    if not candidates:
+        return None, None, logs
+
+    stop = threading.Event()
+
+    def scrape(url: str) -> Optional[PageRecord]:
+        # Follow the site's contact pages unless the hit already answers the query
+        return crawl_site(url, use_cache=use_cache, cancel=stop,
+                          is_enough=lambda record: page_confidence(query, entity, url, record) >= confidence)
+
+    futures = {_pool.submit(scrape, url): rank for rank, url in enumerate(candidates)}
+    best = (0.0, len(candidates), None, None)  # (confidence, rank, url, extracted)
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                rank = futures[future]
+                url = candidates[rank]
+                try:
+                    extracted = future.result()
+                except Exception as e:
+                    logging.error(f"Error while scraping {url}: {e}")
+                    continue
+                score = page_confidence(query, entity, url, extracted)
+                if extracted and (score > best[0] or (score == best[0] and rank < best[1])):
+                    best = (score, rank, url, extracted)
+            if best[0] >= confidence and pending:
+                logs.append(f"Confident answer on {best[2]}, skipping {len(pending)} other result(s).")
+                break
+    finally:
+        stop.set()
+        for future in pending:
+            future.cancel()
+
+    if best[2] is not None and len(candidates) > 1:
+        logs.append(f"Picked {best[2]} (result {best[1] + 1} of {len(candidates)}, confidence {best[0]:.1f}).")
+    return best[2], best[3], logs
@@ -0,0 +1,184 @@
+import os
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Dict, Optional
+from urllib.parse import urlparse
+from metrics import metrics
+
+
+# Fetch layer limits (override with environment variables)
+POOL_CONNECTIONS = int(os.environ.get("FETCH_POOL_CONNECTIONS", 100))
+POOL_MAXSIZE = int(os.environ.get("FETCH_POOL_MAXSIZE", 32))
+CONNECT_TIMEOUT = float(os.environ.get("FETCH_CONNECT_TIMEOUT", 5))
+READ_TIMEOUT = float(os.environ.get("FETCH_READ_TIMEOUT", 15))
+TOTAL_TIMEOUT = float(os.environ.get("FETCH_TOTAL_TIMEOUT", 30))
+PER_HOST_LIMIT = int(os.environ.get("FETCH_PER_HOST_LIMIT", 2))
+CRAWL_DELAY = float(os.environ.get("FETCH_CRAWL_DELAY", 0.5))
+MAX_RESPONSE_BYTES = int(os.environ.get("FETCH_MAX_RESPONSE_BYTES", 5 * 1024 * 1024))
+USER_AGENT = os.environ.get("FETCH_USER_AGENT", "Mozilla/5.0 (compatible; AIInformationRetrievalAgent/1.0)")
+
+# urllib3 only decodes brotli bodies when a brotli package is installed
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = "gzip, deflate, br"
+    except ImportError:
+        ACCEPT_ENCODING = "gzip, deflate"
+
+
+class ResponseTooLarge(requests.exceptions.RequestException):
+    """
+    Raised when a response body exceeds the configured maximum size.
+    """
+
+
+class FetchResponse:
+    """
+    A fully read HTTP response (the connection is already back in the pool).
+    """
+
+    def __init__(self, url: str, status_code: int, headers, content: bytes, encoding: Optional[str]):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding
+
+    @property
+    def charset(self) -> str:
+        # The declared encoding, else the one detected from the body
+        if self.encoding is not None:
+            return self.encoding
+        return requests.compat.chardet.detect(self.content)["encoding"] or "utf-8"
+
+    @property
+    def text(self) -> str:
+        try:
+            return str(self.content, self.charset, errors="replace")
+        except LookupError:
+            return str(self.content, "utf-8", errors="replace")
+
+    def json(self):
+        return requests.compat.json.loads(self.content)
+
+
+class Fetcher:
+    """
+    Thread-safe HTTP client shared by the search and scraping modules.
+
+    It keeps a pooled session with bounded connect/read timeouts, caps the number of
+    concurrent requests per host, spaces requests to the same host by a crawl delay and
+    refuses bodies larger than `max_bytes`.
+    """
+
+    def __init__(self, pool_connections: int = POOL_CONNECTIONS, pool_maxsize: int = POOL_MAXSIZE,
+                 connect_timeout: float = CONNECT_TIMEOUT, read_timeout: float = READ_TIMEOUT,
+                 total_timeout: float = TOTAL_TIMEOUT, per_host_limit: int = PER_HOST_LIMIT,
+                 crawl_delay: float = CRAWL_DELAY, max_bytes: int = MAX_RESPONSE_BYTES,
+                 user_agent: str = USER_AGENT):
+        self.timeout = (connect_timeout, read_timeout)
+        self.total_timeout = total_timeout
+        self.per_host_limit = max(1, per_host_limit)
+        self.crawl_delay = crawl_delay
+        self.max_bytes = max_bytes
+
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.user_agent = user_agent
+
+        self._session = None
+        self._lock = threading.Lock()
+        self._host_slots = {}
+        self._next_request_at = {}
+
+    @property
+    def session(self) -> requests.Session:
+        # The session and its connection pools are built on first use, not at import time
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize,
+                                          max_retries=0)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    session.headers.update({"User-Agent": self.user_agent, "Accept-Encoding": ACCEPT_ENCODING})
+                    self._session = session
+        return self._session
+
+    def _host_slot(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._host_slots[host]
+
+    def _wait_for_turn(self, host: str):
+        # Reserve the next start time for this host, then sleep until it comes
+        with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_request_at.get(host, now))
+            self._next_request_at[host] = start_at + self.crawl_delay
+        if start_at > now:
+            time.sleep(start_at - now)
+
+    def get(self, url: str, headers: Optional[Dict] = None, params: Optional[Dict] = None,
+            polite: bool = True, max_bytes: Optional[int] = None) -> FetchResponse:
+        """
+        Perform a GET request and read the whole body.
+
+        Args:
+            url (str): The URL to fetch.
+            headers (dict): Extra request headers.
+            params (dict): Query string parameters.
+            polite (bool): Apply the per-host concurrency cap and crawl delay (default is True).
+                           API calls with their own rate limits pass False.
+            max_bytes (int): Lower body size limit for this request (e.g. a crawl's remaining budget).
+
+        Returns:
+            FetchResponse: The response with its body fully read.
+
+        Raises:
+            requests.exceptions.RequestException: On connection errors, timeouts or oversized bodies.
+        """
+        host = urlparse(url).netloc.lower()
+        slot = self._host_slot(host) if polite else None
+        if slot is not None:
+            slot.acquire()
+        try:
+            if polite and self.crawl_delay > 0:
+                self._wait_for_turn(host)
+            return self._read(url, headers, params, min(max_bytes or self.max_bytes, self.max_bytes))
+        finally:
+            if slot is not None:
+                slot.release()
+
+    def _read(self, url: str, headers: Optional[Dict], params: Optional[Dict], max_bytes: int) -> FetchResponse:
+        deadline = time.monotonic() + self.total_timeout
+        with self.session.get(url, headers=headers, params=params, timeout=self.timeout, stream=True) as response:
+            declared = response.headers.get("Content-Length")
+            if declared and declared.isdigit() and int(declared) > max_bytes:
+                raise ResponseTooLarge(f"{url} declares {declared} bytes (limit {max_bytes})")
+
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ResponseTooLarge(f"{url} exceeded {max_bytes} bytes")
+                if time.monotonic() > deadline:
+                    raise requests.exceptions.Timeout(f"{url} took longer than {self.total_timeout}s")
+                chunks.append(chunk)
+
+            metrics.inc("fetch_requests_total", status=f"{response.status_code // 100}xx")
+            metrics.inc("fetch_bytes_total", size)
+            return FetchResponse(response.url, response.status_code, response.headers,
+                                 b"".join(chunks), response.encoding)
+
+
+# Shared fetcher used across the application
+fetcher = Fetcher()
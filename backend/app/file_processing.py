@@ -1,113 +1,332 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, current_app, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-import pandas as pd
+import io
 import os
+import csv
+import json
 import time
 import logging
-from query import search_urls ,load_data
-from scraping import scrape_essential_info
-from LLM_groq import query_llm_from_text
-from config import Bing_api_key, groq_api_key
-
-# Configure logging for better debugging and tracking
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
-
-app = Flask(__name__)
-CORS(app, resources={r"/api/*": {"origins": "http://localhost:5173"}})
-
-# Ensure the uploads directory exists
-UPLOAD_FOLDER = 'uploads'
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
-    
-    
-@app.route('/api/process', methods=['POST'])
-def process_file():
-    logs = []  # List to collect logs
+import itertools
+from typing import Optional
+from settings import Config, configure_logging
+from ingest import iter_entities, save_upload, IngestError
+from pipeline import run_pipeline, collect_ordered, parse_max_workers, parse_batch_size, parse_flag
+from records import LogLines, MAX_RESPONSE_LOGS
+from cache import response_cache
+from entity_index import entity_index
+from search import local_search
+from jobs import job_store
+from checkpoints import checkpoint_store, iter_resumable, file_digest, make_run_id
+from ratelimit import limiters
+from singleflight import flights
+from metrics import metrics, render_gauges, Profiler, PROFILE_ENABLED
+
+api = Blueprint('api', __name__)
+
+
+def create_app(config: Optional[Config] = None) -> Flask:
+    """
+    Build the Flask application.
+
+    Nothing is configured at import time: logging, CORS and the upload folder are set up
+    here from one Config, and heavy dependencies (pandas, groq, bs4) load on first use.
+
+    Args:
+        config (Config): Settings of this instance, read from the environment by default.
+
+    Returns:
+        Flask: The application with every route registered.
+    """
+    config = config or Config()
+    configure_logging(config.log_level)
+
+    app = Flask(__name__)
+    app.config['APP_CONFIG'] = config
+    CORS(app, resources={r"/api/*": {"origins": config.cors_origins}})
+    app.register_blueprint(api)
+
+    # Ensure the uploads directory exists
+    os.makedirs(config.upload_folder, exist_ok=True)
+    return app
 
+
+def __getattr__(name):
+    # `file_processing.app` (e.g. for gunicorn) builds the default application on first access
+    if name == 'app':
+        app = globals()['app'] = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def load_upload(logs: list):
+    """
+    Validate the uploaded file and form fields and open a stream of its unique entities.
+
+    Unless checkpointing is off (or the `no_checkpoint` field is set) the upload is also tied
+    to a resumable run identified by its content, column and query; `restart` starts it over.
+
+    Args:
+        logs (list): List collecting the log lines returned to the client.
+
+    Returns:
+        tuple: (query, entities iterator, run id or None, None) on success or
+               (None, None, None, (response, status)) on error.
+    """
     # Check for the presence of a file in the request
     if 'file' not in request.files:
         logs.append("Error: Please upload a file.")
-        return jsonify({"error": "Please upload a file.", "logs": logs}), 400
-    
+        return None, None, None, (jsonify({"error": "Please upload a file.", "logs": list(logs)}), 400)
+
     file = request.files['file']
-    
+
     # Extract query and column information from the form
     query = request.form.get('query', None)
     if not query:
         logs.append("Error: Query parameter is missing.")
-        return jsonify({"error": "Query parameter is missing.", "logs": logs}), 400
+        return None, None, None, (jsonify({"error": "Query parameter is missing.", "logs": list(logs)}), 400)
 
-    results = {}
-    
     selected_column = request.form.get('column', 'entity')  # Default to 'entity' if no column specified
 
-    # Save the uploaded file temporarily
-    file_path = os.path.join(UPLOAD_FOLDER, file.filename)
-    file.save(file_path)
+    # Save the upload under a generated name; it is streamed from disk and removed once read
+    file_path = save_upload(file, current_app.config['APP_CONFIG'].upload_folder)
 
+    # Check the column up front, then read the entities lazily in chunks
     try:
-        # Read the CSV file into a DataFrame
-        df = load_data(file_path)
-
-        # Check if the selected column exists in the DataFrame
-        if selected_column not in df.columns:
-            logs.append(f"Error: Column '{selected_column}' not found in the file.")
-            return jsonify({"error": f"Column '{selected_column}' not found in the file.", "logs": logs}), 400
-
-        # Extract unique entities from the selected column
-        entities = df[selected_column].dropna().unique()
-        if len(entities) == 0:
-            logs.append(f"Error: No valid entities found in column '{selected_column}'.")
-            return jsonify({"error": f"No valid entities found in column '{selected_column}'.", "logs": logs}), 400
-
-        # Process each entity
-        for entity in entities:
-            # Formulate the query
-            query_new = f"{query} {entity}"
-            logs.append(f"Processing query for: {entity}")
-            logging.info("Query Loaded.")
-
-            # Process query to get relevant web content
-            logging.info("Urls search initialised....")
-            url = search_urls(query,Bing_api_key)[0]
-            
-            logging.info("Extraction of Data initilised.....")
-            extracted_text = scrape_essential_info(url)
-            logging.info("Data Extraction is Completed.")
-            
-            if extracted_text == "notfound":
-                logs.append(f"No relevant data found for {entity}.")
-                results[entity] = "notfound"
-                continue
-
-            # Query the LLM with the extracted content to retrieve the required information
-            llm_response = query_llm_from_text(extracted_text,query=query_new,api_key=groq_api_key)
-            
-            if llm_response == "LLM error":
-                logs.append(f"LLM error occurred while processing {entity}.")
-                results[entity] = "LLM error"
-            else:
-                results[entity] = llm_response
-        
-        
+        entities = iter_entities(file_path, selected_column, filename=file.filename, remove=True)
+    except IngestError as e:
+        logs.append(f"Error: {e}")
+        return None, None, None, (jsonify({"error": str(e), "logs": list(logs)}), 400)
+
+    # The file stays on disk until the stream is read, so it can still be hashed
+    checkpointed = checkpoint_store.enabled and not parse_flag(request.form.get('no_checkpoint'))
+    file_hash = file_digest(file_path) if checkpointed else None
+
+    first = next(entities, None)
+    if first is None:
+        logs.append(f"Error: No valid entities found in column '{selected_column}'.")
+        return None, None, None, (jsonify({"error": f"No valid entities found in column '{selected_column}'.", "logs": list(logs)}), 400)
+
+    # Only valid uploads become runs
+    run_id = None
+    if checkpointed:
+        run_id = make_run_id(file_hash, query, selected_column)
+        checkpoint_store.start_run(run_id, query, file_hash=file_hash, column=selected_column,
+                                   restart=parse_flag(request.form.get('restart')))
+        logs.append(f"Run {run_id}: finished entities of earlier attempts are reused.")
+
+    return query, itertools.chain([first], entities), run_id, None
+
+
+@api.before_app_request
+def start_profiler():
+    # Profile requests sent with profile=1 (query string or form field) when PROFILE_ENABLED is set
+    if PROFILE_ENABLED and parse_flag(request.args.get('profile') or request.form.get('profile')):
+        g.profiler = Profiler(request.endpoint or "request")
+        g.profiler.start()
+
+
+@api.after_app_request
+def stop_profiler(response):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        path = profiler.stop()
+        if path:
+            response.headers['X-Profile'] = path
+    return response
+
+
+@api.route('/api/process', methods=['POST'])
+def process_file():
+    logs = LogLines(limit=MAX_RESPONSE_LOGS)  # Collects the logs, capped for large uploads
+
+    try:
+        query, entities, run_id, error = load_upload(logs)
+        if error:
+            return error
+
+        # Process the entities concurrently, results come back in input order
+        max_workers = parse_max_workers(request.form.get('max_workers'))
+        use_cache = not parse_flag(request.form.get('no_cache'))
+        llm_batch_size = parse_batch_size(request.form.get('llm_batch_size'))
+        logging.info(f"Processing entities with {max_workers} workers.")
+
         # Create the final response structure
         final_results = []
-        
-        for entity in entities:
-            email = results.get(entity, "notfound")
-            final_results.append({
-                "entity": entity,
-                "email": email,
-                "status": "success" if email != "notfound" else "Not found"
-            })
+
+        if run_id:
+            # Checkpoint every entity so a rerun of the same file and query resumes where this one stopped
+            results = collect_ordered(iter_resumable(entities, query, run_id, max_workers=max_workers,
+                                                     use_cache=use_cache, llm_batch_size=llm_batch_size))
+        else:
+            results = run_pipeline(entities, query, max_workers=max_workers, use_cache=use_cache,
+                                   llm_batch_size=llm_batch_size)
+
+        for result in results:
+            logs.extend(result.logs)
+            final_results.append(result.row())
 
         # Send the final results along with the logs
-        return jsonify({"results": final_results, "logs": logs}), 200
+        return jsonify({"results": final_results, "run_id": run_id, "logs": logs.to_list()}), 200
+
+    except Exception as e:
+        logs.append(f"Error: {str(e)}")  # Log the exception error
+        return jsonify({"error": f"An error occurred while processing the file: {str(e)}", "logs": logs.to_list()}), 500
+
+
+@api.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """
+    Start processing an upload in the background and return its job id at once.
+    """
+    logs = []  # List to collect logs
+
+    try:
+        query, entities, run_id, error = load_upload(logs)
+        if error:
+            return error
+
+        max_workers = parse_max_workers(request.form.get('max_workers'))
+        use_cache = not parse_flag(request.form.get('no_cache'))
+        llm_batch_size = parse_batch_size(request.form.get('llm_batch_size'))
+        job = job_store.submit(entities, query, max_workers=max_workers, use_cache=use_cache,
+                               llm_batch_size=llm_batch_size, run_id=run_id)
+        logs.append(f"Job {job.id} submitted.")
+
+        return jsonify({
+            **job.summary(),
+            "status_url": f"/api/jobs/{job.id}",
+            "results_url": f"/api/jobs/{job.id}/results",
+            "stream_url": f"/api/jobs/{job.id}/stream",
+            "logs": logs
+        }), 202
 
     except Exception as e:
         logs.append(f"Error: {str(e)}")  # Log the exception error
         return jsonify({"error": f"An error occurred while processing the file: {str(e)}", "logs": logs}), 500
 
+
+@api.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Job '{job_id}' not found."}), 404
+    return jsonify(job.summary()), 200
+
+
+@api.route('/api/jobs/<job_id>/results', methods=['GET'])
+def job_results(job_id):
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Job '{job_id}' not found."}), 404
+    return jsonify(job.results()), 200
+
+
+@api.route('/api/jobs/<job_id>/stream', methods=['GET'])
+def job_stream(job_id):
+    """
+    Stream per-entity results as they finish.
+
+    NDJSON by default, Server-Sent Events when the client accepts text/event-stream.
+    Pass ?since=N to skip the first N events when reconnecting.
+    """
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Job '{job_id}' not found."}), 404
+
+    start = request.args.get('since', 0, type=int)
+    use_sse = request.accept_mimetypes.best == 'text/event-stream' or request.args.get('format') == 'sse'
+
+    def generate():
+        position = start
+        for event in job.follow(start=start):
+            position += 1
+            if use_sse:
+                yield f"id: {position}\nevent: result\ndata: {json.dumps(event)}\n\n"
+            else:
+                yield json.dumps({"type": "result", **event}) + "\n"
+        summary = job.summary()
+        if use_sse:
+            yield f"event: end\ndata: {json.dumps(summary)}\n\n"
+        else:
+            yield json.dumps({"type": "end", **summary}) + "\n"
+
+    mimetype = 'text/event-stream' if use_sse else 'application/x-ndjson'
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@api.route('/api/runs/<run_id>', methods=['GET'])
+def run_progress(run_id):
+    progress = checkpoint_store.progress(run_id)
+    if progress is None:
+        return jsonify({"error": f"Run '{run_id}' not found."}), 404
+    return jsonify(progress), 200
+
+
+@api.route('/api/runs/<run_id>/export', methods=['GET'])
+def run_export(run_id):
+    """
+    Download the results a run has checkpointed so far, in input order.
+
+    JSON Lines by default, CSV with ?format=csv. Works while the run is still going.
+    """
+    if checkpoint_store.progress(run_id) is None:
+        return jsonify({"error": f"Run '{run_id}' not found."}), 404
+    use_csv = request.args.get('format') == 'csv'
+    columns = ["entity", "email", "status", "source", "error"]
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if use_csv:
+            writer.writerow(columns)
+        for result in checkpoint_store.export(run_id):
+            row = result.row()
+            if use_csv:
+                writer.writerow([row[column] if row[column] is not None else "" for column in columns])
+            else:
+                buffer.write(json.dumps(row) + "\n")
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    mimetype = 'text/csv' if use_csv else 'application/x-ndjson'
+    extension = 'csv' if use_csv else 'jsonl'
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={"Content-Disposition": f"attachment; filename=run-{run_id}.{extension}"})
+
+
+@api.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(response_cache.stats()), 200
+
+
+@api.route('/api/index/stats', methods=['GET'])
+def index_stats():
+    return jsonify(dict(entity_index.stats(), sites=local_search.stats())), 200
+
+
+@api.route('/api/singleflight/stats', methods=['GET'])
+def singleflight_stats():
+    return jsonify({name: flight.stats() for name, flight in flights.items()}), 200
+
+
+@api.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    Stage latencies, counters and current cache / rate limiter state in the Prometheus text format.
+    """
+    cache = response_cache.stats()
+    limiter_states = {name: limiter.snapshot() for name, limiter in limiters.items()}
+    gauges = render_gauges({
+        "cache_size_bytes": ("Current size of the response cache.", {(): cache["size_bytes"]}),
+        "limiter_rate_factor": ("Fraction of its quota a provider limiter currently allows.",
+                                {(("provider", name),): state["rate_factor"] for name, state in limiter_states.items()}),
+        "limiter_paused_seconds": ("Seconds a provider limiter stays paused after a rate limit response.",
+                                   {(("provider", name),): state["paused_seconds"] for name, state in limiter_states.items()}),
+    })
+    return Response(metrics.render() + gauges, mimetype="text/plain; version=0.0.4")
+
+
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
+    app = create_app()
+    app.run(debug=app.config['APP_CONFIG'].debug, port=app.config['APP_CONFIG'].port)
@@ -0,0 +1,322 @@
+import os
+import gzip
+import math
+import uuid
+import zipfile
+import logging
+import itertools
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional
+from werkzeug.utils import secure_filename
+from settings import defaults
+
+# pandas and numpy are imported where they are used, so importing this module stays cheap
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+
+# Rows read per chunk of a CSV or Parquet file (override with INGEST_CHUNK_ROWS)
+INGEST_CHUNK_ROWS = int(os.environ.get("INGEST_CHUNK_ROWS", 50000))
+
+# Distinct entities the dedup filter is sized for, and its false-positive rate: a
+# distinct entity is skipped as a duplicate with at most this probability
+INGEST_DEDUP_CAPACITY = int(os.environ.get("INGEST_DEDUP_CAPACITY", 10_000_000))
+INGEST_DEDUP_ERROR_RATE = float(os.environ.get("INGEST_DEDUP_ERROR_RATE", 1e-6))
+
+# Uploaded files are stored here under a generated name, never the client's filename
+UPLOAD_FOLDER = defaults.upload_folder
+
+FORMATS = {
+    ".csv": "csv", ".txt": "csv", ".tsv": "tsv",
+    ".xlsx": "excel", ".xlsm": "excel",
+    ".parquet": "parquet", ".pq": "parquet",
+}
+GZIP_MAGIC = b"\x1f\x8b"
+
+# Errors of the readers on a malformed or truncated file, reported as IngestError
+READ_ERRORS = (ValueError, OSError, EOFError, gzip.BadGzipFile, zipfile.BadZipFile)
+
+
+class IngestError(ValueError):
+    """
+    Raised when an input file cannot be read or lacks the selected column.
+    """
+
+
+class BloomFilter:
+    """
+    Fixed-size set membership filter used to dedupe entities in bounded memory.
+
+    Memory is set once from the capacity and error rate (about 3.6 bytes per entity at a
+    1e-6 error rate, ~34 MB for ten million entities), however many rows the file has.
+    The bit array is zero-filled lazily by the OS, so small files only touch a few pages.
+    Lookups are vectorized over whole chunks with numpy.
+    """
+
+    def __init__(self, capacity: int = INGEST_DEDUP_CAPACITY, error_rate: float = INGEST_DEDUP_ERROR_RATE):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        import numpy as np
+        self.bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+        self.count = 0
+
+    def _positions(self, values: "pd.Series") -> "np.ndarray":
+        import numpy as np
+        import pandas as pd
+
+        # Double hashing on the two halves of one 64-bit hash: position i is h1 + i * h2 (mod size)
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+        first = hashes & np.uint64(0xFFFFFFFF)
+        second = (hashes >> np.uint64(32)) | np.uint64(1)
+        steps = np.arange(self.hashes, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            return (first[:, None] + steps[None, :] * second[:, None]) % np.uint64(self.size)
+
+    def add_many(self, values: "pd.Series") -> "np.ndarray":
+        """
+        Add distinct values to the filter.
+
+        Returns:
+            np.ndarray: Boolean mask, True where the value was new (not seen in earlier calls).
+        """
+        import numpy as np
+
+        if values.empty:
+            return np.zeros(0, dtype=bool)
+        positions = self._positions(values)
+        byte = (positions >> np.uint64(3)).astype(np.intp)
+        mask = np.left_shift(np.uint8(1), (positions & np.uint64(7)).astype(np.uint8))
+        new = ((self.bits[byte] & mask) == 0).any(axis=1)
+
+        # Set the bits of the new values one bit offset at a time, so repeated bytes get the same mask
+        positions = positions[new].ravel()
+        byte = byte[new].ravel()
+        offsets = (positions & np.uint64(7)).astype(np.uint8)
+        for offset in range(8):
+            self.bits[byte[offsets == offset]] |= np.uint8(1 << offset)
+        self.count += int(new.sum())
+        return new
+
+    def add(self, value: str) -> bool:
+        """
+        Add a single value, returning True if it was new.
+        """
+        import pandas as pd
+        return bool(self.add_many(pd.Series([value], dtype=object))[0])
+
+
+def detect_format(path: str, filename: Optional[str] = None) -> tuple:
+    """
+    Work out the format of an input file from its name and its first bytes.
+
+    Returns:
+        tuple: (format, compression) where format is "csv", "tsv", "excel" or "parquet"
+               and compression is "gzip" or None.
+    """
+    name = (filename or path).lower()
+    compression = None
+    if name.endswith(".gz"):
+        name = name[:-3]
+        compression = "gzip"
+    else:
+        with open(path, "rb") as f:
+            if f.read(2) == GZIP_MAGIC:
+                compression = "gzip"
+    file_format = FORMATS.get(os.path.splitext(name)[1], "csv")
+    if compression and file_format in ("excel", "parquet"):
+        raise IngestError("Compressed Excel and Parquet files are not supported, upload them uncompressed.")
+    return file_format, compression
+
+
+def _iter_csv(path: str, column: Optional[str], compression: Optional[str], sep: str,
+              chunksize: int) -> Iterator:
+    import pandas as pd
+
+    header = pd.read_csv(path, sep=sep, compression=compression, nrows=0)
+    column = column or (header.columns[0] if len(header.columns) else None)
+    if column not in header.columns:
+        raise IngestError(f"Column '{column}' not found in the file.")
+    reader = pd.read_csv(path, sep=sep, compression=compression, usecols=[column], dtype=str,
+                         chunksize=chunksize, keep_default_na=True)
+
+    def chunks():
+        with reader:
+            for chunk in reader:
+                yield chunk[column]
+    return chunks()
+
+
+def _iter_excel(path: str, column: Optional[str], chunksize: int) -> Iterator:
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise IngestError("Reading Excel files requires the 'openpyxl' package.")
+    import pandas as pd
+
+    # Read-only mode streams rows instead of loading the whole workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    rows = workbook.active.iter_rows(values_only=True)
+    header = [str(cell) if cell is not None else "" for cell in next(rows, ())]
+    column = column or (header[0] if header else None)
+    if column not in header:
+        workbook.close()
+        raise IngestError(f"Column '{column}' not found in the file.")
+    position = header.index(column)
+
+    def chunks():
+        try:
+            while True:
+                values = [row[position] if position < len(row) else None
+                          for row in itertools.islice(rows, chunksize)]
+                if not values:
+                    return
+                yield pd.Series(values, dtype=object)
+        finally:
+            workbook.close()
+    return chunks()
+
+
+def _iter_parquet(path: str, column: Optional[str], chunksize: int) -> Iterator:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise IngestError("Reading Parquet files requires the 'pyarrow' package.")
+
+    parquet = pq.ParquetFile(path)
+    names = parquet.schema_arrow.names
+    column = column or (names[0] if names else None)
+    if column not in names:
+        raise IngestError(f"Column '{column}' not found in the file.")
+
+    def chunks():
+        # Only the selected column is decoded, one row batch at a time
+        for batch in parquet.iter_batches(batch_size=chunksize, columns=[column]):
+            yield batch.column(0).to_pandas()
+    return chunks()
+
+
+def iter_column(path: str, column: Optional[str] = None, filename: Optional[str] = None,
+                chunksize: int = INGEST_CHUNK_ROWS) -> "Iterator[pd.Series]":
+    """
+    Stream one column of a CSV/TSV (optionally gzipped), Excel or Parquet file in chunks.
+
+    The header is checked up front, so a missing column raises before any row is read;
+    the rows themselves are read lazily, chunk by chunk.
+
+    Args:
+        path (str): Path of the file on disk.
+        column (str): Column to read, defaults to the first column.
+        filename (str): Original file name, used to detect the format (defaults to `path`).
+        chunksize (int): Rows read per chunk.
+
+    Returns:
+        Iterator[pd.Series]: Chunks of the column's raw values, in file order.
+
+    Raises:
+        IngestError: If the file cannot be parsed or has no such column, here or while
+            iterating (a malformed row further down the file).
+    """
+    file_format, compression = detect_format(path, filename)
+    try:
+        if file_format == "excel":
+            chunks = _iter_excel(path, column, chunksize)
+        elif file_format == "parquet":
+            chunks = _iter_parquet(path, column, chunksize)
+        else:
+            chunks = _iter_csv(path, column, compression, "\t" if file_format == "tsv" else ",", chunksize)
+    except IngestError:
+        raise
+    except READ_ERRORS as e:
+        raise IngestError(f"Unable to read the file: {e}")
+    return _checked(chunks)
+
+
+def _checked(chunks: Iterator) -> Iterator:
+    # Rows are parsed lazily, so errors in later chunks surface during iteration
+    try:
+        yield from chunks
+    except IngestError:
+        raise
+    except READ_ERRORS as e:
+        raise IngestError(f"Unable to read the file: {e}")
+    finally:
+        chunks.close()
+
+
+def unique_entities(chunks: "Iterable[pd.Series]", seen: Optional[BloomFilter] = None) -> Iterator[str]:
+    """
+    Drop empty values and repeats from a chunked stream of entities, keeping first-seen order.
+
+    Args:
+        chunks (Iterable[pd.Series]): Raw column values, chunk by chunk.
+        seen (BloomFilter): Filter of entities already emitted (a new one by default).
+
+    Yields:
+        str: Each distinct, non-empty entity once.
+    """
+    seen = seen if seen is not None else BloomFilter()
+    for chunk in chunks:
+        values = chunk.dropna().astype(str).str.strip()
+        values = values[values != ""].drop_duplicates()
+        yield from values[seen.add_many(values)].tolist()
+
+
+def iter_entities(path: str, column: Optional[str] = None, filename: Optional[str] = None,
+                  chunksize: int = INGEST_CHUNK_ROWS, remove: bool = False) -> Iterator[str]:
+    """
+    Stream the distinct entities of one column of an input file.
+
+    The column is validated eagerly (raising IngestError); the entities are then produced
+    lazily, so the pipeline can start on the first ones while the rest is still being read.
+
+    Args:
+        path (str): Path of the file on disk.
+        column (str): Column holding the entities, defaults to the first column.
+        filename (str): Original file name, used to detect the format.
+        chunksize (int): Rows read per chunk.
+        remove (bool): Delete the file once it has been read (or the stream is closed).
+
+    Returns:
+        Iterator[str]: The distinct entities in file order.
+    """
+    try:
+        chunks = iter_column(path, column, filename=filename, chunksize=chunksize)
+    except Exception:
+        if remove:
+            _remove(path)
+        raise
+
+    def entities():
+        try:
+            yield from unique_entities(chunks)
+        finally:
+            if remove:
+                _remove(path)
+    return entities()
+
+
+def save_upload(file_storage, folder: str = UPLOAD_FOLDER) -> str:
+    """
+    Save an uploaded file under a generated name, keeping only a sanitized extension.
+
+    The client's filename is never used as a path, so uploads cannot overwrite or escape
+    the upload folder.
+
+    Returns:
+        str: Path of the saved file.
+    """
+    os.makedirs(folder, exist_ok=True)
+    name = secure_filename(file_storage.filename or "")
+    suffix = ".gz" if name.lower().endswith(".gz") else ""
+    extension = os.path.splitext(name[:-len(suffix)] if suffix else name)[1].lower()
+    extension = extension if extension in FORMATS else ""
+    path = os.path.join(folder, f"{uuid.uuid4().hex}{extension}{suffix}")
+    file_storage.save(path)
+    return path
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError as e:
+        logging.warning(f"Could not remove upload {path}: {e}")
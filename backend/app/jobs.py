@@ -0,0 +1,193 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from typing import Dict, Iterable, Iterator, Optional
+from pipeline import iter_pipeline, DEFAULT_MAX_WORKERS, DEFAULT_LLM_BATCH_SIZE
+from checkpoints import iter_resumable
+from records import LogLines, MAX_RESPONSE_LOGS
+
+
+# Finished jobs are kept in memory for this many seconds (override with JOB_TTL_SECONDS)
+JOB_TTL_SECONDS = int(os.environ.get("JOB_TTL_SECONDS", 3600))
+
+
+class Job:
+    """
+    A batch of entities processed in the background by the pipeline.
+
+    Results are stored in completion order in `events`, each one tagged with its
+    input position so clients can rebuild the original order. The entities may be a
+    lazy stream (e.g. a file still being read), so the total is only known at the end.
+    """
+
+    def __init__(self, entities: Iterable[str], query: str, max_workers: int = DEFAULT_MAX_WORKERS,
+                 use_cache: bool = True, llm_batch_size: int = DEFAULT_LLM_BATCH_SIZE,
+                 run_id: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.run_id = run_id
+        self.entities = entities
+        self.total = None  # known once the input has been read to the end
+        self.read = 0
+        self.query = query
+        self.max_workers = max_workers
+        self.use_cache = use_cache
+        self.llm_batch_size = llm_batch_size
+        self.status = "pending"
+        self.error = None
+        self.events = []
+        self.created_at = time.time()
+        self.finished_at = None
+        self._condition = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def run(self):
+        """
+        Process every entity, publishing each result as soon as it is available.
+        """
+        with self._condition:
+            self.status = "running"
+        try:
+            if self.run_id:
+                results = iter_resumable(self._count(self.entities), self.query, self.run_id,
+                                         max_workers=self.max_workers, use_cache=self.use_cache,
+                                         llm_batch_size=self.llm_batch_size)
+            else:
+                results = iter_pipeline(self._count(self.entities), self.query, max_workers=self.max_workers,
+                                        use_cache=self.use_cache, llm_batch_size=self.llm_batch_size)
+            for index, result in results:
+                event = {"index": index, **result.row(), "logs": result.logs.to_list()}
+                with self._condition:
+                    self.events.append(event)
+                    self._condition.notify_all()
+            final_status = "done"
+        except Exception as e:
+            logging.error(f"Job {self.id} failed: {e}")
+            self.error = str(e)
+            final_status = "failed"
+
+        with self._condition:
+            self.status = final_status
+            self.finished_at = time.time()
+            self._condition.notify_all()
+        logging.info(f"Job {self.id} finished with status '{final_status}'.")
+
+    def _count(self, entities: Iterable[str]) -> Iterator[str]:
+        for entity in entities:
+            with self._condition:
+                self.read += 1
+            yield entity
+        with self._condition:
+            self.total = self.read
+
+    def summary(self) -> Dict:
+        """
+        Return the pollable status of the job.
+        """
+        with self._condition:
+            return {
+                "job_id": self.id,
+                "run_id": self.run_id,
+                "status": self.status,
+                "total": self.total,
+                "read": self.read,
+                "completed": len(self.events),
+                "error": self.error,
+                "created_at": self.created_at,
+                "finished_at": self.finished_at,
+            }
+
+    def results(self) -> Dict:
+        """
+        Return the results finished so far in input order, plus the collected logs (at most
+        MAX_RESPONSE_LOGS lines).
+        """
+        with self._condition:
+            events = sorted(self.events, key=lambda event: event["index"])
+        logs = LogLines((line for event in events for line in event["logs"]), limit=MAX_RESPONSE_LOGS).to_list()
+        results = [{key: event[key] for key in ("entity", "email", "status", "source", "error")} for event in events]
+        return {**self.summary(), "results": results, "logs": logs}
+
+    def follow(self, start: int = 0, timeout: Optional[float] = None) -> Iterator[Dict]:
+        """
+        Yield the results in completion order, blocking until new ones arrive.
+
+        Args:
+            start (int): Number of already received events to skip (to resume a stream).
+            timeout (float): Give up after waiting this many seconds for a new event.
+
+        Yields:
+            dict: One event per finished entity.
+        """
+        position = max(0, start)
+        while True:
+            with self._condition:
+                if position >= len(self.events) and not self.finished:
+                    if not self._condition.wait_for(
+                            lambda: position < len(self.events) or self.finished, timeout=timeout):
+                        return
+                pending = self.events[position:]
+                finished = self.finished
+            for event in pending:
+                yield event
+            position += len(pending)
+            if finished and not pending:
+                return
+
+
+class JobStore:
+    """
+    In-process registry of background jobs, no external services required.
+    """
+
+    def __init__(self, ttl: int = JOB_TTL_SECONDS):
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, entities: Iterable[str], query: str, max_workers: int = DEFAULT_MAX_WORKERS,
+               use_cache: bool = True, llm_batch_size: int = DEFAULT_LLM_BATCH_SIZE,
+               run_id: Optional[str] = None) -> Job:
+        """
+        Create a job and start processing it in a background thread.
+
+        Args:
+            entities (Iterable[str]): The entities to process, read lazily by the job.
+            query (str): The user's question.
+            max_workers (int): Maximum number of entities processed in parallel.
+            use_cache (bool): Use the response cache (default is True).
+            llm_batch_size (int): Entities answered per LLM request (1 disables batching).
+            run_id (str): Checkpoint the results under this run so it can be resumed (optional).
+
+        Returns:
+            Job: The newly created job.
+        """
+        self._expire()
+        job = Job(entities, query, max_workers=max_workers, use_cache=use_cache, llm_batch_size=llm_batch_size,
+                  run_id=run_id)
+        with self._lock:
+            self._jobs[job.id] = job
+        threading.Thread(target=job.run, name=f"job-{job.id[:8]}", daemon=True).start()
+        logging.info(f"Job {job.id} submitted.")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _expire(self):
+        # Drop finished jobs whose results have been kept long enough
+        now = time.time()
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at and now - job.finished_at > self.ttl]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+
+# Shared store used by the Flask app
+job_store = JobStore()
@@ -1,71 +1,221 @@
-from query import search_urls,load_data
-from scraping import scrape_essential_info
-from LLM_groq import query_llm_from_text
-from config import Bing_api_key, groq_api_key
-
-def main():
-   
-
-
-    # Example for single entry
-    query = "What is email of company Reliance"
-
-    # Pipeline
-    url = search_urls(query,Bing_api_key)[0]
-    scrapped_text = scrape_essential_info(url)
-    result = query_llm_from_text(scrapped_text,query, api_key=groq_api_key)
-    print(result)
-
-
-    # # For multiple Entities in the columns {uncomment to run for multiple entries}
-    
-    # query = "What is email of company"
-    # file_path= r'C:\Users\RDRL\Desktop\Desktop\Checkit\Project BreakoutAI - front-end\project\backend\app\uploads\test csv - Sheet1.csv'
-    # df = load_data(file_path)
-    
-    # selected_column = df.columns[0]
-    # # Extract unique entities from the selected column
-    # entities = df[selected_column]
-    
-    # results = {}
-    # for entity in entities:
-    #     # Formulate the query
-    #     query_new = f"{query} {entity}"
-
-    #     # Process query to get relevant web content
-
-    #     url = search_urls(query,Bing_api_key)[0]
-        
-
-    #     extracted_text = scrape_essential_info(url)
-
-        
-    #     if extracted_text == "notfound":
-
-    #         results[entity] = "notfound"
-    #         continue
-
-    #     # Query the LLM with the extracted content to retrieve the required information
-    #     llm_response = query_llm_from_text(extracted_text,query=query_new,api_key=groq_api_key)
-        
-    #     if llm_response == "LLM error":
-    #         results[entity] = "LLM error"
-    #     else:
-    #         results[entity] = llm_response
-
-    # # Create the final response structure
-    # final_results = []
-    
-    # for entity in entities:
-       
-    #     email = results.get(entity, "notfound")
-    #     final_results.append({
-    #         "entity": entity,
-    #         "email": email,
-    #         "status": "success" if email != "notfound" else "Not found"
-    #     })
-    #     print(f'# {entity} ------- {email}')
-        
+"""
+Headless batch runner: processes one column of an input file outside the Flask service.
+
+Usage (from the backend/app directory):
+    python main.py companies.csv --column name --query "What is email of company" -o results.csv
+    python main.py companies.parquet -q "What is phone number of company" -w 16 -o results.sqlite
+    python main.py companies.csv -q "What is email of company" --dry-run
+
+Entities go through the same pipeline as /api/process, with --workers of them in flight.
+Results are written to the output as they finish (CSV, JSON Lines or SQLite, picked from
+the extension or --format; JSON Lines on stdout by default) while a throughput and ETA
+readout is kept on stderr. Runs are checkpointed like uploads, so running the same file,
+column and query again resumes where an interrupted run stopped. --dry-run answers from
+the local stub providers (app/stubs.py) without touching the caches, indexes or checkpoints.
+"""
+import sys
+import time
+import argparse
+import contextlib
+from collections import Counter
+from typing import Iterable, Iterator, Optional, TextIO, Tuple
+from ingest import iter_entities, IngestError
+from pipeline import iter_pipeline, DEFAULT_MAX_WORKERS, DEFAULT_LLM_BATCH_SIZE
+from records import EntityResult
+from settings import configure_logging
+from sinks import open_sink
+
+
+# Seconds between progress lines when stderr is not a terminal
+PROGRESS_INTERVAL = 10.0
+
+
+class Progress:
+    """
+    Live readout of a batch on stderr: entities done, found and failed, throughput and ETA.
+
+    On a terminal the line is redrawn in place (at most five times a second), otherwise a
+    line is printed every PROGRESS_INTERVAL seconds. The ETA is known once the input has
+    been read to the end; until then the number of entities read so far is shown.
+    """
+
+    def __init__(self, stream: TextIO = sys.stderr, enabled: bool = True):
+        self.stream = stream
+        self.enabled = enabled
+        self.live = enabled and stream.isatty()
+        self.started = time.monotonic()
+        self.shown_at = 0.0
+        self.read = 0
+        self.total = None
+        self.done = 0
+        self.statuses = Counter()
+
+    def count(self, entities: Iterable[str]) -> Iterator[str]:
+        """
+        Pass the entities through, counting them (the total is set once they run out).
+        """
+        for entity in entities:
+            self.read += 1
+            yield entity
+        self.total = self.read
+
+    def update(self, result: EntityResult):
+        self.done += 1
+        self.statuses[result.status] += 1
+        now = time.monotonic()
+        if self.enabled and now - self.shown_at >= (0.2 if self.live else PROGRESS_INTERVAL):
+            self.shown_at = now
+            self._show(self.line())
+
+    def rate(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def line(self) -> str:
+        rate = self.rate()
+        total = str(self.total) if self.total is not None else f"{self.read}+"
+        eta = format_duration((self.total - self.done) / rate) if self.total is not None and rate > 0 else "?"
+        return (f"{self.done}/{total} done, {self.statuses['success']} found, {self.statuses['error']} failed"
+                f" | {rate:.2f} entities/s | elapsed {format_duration(time.monotonic() - self.started)}"
+                f" | ETA {eta}")
+
+    def _show(self, line: str):
+        self.stream.write("\r\033[K" + line if self.live else line + "\n")
+        self.stream.flush()
+
+    def finish(self):
+        if self.enabled:
+            self._show(self.line())
+            if self.live:
+                self.stream.write("\n")
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+
+
+def iter_batch(file_path: str, query: str, column: Optional[str] = None, max_workers: int = DEFAULT_MAX_WORKERS,
+               use_cache: bool = True, llm_batch_size: int = DEFAULT_LLM_BATCH_SIZE, checkpoint: bool = True,
+               restart: bool = False, progress: Optional[Progress] = None) -> Iterator[Tuple[int, EntityResult]]:
+    """
+    Stream the results of one column of an input file in completion order.
+
+    Args:
+        file_path (str): Path to the CSV (optionally gzipped), Excel or Parquet file.
+        query (str): The question asked for every entity.
+        column (str): Column holding the entities, defaults to the first column.
+        max_workers (int): Maximum number of entities processed in parallel.
+        use_cache (bool): Use the response cache and the entity index (default is True).
+        llm_batch_size (int): Entities answered per LLM request (1 disables batching).
+        checkpoint (bool): Checkpoint the run so it can be resumed (when checkpointing is on).
+        restart (bool): Start a checkpointed run over instead of resuming it.
+        progress (Progress): Counts the entities read, for the ETA.
+
+    Yields:
+        tuple: (input position, EntityResult).
+
+    Raises:
+        IngestError: If the file or column cannot be read.
+    """
+    from checkpoints import checkpoint_store, iter_resumable, file_digest, make_run_id
+
+    # Validate the column before a run is registered for the file
+    entities = iter_entities(file_path, column)
+    if progress is not None:
+        entities = progress.count(entities)
+
+    if checkpoint and checkpoint_store.enabled:
+        file_hash = file_digest(file_path)
+        run_id = make_run_id(file_hash, query, column)
+        checkpoint_store.start_run(run_id, query, file_hash=file_hash, column=column, restart=restart)
+        print(f"Run {run_id}: finished entities of earlier attempts are reused.", file=sys.stderr)
+        yield from iter_resumable(entities, query, run_id, max_workers=max_workers, use_cache=use_cache,
+                                  llm_batch_size=llm_batch_size)
+    else:
+        yield from iter_pipeline(entities, query, max_workers=max_workers, use_cache=use_cache,
+                                 llm_batch_size=llm_batch_size)
+
+
+def dry_run_providers():
+    """
+    Point the pipeline at the local stub Bing and Groq and keep its stores untouched.
+
+    Stub answers must not end up in the response cache, the entity and site indexes or the
+    checkpoints, so all of them are switched off for the process.
+    """
+    from stubs import StubProviders
+    from cache import response_cache
+    from entity_index import entity_index
+    from search import local_search
+    from checkpoints import checkpoint_store
+
+    for store in (response_cache, entity_index, local_search, checkpoint_store):
+        store.enabled = False
+    return StubProviders()
+
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="CSV (optionally gzipped), TSV, Excel or Parquet file")
+    parser.add_argument("-q", "--query", required=True,
+                        help='question asked for every entity, e.g. "What is email of company"')
+    parser.add_argument("-c", "--column", help="column holding the entities (default: the first column)")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_MAX_WORKERS,
+                        help=f"entities processed in parallel (default: {DEFAULT_MAX_WORKERS})")
+    parser.add_argument("-o", "--output", default="-", help="output file, or - for stdout (default)")
+    parser.add_argument("-f", "--format", choices=["csv", "jsonl", "sqlite"],
+                        help="output format (default: from the output extension, else jsonl)")
+    parser.add_argument("--llm-batch-size", type=int, default=DEFAULT_LLM_BATCH_SIZE,
+                        help="entities answered per LLM request (1 disables batching)")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the response cache and the entity index")
+    parser.add_argument("--no-checkpoint", action="store_true", help="do not checkpoint the run")
+    parser.add_argument("--restart", action="store_true", help="start a checkpointed run over instead of resuming it")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="answer from the local stub providers, leaving caches, indexes and checkpoints untouched")
+    parser.add_argument("--no-progress", action="store_true", help="do not show the progress readout")
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.llm_batch_size < 1:
+        parser.error("--llm-batch-size must be at least 1")
+    return args
+
+
+def main(argv: Optional[list] = None) -> int:
+    args = parse_args(argv)
+
+    # Set stdout encoding to UTF-8 and configure logging once for the whole CLI
+    sys.stdout.reconfigure(encoding='utf-8')
+    configure_logging()
+
+    providers = dry_run_providers() if args.dry_run else contextlib.nullcontext()
+    progress = Progress(enabled=not args.no_progress)
+    try:
+        with providers, open_sink(args.output, args.format) as sink:
+            results = iter_batch(args.input, args.query, column=args.column, max_workers=args.workers,
+                                 use_cache=not args.no_cache, llm_batch_size=args.llm_batch_size,
+                                 checkpoint=not args.no_checkpoint, restart=args.restart, progress=progress)
+            for position, result in results:
+                sink.write({"position": position, **result.row(), "url": result.url})
+                progress.update(result)
+    except (IngestError, ValueError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    except KeyboardInterrupt:
+        progress.finish()
+        print("Interrupted.", file=sys.stderr)
+        return 130
+
+    progress.finish()
+    print(f"Finished: {dict(progress.statuses)}" + (f", written to {args.output}" if args.output != "-" else ""),
+          file=sys.stderr)
+    return 0
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,313 @@
+import os
+import time
+import json
+import logging
+import functools
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Tuple
+from settings import env_flag
+
+
+# METRICS_ENABLED=0 turns the counters and timing spans into no-ops
+METRICS_ENABLED = env_flag("METRICS_ENABLED")
+
+# Per-request profiling: off unless PROFILE_ENABLED=1; reports are written to PROFILE_DIR
+PROFILE_ENABLED = env_flag("PROFILE_ENABLED", default=False)
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+
+# Upper bounds (seconds) of the stage latency histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+PREFIX = "breakout_"
+
+# Help text of every metric, also used to declare its type
+METRICS = {
+    "stage_duration_seconds": ("histogram", "Time spent in each pipeline stage."),
+    "stage_errors_total": ("counter", "Pipeline stages that raised an exception."),
+    "cache_requests_total": ("counter", "Response cache lookups and writes by layer and result."),
+    "fetch_requests_total": ("counter", "HTTP responses read by the shared fetcher, by status class."),
+    "fetch_bytes_total": ("counter", "Response body bytes downloaded by the shared fetcher."),
+    "search_requests_total": ("counter", "Searches by provider and outcome (local hits skip the paid search)."),
+    "provider_calls_total": ("counter", "Provider call attempts that went out, by provider."),
+    "provider_retries_total": ("counter", "Provider calls retried after a transient error."),
+    "provider_failures_total": ("counter", "Provider calls that failed after every attempt, by reason."),
+    "llm_tokens_total": ("counter", "Tokens reported by the LLM provider, by kind."),
+    "singleflight_calls_total": ("counter", "Searches, page fetches and LLM calls actually run, by operation."),
+    "singleflight_collapsed_total": ("counter", "Calls that waited for an identical in-flight call instead of running, by operation."),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Metrics:
+    """
+    In-process registry of counters and latency histograms, rendered in the Prometheus text format.
+
+    Every worker thread records into the same registry; updates take a single lock and
+    only touch a dict entry, so instrumenting hot paths costs well under a microsecond.
+    """
+
+    def __init__(self, enabled: bool = METRICS_ENABLED, buckets: Tuple[float, ...] = DURATION_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], list] = {}
+        self._samples: Optional[Dict[Tuple[str, Labels], list]] = None
+        self._lock = threading.Lock()
+
+    def keep_samples(self, enabled: bool = True):
+        """
+        Also keep every observed value, so exact percentiles can be computed (used by the benchmarks).
+        """
+        with self._lock:
+            self._samples = {} if enabled else None
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        """
+        Add `amount` to a counter.
+        """
+        if not self.enabled or not amount:
+            return
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        """
+        Record one value (e.g. a duration in seconds) in a histogram.
+        """
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # Per-bucket counts (the last one is +Inf), then the sum and count of the values
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            histogram[index] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+            if self._samples is not None:
+                self._samples.setdefault(key, []).append(value)
+
+    def snapshot(self) -> Dict:
+        """
+        Return the counters and the count / total seconds of each stage, as plain dicts.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: list(values) for key, values in self._histograms.items()}
+        return {
+            "counters": [{"name": name, "labels": dict(labels), "value": value}
+                         for (name, labels), value in sorted(counters.items())],
+            "stages": [{"name": name, "labels": dict(labels), "count": values[-1], "seconds": round(values[-2], 6)}
+                       for (name, labels), values in sorted(histograms.items())],
+        }
+
+    def percentiles(self, name: str, percents: Tuple[float, ...] = (50, 99)) -> Dict[str, Dict[str, float]]:
+        """
+        Exact percentiles of the values kept since keep_samples(), by the histogram's first label value.
+
+        Returns:
+            dict: e.g. {"fetch": {"count": 12, "p50": 0.01, "p99": 0.2}} for stage_duration_seconds.
+        """
+        with self._lock:
+            samples = {key: sorted(values) for key, values in (self._samples or {}).items() if key[0] == name}
+        result = {}
+        for (_, labels), values in sorted(samples.items()):
+            label = labels[0][1] if labels else ""
+            result[label] = {"count": len(values)}
+            for percent in percents:
+                # Nearest-rank percentile
+                rank = max(1, -(-len(values) * percent // 100))
+                result[label][f"p{percent:g}"] = values[int(rank) - 1]
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            if self._samples is not None:
+                self._samples.clear()
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format (version 0.0.4).
+        """
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, list(values)) for key, values in self._histograms.items())
+
+        lines = []
+        declared = set()
+
+        def declare(name: str):
+            if name not in declared:
+                declared.add(name)
+                kind, text = METRICS.get(name, ("untyped", name))
+                lines.append(f"# HELP {PREFIX}{name} {text}")
+                lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+        for (name, labels), value in counters:
+            declare(name)
+            lines.append(f"{PREFIX}{name}{format_labels(labels)} {format_value(value)}")
+        for (name, labels), values in histograms:
+            declare(name)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else format_value(bound)
+                lines.append(f"{PREFIX}{name}_bucket{format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{PREFIX}{name}_sum{format_labels(labels)} {format_value(values[-2])}")
+            lines.append(f"{PREFIX}{name}_count{format_labels(labels)} {values[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+def format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_gauges(gauges: Dict[str, Tuple[str, Dict[Labels, float]]]) -> str:
+    """
+    Render point-in-time values owned by other modules (cache size, limiter state) as gauges.
+
+    Args:
+        gauges (dict): {name: (help text, {labels: value})}.
+    """
+    lines = []
+    for name, (text, samples) in gauges.items():
+        lines.append(f"# HELP {PREFIX}{name} {text}")
+        lines.append(f"# TYPE {PREFIX}{name} gauge")
+        for labels, value in samples.items():
+            lines.append(f"{PREFIX}{name}{format_labels(labels)} {format_value(value)}")
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+@contextmanager
+def span(stage: str, **fields) -> Iterator[Dict]:
+    """
+    Time a pipeline stage into the stage_duration_seconds histogram.
+
+    The span is also logged at DEBUG level as one JSON object ({"span", "seconds", "error",
+    plus `fields`}), so traces can be pulled out of the logs. Callers may add fields to the
+    yielded dict while the span runs (e.g. the bytes a fetch returned).
+    """
+    if not metrics.enabled:
+        yield fields
+        return
+    started = time.perf_counter()
+    error = None
+    try:
+        yield fields
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.observe("stage_duration_seconds", elapsed, stage=stage)
+        if error:
+            metrics.inc("stage_errors_total", stage=stage, error=error)
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(json.dumps(dict(fields, span=stage, seconds=round(elapsed, 6), error=error), default=str))
+
+
+def timed(stage: str) -> Callable:
+    """
+    Decorator running the whole function inside span(stage).
+    """
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class Profiler:
+    """
+    Profile one request with pyinstrument when installed, cProfile otherwise.
+
+    Only the thread that handles the request is profiled; time spent in the pipeline's worker
+    threads shows up there as waiting, and is broken down by the stage spans instead.
+    cProfile allows one active profiler per process (Python 3.12+ refuses a second one), so
+    a request arriving while another is profiled with it is served without a profile.
+    """
+
+    # Held by the request being profiled with cProfile
+    _cprofile_lock = threading.Lock()
+
+    def __init__(self, name: str, directory: str = PROFILE_DIR):
+        self.name = name
+        self.directory = directory
+        self.path = None
+        self.active = False
+        try:
+            from pyinstrument import Profiler as Instrument
+            self._profiler = Instrument()
+            self.kind = "pyinstrument"
+        except ImportError:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self.kind = "cprofile"
+
+    def start(self):
+        if self.kind == "pyinstrument":
+            self._profiler.start()
+            self.active = True
+            return
+        if not self._cprofile_lock.acquire(blocking=False):
+            logging.info(f"Another request is being profiled, not profiling {self.name}")
+            return
+        try:
+            self._profiler.enable()
+        except ValueError as e:
+            # Another profiling tool (e.g. a debugger or an outer cProfile run) is active
+            self._cprofile_lock.release()
+            logging.info(f"Not profiling {self.name}: {e}")
+            return
+        self.active = True
+
+    def stop(self) -> Optional[str]:
+        """
+        Stop profiling and write the report (HTML for pyinstrument, pstats for cProfile).
+
+        Returns:
+            str: Path of the report, or None if it could not be written or profiling was skipped.
+        """
+        if not self.active:
+            return None
+        self.active = False
+        if self.kind == "cprofile":
+            self._profiler.disable()
+            self._cprofile_lock.release()
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        try:
+            if self.kind == "pyinstrument":
+                self._profiler.stop()
+                self.path = os.path.join(self.directory, f"{self.name}-{stamp}.html")
+                with open(self.path, "w", encoding="utf-8") as f:
+                    f.write(self._profiler.output_html())
+            else:
+                self.path = os.path.join(self.directory, f"{self.name}-{stamp}.pstats")
+                self._profiler.dump_stats(self.path)
+        except (OSError, ValueError) as e:
+            logging.error(f"Could not write the profile of {self.name}: {e}")
+            return None
+        logging.info(f"Profile of {self.name} written to {self.path}")
+        return self.path
+
+
+# Shared registry used across the application
+metrics = Metrics()
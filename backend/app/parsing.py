@@ -0,0 +1,123 @@
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import List, Tuple
+from extraction import extract_page, _resolve_parser, HTML_PARSER
+from records import PageRecord
+
+
+# Worker processes parsing pages: 0 parses in the calling thread (default), "auto" uses one per CPU core
+PARSE_WORKERS = os.environ.get("PARSE_WORKERS", "0")
+
+# Pages smaller than this are parsed in-process, sending them to a worker would cost more than it saves
+PARSE_MIN_BYTES = int(os.environ.get("PARSE_MIN_BYTES", 32 * 1024))
+
+# Pages at least this large reach the workers through shared memory instead of being pickled
+PARSE_SHARED_MEMORY_BYTES = int(os.environ.get("PARSE_SHARED_MEMORY_BYTES", 512 * 1024))
+
+
+def worker_count(setting) -> int:
+    """
+    Number of parse workers for a PARSE_WORKERS value ("auto", or a count, 0 for none).
+    """
+    if str(setting).strip().lower() == "auto":
+        return os.cpu_count() or 1
+    try:
+        return max(0, int(setting))
+    except (TypeError, ValueError):
+        logging.warning(f"Invalid PARSE_WORKERS value {setting!r}, parsing in-process.")
+        return 0
+
+
+def _extract_shared(name: str, size: int, url: str, parser: str, encoding: str) -> Tuple[PageRecord, List]:
+    # Runs in a worker: decode straight from the shared block, without copying it to bytes first
+    # Spawned workers share the parent's resource tracker, so attaching never causes a second unlink
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        view = block.buf[:size]
+        try:
+            return extract_page(view, url, parser, encoding)
+        finally:
+            view.release()
+    finally:
+        block.close()
+
+
+class ParsePool:
+    """
+    Runs extraction.extract_page in worker processes, so parsing big pages scales across cores.
+
+    Fetching stays in the calling threads; only the page bytes go to a worker and only the
+    small PageRecord comes back. Pages of PARSE_SHARED_MEMORY_BYTES or more are
+    written once into a shared memory block that the worker decodes in place, smaller
+    ones are pickled. Results are identical to parsing in-process, which is also the
+    fallback when the pool is disabled or a worker dies.
+
+    Workers are started lazily with the "spawn" method, so they never inherit the locks
+    of the multi-threaded server.
+    """
+
+    def __init__(self, workers=PARSE_WORKERS, min_bytes: int = PARSE_MIN_BYTES,
+                 shared_memory_bytes: int = PARSE_SHARED_MEMORY_BYTES):
+        self.workers = worker_count(workers)
+        self.min_bytes = min_bytes
+        self.shared_memory_bytes = shared_memory_bytes
+        self.parser = _resolve_parser(HTML_PARSER)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def extract(self, content: bytes, url: str, encoding: str = "utf-8") -> Tuple[PageRecord, List]:
+        """
+        Extract a page's data, in a worker when the pool is enabled and the page is large enough.
+
+        Args:
+            content (bytes): The raw page HTML.
+            url (str): The page URL.
+            encoding (str): Encoding of the bytes, decoded once by the parser.
+
+        Returns:
+            tuple: (extracted PageRecord, (href, anchor text) links), as extraction.extract_page.
+        """
+        if not self.workers or len(content) < self.min_bytes:
+            return extract_page(content, url, self.parser, encoding)
+        try:
+            if len(content) >= self.shared_memory_bytes:
+                return self._extract_shared(content, url, encoding)
+            return self._pool().submit(extract_page, content, url, self.parser, encoding).result()
+        except BrokenProcessPool as e:
+            logging.error(f"Parse worker died on {url}, restarting the pool: {e}")
+            self._reset()
+            return extract_page(content, url, self.parser, encoding)
+
+    def _extract_shared(self, content: bytes, url: str, encoding: str) -> Tuple[PageRecord, List]:
+        block = shared_memory.SharedMemory(create=True, size=len(content))
+        try:
+            block.buf[:len(content)] = content
+            return self._pool().submit(_extract_shared, block.name, len(content), url, self.parser, encoding).result()
+        finally:
+            block.close()
+            block.unlink()
+
+    def _reset(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        self._reset()
+
+
+# Shared pool used by scraping.scrape_page
+parse_pool = ParsePool()
@@ -0,0 +1,333 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+from query import search_urls
+from fanout import scrape_best, domain_match, OWN_SITE_MATCH
+from search import local_search
+from LLM_groq import query_llm_from_text, query_llm_batch
+from resolver import classify_intent, resolve_from_fields, SOURCE_RULE, SOURCE_LLM, SOURCE_LLM_BATCH, SOURCE_NONE, SOURCE_INDEX
+from entity_index import entity_index, normalize_entity
+from singleflight import flights
+from ratelimit import Failure
+from records import EntityResult, LogLines, PageRecord, PreparedEntity
+from settings import defaults
+
+
+# Default number of entities processed at the same time (PIPELINE_MAX_WORKERS; see settings.Config)
+DEFAULT_MAX_WORKERS = defaults.max_workers
+
+# Entities answered per LLM request; 1 disables batching (PIPELINE_LLM_BATCH_SIZE; see settings.Config)
+DEFAULT_LLM_BATCH_SIZE = defaults.llm_batch_size
+
+# "error" of entities whose processing raised; like failed provider calls they stay retryable
+UNEXPECTED_ERROR = "exception"
+
+
+def prepare_entity(entity: str, query: str, use_cache: bool = True) -> Union[EntityResult, PreparedEntity]:
+    """
+    Run the search -> scrape stages for a single entity, then try to answer from the extracted fields.
+
+    The entity index is consulted first: a fresh answer to the query's intent is returned
+    without any network call, and a fresh extracted record skips search and scraping.
+    Otherwise the top search results are scraped concurrently (see fanout.scrape_best), the
+    most confident page is kept and written back to the index.
+
+    Args:
+        entity (str): The entity (e.g. company name) to look up.
+        query (str): The user's question, the entity is appended to it.
+        use_cache (bool): Use the response cache and the entity index for lookups (default is True).
+
+    Returns:
+        EntityResult if the entity is already answered, else the PreparedEntity (extracted
+        record and query) still to be answered by the LLM.
+    """
+    logs = LogLines()
+    query_new = f"{query} {entity}"
+    logs.append(f"Processing query for: {entity}")
+
+    try:
+        # Entities seen in earlier uploads (under any spelling) skip the network entirely or partly
+        known = entity_index.lookup(entity, query) if use_cache else {}
+        if "answer" in known:
+            logs.append(f"Answered {entity} from the entity index.")
+            return EntityResult(entity, known["answer"]["answer"], SOURCE_INDEX, url=known["answer"]["url"],
+                                logs=logs)
+
+        if "record" in known:
+            url, extracted = known["record"]["url"], known["record"]["record"]
+            logs.append(f"Reusing the indexed page of {entity}: {url}")
+        else:
+            # Spellings of one entity in flight at the same time (e.g. in one upload) share the lookup
+            found = flights["entity"].do((normalize_entity(entity), query, use_cache), find_page, entity, query,
+                                         use_cache)
+            if isinstance(found, Failure):
+                return failed_entity(entity, found, logs)
+            url, extracted, page_logs = found
+            logs.extend(page_logs)
+            if url is None:
+                return EntityResult(entity, "notfound", SOURCE_NONE, logs=logs)
+
+        if not extracted:
+            logs.append(f"No relevant data found for {entity}.")
+            return EntityResult(entity, "notfound", SOURCE_NONE, logs=logs)
+
+        # Skip the LLM when the extracted fields hold exactly one candidate answer
+        # Judged on the user's question alone, the entity name must not decide the intent
+        answer = resolve_from_fields(query, extracted)
+        if answer is not None:
+            logs.append(f"Answered {entity} from the extracted fields.")
+            return EntityResult(entity, answer, SOURCE_RULE, url=url, logs=logs)
+
+        return PreparedEntity(entity, query_new, extracted, url=url, logs=logs)
+
+    except Exception as e:
+        logging.error(f"Error while processing {entity}: {e}")
+        logs.append(f"Error while processing {entity}: {e}")
+        return EntityResult(entity, "notfound", SOURCE_NONE, error=UNEXPECTED_ERROR, logs=logs)
+
+
+def find_page(entity: str, query: str, use_cache: bool = True) -> Union[Failure, Tuple[Optional[str], Optional[PageRecord], List[str]]]:
+    """
+    Search for an entity and scrape the best page of the results, storing it in the entity index.
+
+    Returns:
+        tuple: (URL, extracted record, log lines), URL None when the search found nothing,
+               or the Failure of the search.
+    """
+    # Process query to get relevant web content
+    logging.info(f"Urls search initialised for: {entity}")
+    urls = search_urls(f"{query} {entity}", defaults.bing_api_key, use_cache=use_cache, entity=entity)
+    if isinstance(urls, Failure):
+        return urls
+    if not urls:
+        return None, None, [f"No search results found for {entity}."]
+
+    # Scrape the most promising results concurrently, stopping at the first confident page
+    logging.info(f"Extraction of Data initialised for: {entity}")
+    url, extracted, logs = scrape_best(urls, query, entity, use_cache=use_cache)
+    if extracted:
+        entity_index.save_record(entity, url, extracted)
+        # The entity's own site lets later searches for it skip the paid search
+        if domain_match(url, entity) >= OWN_SITE_MATCH:
+            local_search.add(entity, url, source="pipeline")
+    return url, extracted, logs
+
+
+def failed_entity(entity: str, failure: Failure, logs: LogLines) -> EntityResult:
+    """
+    Result of an entity whose search or LLM call failed; "error" holds the failure reason.
+    """
+    logs.append(f"{failure.provider} call failed for {entity} ({failure.reason}): {failure.message}")
+    answer = "LLM error" if failure.provider == "groq" else "notfound"
+    return EntityResult(entity, answer, SOURCE_NONE, error=failure.reason, logs=logs)
+
+
+def remember_answer(result: EntityResult, query: str):
+    """
+    Write a freshly found answer back to the entity index (not failures, misses or index hits).
+
+    Addresses picked by rule are not stored either: a single street-like block is a good
+    enough guess for one answer, not for serving the same answer for a month.
+    """
+    if result.error or result.answer == "notfound" or result.source in (SOURCE_NONE, SOURCE_INDEX):
+        return
+    if result.source == SOURCE_RULE and classify_intent(query) == "address":
+        return
+    entity_index.save_answer(result.entity, query, result.answer, result.source, result.url)
+
+
+def finish_entity(prepared: PreparedEntity, llm_response: Union[str, Failure], source: str) -> EntityResult:
+    """
+    Turn a prepared entity and its LLM answer into the final result.
+    """
+    if isinstance(llm_response, Failure):
+        return failed_entity(prepared.entity, llm_response, prepared.logs)
+    return EntityResult(prepared.entity, llm_response, source, url=prepared.url, logs=prepared.logs)
+
+
+def process_entity(entity: str, query: str, use_cache: bool = True) -> EntityResult:
+    """
+    Run the search -> scrape -> LLM stages for a single entity.
+
+    Args:
+        entity (str): The entity (e.g. company name) to look up.
+        query (str): The user's question, the entity is appended to it.
+        use_cache (bool): Use the response cache for search, page and LLM calls (default is True).
+
+    Returns:
+        EntityResult: The entity, the answer ("notfound" / "LLM error" on failure), the path that
+                      produced it ("rule", "llm", "index" or "none") and the logs collected for it.
+                      Failed provider calls also set "error" to the failure reason (e.g. "rate_limited").
+    """
+    prepared = prepare_entity(entity, query, use_cache=use_cache)
+    if isinstance(prepared, EntityResult):
+        return prepared
+
+    try:
+        # Query the LLM with the extracted content to retrieve the required information
+        llm_response = query_llm_from_text(prepared.extracted, query=prepared.query, api_key=defaults.groq_api_key,
+                                           use_cache=use_cache)
+        return finish_entity(prepared, llm_response, SOURCE_LLM)
+
+    except Exception as e:
+        logging.error(f"Error while processing {entity}: {e}")
+        prepared.logs.append(f"Error while processing {entity}: {e}")
+        return EntityResult(entity, "notfound", SOURCE_NONE, error=UNEXPECTED_ERROR, logs=prepared.logs)
+
+
+def answer_batch(prepared: List[PreparedEntity], use_cache: bool = True) -> List[EntityResult]:
+    """
+    Answer several prepared entities with batched LLM requests.
+
+    Args:
+        prepared (list): Results of prepare_entity still waiting for an answer.
+        use_cache (bool): Use the response cache for LLM calls (default is True).
+
+    Returns:
+        list: Final results, in the same order as `prepared`.
+    """
+    try:
+        answers = query_llm_batch([(item.extracted, item.query) for item in prepared],
+                                  api_key=defaults.groq_api_key, use_cache=use_cache, max_batch_size=len(prepared))
+    except Exception as e:
+        logging.error(f"Error while answering a batch of {len(prepared)} entities: {e}")
+        for item in prepared:
+            item.logs.append(f"Error while processing {item.entity}: {e}")
+        return [EntityResult(item.entity, "notfound", SOURCE_NONE, error=UNEXPECTED_ERROR, logs=item.logs)
+                for item in prepared]
+    return [finish_entity(item, answer, SOURCE_LLM_BATCH) for item, answer in zip(prepared, answers)]
+
+
+def iter_pipeline(entities: Iterable[str], query: str, max_workers: int = DEFAULT_MAX_WORKERS,
+                  use_cache: bool = True, llm_batch_size: int = DEFAULT_LLM_BATCH_SIZE) -> Iterator[Tuple[int, EntityResult]]:
+    """
+    Process entities concurrently, yielding results as soon as each one finishes.
+
+    At most `max_workers` tasks are in flight at any time and the input iterable is
+    consumed lazily, so entities can be fed in while they are still being read.
+
+    With `llm_batch_size` > 1 the search and scrape stages still run per entity, but
+    entities waiting for the LLM are grouped and answered with batched requests.
+
+    Args:
+        entities (Iterable[str]): The entities to process.
+        query (str): The user's question.
+        max_workers (int): Maximum number of entities processed in parallel.
+        use_cache (bool): Use the response cache (default is True).
+        llm_batch_size (int): Entities answered per LLM request (1 disables batching).
+
+    Yields:
+        tuple: (input position, EntityResult from process_entity) in completion order.
+    """
+    max_workers = max(1, int(max_workers))
+    batching = llm_batch_size > 1
+    source = iter(enumerate(entities))
+    exhausted = False
+    waiting = []  # (position, prepared entity) pairs waiting for a batched LLM call
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline") as executor:
+        in_flight = {}  # future -> ("entity" or "batch", input positions it covers)
+
+        def submit_next() -> bool:
+            nonlocal exhausted
+            if exhausted:
+                return False
+            try:
+                index, entity = next(source)
+            except StopIteration:
+                exhausted = True
+                return False
+            task = prepare_entity if batching else process_entity
+            in_flight[executor.submit(task, entity, query, use_cache)] = ("entity", [index])
+            return True
+
+        def submit_batch():
+            batch = waiting[:llm_batch_size]
+            del waiting[:llm_batch_size]
+            future = executor.submit(answer_batch, [item for _, item in batch], use_cache)
+            in_flight[future] = ("batch", [index for index, _ in batch])
+
+        # Fill the window, then keep it full as tasks complete
+        while len(in_flight) < max_workers and submit_next():
+            pass
+        while in_flight or waiting:
+            done = wait(in_flight, return_when=FIRST_COMPLETED)[0] if in_flight else set()
+            for future in done:
+                kind, indices = in_flight.pop(future)
+                result = future.result()
+                if kind == "batch":
+                    for index, item in zip(indices, result):
+                        remember_answer(item, query)
+                        yield index, item
+                elif isinstance(result, EntityResult):
+                    remember_answer(result, query)
+                    yield indices[0], result
+                else:
+                    waiting.append((indices[0], result))
+
+            # Send a batch once it is full, or whatever is left once no more entities can join it
+            preparing = any(kind == "entity" for kind, _ in in_flight.values())
+            while waiting and (len(waiting) >= llm_batch_size or (exhausted and not preparing)):
+                submit_batch()
+            while len(in_flight) < max_workers and submit_next():
+                pass
+
+
+def run_pipeline(entities: Iterable[str], query: str, max_workers: int = DEFAULT_MAX_WORKERS,
+                 use_cache: bool = True, llm_batch_size: int = DEFAULT_LLM_BATCH_SIZE) -> List[EntityResult]:
+    """
+    Process entities concurrently and return the results in input order.
+
+    Args:
+        entities (Iterable[str]): The entities to process.
+        query (str): The user's question.
+        max_workers (int): Maximum number of entities processed in parallel.
+        use_cache (bool): Use the response cache (default is True).
+        llm_batch_size (int): Entities answered per LLM request (1 disables batching).
+
+    Returns:
+        list: One EntityResult per entity, in the same order as `entities`.
+    """
+    return collect_ordered(iter_pipeline(entities, query, max_workers=max_workers, use_cache=use_cache,
+                                         llm_batch_size=llm_batch_size))
+
+
+def collect_ordered(indexed_results: Iterable[Tuple[int, EntityResult]]) -> List[EntityResult]:
+    """
+    Gather (input position, result) pairs yielded in completion order into an input-ordered list.
+    """
+    results = dict(indexed_results)
+    return [results[index] for index in range(len(results))]
+
+
+def parse_max_workers(value: Optional[str]) -> int:
+    """
+    Parse a user supplied parallelism limit, falling back to the default.
+
+    Args:
+        value (str): The raw value (e.g. from a form field), may be None.
+
+    Returns:
+        int: A positive number of workers.
+    """
+    try:
+        return max(1, int(value)) if value else DEFAULT_MAX_WORKERS
+    except (TypeError, ValueError):
+        return DEFAULT_MAX_WORKERS
+
+
+def parse_batch_size(value: Optional[str]) -> int:
+    """
+    Parse a user supplied LLM batch size, falling back to the default.
+    """
+    try:
+        return max(1, int(value)) if value else DEFAULT_LLM_BATCH_SIZE
+    except (TypeError, ValueError):
+        return DEFAULT_LLM_BATCH_SIZE
+
+
+def parse_flag(value: Optional[str]) -> bool:
+    """
+    Interpret a boolean form field or query parameter ("1", "true", "yes", "on").
+    """
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
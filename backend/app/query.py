@@ -1,14 +1,27 @@
-import pandas as pd
-import requests as r
+import os
 import logging
-from config import Bing_api_key
+from concurrent.futures import ThreadPoolExecutor
+from metrics import metrics, timed
+from ratelimit import Failure
+from search import local_search, provider_for, SEARCH_RESULT_COUNT
+from singleflight import flights
+from typing import TYPE_CHECKING, List, Optional, Tuple, Union
 
+if TYPE_CHECKING:
+    import pandas as pd
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+# Search backend, a name of search.PROVIDERS: "bing" (default) or "local" to answer from the
+# local site index only, offline
+SEARCH_PROVIDER = os.environ.get("SEARCH_PROVIDER", "bing")
 
-def load_data(file_path: str) -> pd.DataFrame:
+# Searches sent at once by search_many (override with SEARCH_POOL_SIZE)
+SEARCH_POOL_SIZE = int(os.environ.get("SEARCH_POOL_SIZE", 8))
+
+_pool = ThreadPoolExecutor(max_workers=SEARCH_POOL_SIZE, thread_name_prefix="search")
+
+
+def load_data(file_path: str) -> "pd.DataFrame":
     """
     Load data from a CSV file.
     
@@ -20,6 +33,7 @@ def load_data(file_path: str) -> pd.DataFrame:
     """
     try:
         # Attempt to read the CSV file into a DataFrame
+        import pandas as pd
         df = pd.read_csv(file_path)
         logging.info("Data loaded successfully!")
         return df
@@ -28,43 +42,69 @@ def load_data(file_path: str) -> pd.DataFrame:
         return None
 
 
-def search_urls(query: str, api_key: str) -> list:
+@timed("search")
+def search_urls(query: str, api_key: str, use_cache: bool = True, entity: Optional[str] = None,
+                count: int = SEARCH_RESULT_COUNT) -> Union[list, Failure]:
     """
-    Search for URLs based on the user's query using the Bing Search API.
+    Search for URLs based on the user's query.
+
+    Entities known to the local site index (see search.LocalSearch) are answered from it
+    without a paid search. Otherwise the query goes to the SEARCH_PROVIDER (Bing by default,
+    through the shared rate limiter, with transient errors retried with backoff).
+    Concurrent identical searches share one request (see singleflight.py).
     
     Args:
         query (str): The query string to search.
-        api_key (str): The Bing Search API key.
+        api_key (str): The API key of the search provider.
+        use_cache (bool): Reuse and store results in the response cache (default is True).
+        entity (str): The entity alone, used for the local index lookup.
+        count (int): Maximum number of URLs returned.
     
     Returns:
-        list: List of URLs returned by the search.
+        list: List of URLs returned by the search, or a (falsy) Failure if the search could not be made.
     """
-    try:
-        logging.info("Initiating search...")
-        # Construct the search URL and headers for the API request
-        search_url = "https://api.bing.microsoft.com/v7.0/search"
-        headers = {"Ocp-Apim-Subscription-Key": api_key}
-        params = {"q": query, "textDecorations": True, "textFormat": "HTML"}
-
-        # Make the API request
-        response = r.get(search_url, headers=headers, params=params)
-        
-        # Check if the request was successful
-        if response.status_code == 200:
-            data = response.json()
-            urls = [result['url'] for result in data.get('webPages', {}).get('value', [])]
-            # logging.info(f"Found {len(urls)} URLs for query: '{query}'")
-            return urls
-        else:
-            logging.error(f"Failed to retrieve data (Status Code: {response.status_code})")
-            return []
-    
-    except Exception as e:
-        logging.error(f"Error during search: {e}")
+    urls = local_search.search(query, entity=entity, count=count)
+    if urls:
+        logging.info(f"Local search hit for {entity}, skipping the paid search.")
+        metrics.inc("search_requests_total", provider=local_search.name, result="hit")
+        return urls
+    provider = provider_for(SEARCH_PROVIDER, api_key)
+    if provider is local_search:
+        # The local index was the only source and has just been asked
+        metrics.inc("search_requests_total", provider=local_search.name, result="miss")
         return []
 
+    # Identical searches running at the same time (e.g. overlapping uploads) share one request
+    urls = flights["search"].do((provider.name, api_key, query, count, use_cache), provider.search, query,
+                                entity=entity, count=count, use_cache=use_cache)
+    metrics.inc("search_requests_total", provider=provider.name,
+                result="error" if isinstance(urls, Failure) else "ok")
+    # logging.info(f"Found {len(urls)} URLs for query: '{query}'")
+    return urls
+
+
+def search_many(queries: List[Tuple[str, Optional[str]]], api_key: str, use_cache: bool = True,
+                count: int = SEARCH_RESULT_COUNT) -> List[Union[list, Failure]]:
+    """
+    Run several searches concurrently (at most SEARCH_POOL_SIZE at once, within the provider's quota).
+
+    Args:
+        queries (list): (query, entity or None) pairs.
+        api_key (str): The API key of the search provider.
+        use_cache (bool): Reuse and store results in the response cache (default is True).
+        count (int): Maximum number of URLs per search.
+
+    Returns:
+        list: One result of search_urls per query, in the same order.
+    """
+    return list(_pool.map(lambda item: search_urls(item[0], api_key, use_cache=use_cache, entity=item[1],
+                                                   count=count), queries))
+
 
 if __name__ == "__main__":
+    from settings import configure_logging, defaults
+    configure_logging()
+
     # Example usage:
     try:
         # Load data and get a query from the user
@@ -76,7 +116,7 @@ if __name__ == "__main__":
             query = f"Get me contact information of {df[df.columns[0]][0]}."
             
             # Search for URLs based on the query
-            api_key = Bing_api_key  # Replace with your actual API key
+            api_key = defaults.bing_api_key  # BING_API_KEY or config.py, see settings.Config
             search_results = search_urls(query, api_key)
             
             if search_results:
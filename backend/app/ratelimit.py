@@ -0,0 +1,334 @@
+import os
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Mapping, Optional, TypeVar, Union
+from metrics import metrics
+from settings import defaults
+
+
+# Provider quotas; 0 disables a limit (GROQ_RPM, GROQ_TPM, BING_RPM; see settings.Config)
+GROQ_RPM = defaults.groq_rpm
+GROQ_TPM = defaults.groq_tpm
+BING_RPM = defaults.bing_rpm
+
+# Retry schedule: attempts per call, and exponential backoff (with full jitter) between them
+RETRY_ATTEMPTS = int(os.environ.get("RETRY_ATTEMPTS", 4))
+RETRY_BASE_DELAY = float(os.environ.get("RETRY_BASE_DELAY", 1.0))
+RETRY_MAX_DELAY = float(os.environ.get("RETRY_MAX_DELAY", 60.0))
+
+# Burst allowance: a full bucket holds this many seconds of quota (override with LIMITER_BURST_SECONDS)
+LIMITER_BURST_SECONDS = float(os.environ.get("LIMITER_BURST_SECONDS", 10.0))
+
+# Longest a call waits for quota before giving up with a "rate_limited" failure
+LIMITER_MAX_WAIT = float(os.environ.get("LIMITER_MAX_WAIT", 300.0))
+
+# After a 429 the rate drops to this fraction of the quota and recovers step by step on success
+MIN_RATE_FACTOR = 0.1
+RECOVERY_STEP = 0.05
+
+# Failure reasons
+RATE_LIMITED = "rate_limited"
+UNAVAILABLE = "unavailable"
+INVALID_INPUT = "invalid_input"
+ERROR = "error"
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+T = TypeVar("T")
+
+
+class Failure:
+    """
+    Typed result of a provider call that could not be completed.
+
+    Failures are falsy, so code that only checks `if not result` keeps treating them as
+    "no result", while callers that care can tell them apart from an empty answer.
+    """
+    __slots__ = ("provider", "reason", "message", "attempts", "retry_after")
+
+    def __init__(self, provider: str, reason: str, message: str, attempts: int = 0,
+                 retry_after: Optional[float] = None):
+        self.provider = provider
+        self.reason = reason
+        self.message = message
+        self.attempts = attempts
+        self.retry_after = retry_after
+
+    def __bool__(self) -> bool:
+        return False
+
+    def __repr__(self) -> str:
+        return f"Failure(provider={self.provider!r}, reason={self.reason!r}, attempts={self.attempts})"
+
+    def __str__(self) -> str:
+        return f"{self.provider} {self.reason}: {self.message}"
+
+    def to_dict(self) -> Dict:
+        return {"provider": self.provider, "reason": self.reason, "message": self.message,
+                "attempts": self.attempts, "retry_after": self.retry_after}
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `per_minute` / 60 tokens per second.
+
+    The bucket holds `burst_seconds` worth of quota, so idle time allows only a short burst.
+    """
+
+    def __init__(self, per_minute: float, burst_seconds: float = LIMITER_BURST_SECONDS):
+        self.per_minute = float(per_minute)
+        self.capacity = max(1.0, self.per_minute * burst_seconds / 60.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float, rate_factor: float):
+        elapsed = now - self.updated
+        self.updated = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.per_minute * rate_factor / 60.0)
+
+    def wait_time(self, amount: float, now: float, rate_factor: float = 1.0) -> float:
+        """
+        Seconds until `amount` tokens are available (0 if they are available now). Caller holds the lock.
+        """
+        self._refill(now, rate_factor)
+        # Requests larger than the bucket would never fit, let them drain it completely instead
+        needed = min(amount, self.capacity) - self.tokens
+        if needed <= 0:
+            return 0.0
+        return needed * 60.0 / (self.per_minute * rate_factor)
+
+    def take(self, amount: float):
+        self.tokens -= amount
+
+    def give_back(self, amount: float):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    """
+    Client-side limiter of one provider, shared by every worker thread.
+
+    Calls reserve one request (and their estimated tokens) before going out, so concurrent
+    workers queue up smoothly instead of bursting into the provider's quota. A rate limit
+    response pauses every caller until its Retry-After time and lowers the rate, which then
+    recovers gradually as calls succeed.
+    """
+
+    def __init__(self, name: str, requests_per_minute: int, tokens_per_minute: int = 0):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.rate_factor = 1.0
+        self.blocked_until = 0.0
+        self.last_throttle = 0.0
+        self.lock = threading.Lock()
+        self.stats = {"calls": 0, "waits": 0, "waited_seconds": 0.0, "throttled": 0, "retries": 0, "failures": 0}
+
+    def acquire(self, tokens: int = 0, max_wait: float = LIMITER_MAX_WAIT) -> bool:
+        """
+        Block until one request and `tokens` tokens can be spent.
+
+        Returns:
+            bool: True once reserved, False if that would take longer than `max_wait` seconds.
+        """
+        deadline = time.monotonic() + max_wait
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                delay = max(0.0, self.blocked_until - now)
+                if self.requests:
+                    delay = max(delay, self.requests.wait_time(1, now, self.rate_factor))
+                if self.tokens and tokens:
+                    delay = max(delay, self.tokens.wait_time(tokens, now, self.rate_factor))
+                if delay <= 0:
+                    if self.requests:
+                        self.requests.take(1)
+                    if self.tokens and tokens:
+                        self.tokens.take(tokens)
+                    self.stats["calls"] += 1
+                    metrics.inc("provider_calls_total", provider=self.name)
+                    if waited:
+                        self.stats["waits"] += 1
+                        self.stats["waited_seconds"] += waited
+                    return True
+            if now + delay > deadline:
+                return False
+            time.sleep(delay)
+            waited += delay
+
+    def settle(self, reserved_tokens: int, used_tokens: Optional[int]):
+        """
+        Correct a token reservation with the usage reported by the provider.
+        """
+        if not self.tokens or used_tokens is None:
+            return
+        with self.lock:
+            if used_tokens < reserved_tokens:
+                self.tokens.give_back(reserved_tokens - used_tokens)
+            else:
+                self.tokens.take(used_tokens - reserved_tokens)
+
+    def throttle(self, retry_after: Optional[float] = None):
+        """
+        Record a rate limit response: pause all callers and halve the rate.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.stats["throttled"] += 1
+            # Concurrent workers hit the same limit together, count that as a single signal
+            if now - self.last_throttle > 1.0:
+                self.rate_factor = max(MIN_RATE_FACTOR, self.rate_factor / 2)
+                self.last_throttle = now
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+        logging.warning(f"{self.name} rate limited, slowing down to {self.rate_factor:.0%} of the quota"
+                        + (f" and pausing {retry_after:.1f}s." if retry_after else "."))
+
+    def succeed(self):
+        """
+        Record a successful call, letting a throttled rate recover.
+        """
+        if self.rate_factor < 1.0:
+            with self.lock:
+                self.rate_factor = min(1.0, self.rate_factor + RECOVERY_STEP)
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            return dict(self.stats, rate_factor=round(self.rate_factor, 3),
+                        paused_seconds=round(max(0.0, self.blocked_until - time.monotonic()), 3))
+
+
+def backoff_delay(attempt: int, base: float = RETRY_BASE_DELAY, cap: float = RETRY_MAX_DELAY) -> float:
+    """
+    Exponential backoff with full jitter for the given (0-based) retry attempt.
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def parse_retry_after(headers: Optional[Mapping]) -> Optional[float]:
+    """
+    Read the wait time of a Retry-After header (seconds or an HTTP date).
+
+    Returns:
+        float: Seconds to wait, or None if the header is missing or invalid.
+    """
+    if not headers:
+        return None
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def retry_delay(attempt: int, retry_after: Optional[float], base: float = RETRY_BASE_DELAY) -> float:
+    """
+    Delay before the next attempt: the server's Retry-After if given, else jittered backoff.
+    """
+    if retry_after is not None:
+        return min(retry_after, RETRY_MAX_DELAY) + random.uniform(0, base)
+    return backoff_delay(attempt, base)
+
+
+class ProviderError(Exception):
+    """
+    Raised by provider calls for an unsuccessful HTTP status, so the retry loop can classify it.
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None, headers: Optional[Mapping] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def error_details(error: Exception):
+    """
+    Extract the HTTP status and Retry-After of a provider error, when it has them.
+
+    Returns:
+        tuple: (status code or None, retry-after seconds or None)
+    """
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    headers = getattr(error, "headers", None) or getattr(response, "headers", None)
+    return status, parse_retry_after(headers)
+
+
+def call_with_retries(provider: str, call: Callable[[], T], tokens: int = 0, attempts: int = RETRY_ATTEMPTS,
+                      base_delay: float = RETRY_BASE_DELAY) -> Union[T, Failure]:
+    """
+    Run a provider call through its rate limiter, retrying transient errors.
+
+    Every attempt first reserves quota from the shared limiter. Rate limit responses
+    throttle the limiter for all workers; Retry-After is honored, otherwise attempts are
+    spaced with exponential backoff and full jitter. Client errors other than 408/409/425/429
+    are not retried.
+
+    Args:
+        provider (str): Limiter name ("groq" or "bing").
+        call (callable): Performs one attempt, returns the result or raises.
+        tokens (int): Estimated tokens the call consumes (for tokens-per-minute quotas).
+        attempts (int): Maximum number of attempts.
+        base_delay (float): Base of the exponential backoff in seconds.
+
+    Returns:
+        The result of `call`, or a Failure once the attempts are exhausted.
+    """
+    limiter = limiter_for(provider)
+    attempts = max(1, attempts)
+    failure = None
+    for attempt in range(attempts):
+        if not limiter.acquire(tokens):
+            failure = Failure(provider, RATE_LIMITED, "Quota wait exceeded the limit.", attempt)
+            break
+        try:
+            result = call()
+            limiter.succeed()
+            return result
+        except Exception as e:
+            status, retry_after = error_details(e)
+            if status == 429:
+                limiter.throttle(retry_after)
+                failure = Failure(provider, RATE_LIMITED, str(e), attempt + 1, retry_after)
+            elif status is not None and status < 500 and status not in RETRYABLE_STATUS:
+                logging.error(f"{provider} call failed with status {status}: {e}")
+                failure = Failure(provider, ERROR, str(e), attempt + 1)
+                break
+            else:
+                failure = Failure(provider, UNAVAILABLE if status or isinstance(e, OSError) else ERROR,
+                                  str(e), attempt + 1, retry_after)
+
+            if attempt < attempts - 1:
+                delay = retry_delay(attempt, retry_after, base_delay)
+                with limiter.lock:
+                    limiter.stats["retries"] += 1
+                metrics.inc("provider_retries_total", provider=provider)
+                logging.warning(f"{provider} call failed (attempt {attempt + 1} of {attempts}): {e}. "
+                                f"Retrying in {delay:.1f}s...")
+                time.sleep(delay)
+
+    with limiter.lock:
+        limiter.stats["failures"] += 1
+    metrics.inc("provider_failures_total", provider=provider, reason=failure.reason)
+    logging.error(f"{provider} call failed after {failure.attempts} attempt(s): {failure.message}")
+    return failure
+
+
+limiters = {
+    "groq": RateLimiter("groq", GROQ_RPM, GROQ_TPM),
+    "bing": RateLimiter("bing", BING_RPM),
+}
+
+
+def limiter_for(provider: str) -> RateLimiter:
+    return limiters[provider]
@@ -0,0 +1,199 @@
+import os
+import json
+import logging
+import functools
+from dataclasses import dataclass, field, fields
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+
+# Storage encoding of records: "json" (default, one compact line per record) or "msgpack" (smaller, needs msgpack)
+RECORD_FORMAT = os.environ.get("RECORD_FORMAT", "json")
+
+# Log lines kept per entity, and in the logs of one response or job; later lines are counted, not kept
+MAX_ENTITY_LOGS = int(os.environ.get("MAX_ENTITY_LOGS", 20))
+MAX_RESPONSE_LOGS = int(os.environ.get("MAX_RESPONSE_LOGS", 1000))
+
+CONTACT_FIELDS = ('emails', 'phone_numbers', 'addresses')
+
+
+class LogLines:
+    """
+    Append-only list of log lines that keeps at most `limit` of them.
+
+    Lines past the limit are only counted, and reported as one summary line at the end,
+    so the logs of a large batch stay bounded however many entities it has.
+    """
+    __slots__ = ('limit', 'lines', 'dropped')
+
+    def __init__(self, lines: Iterable[str] = (), limit: int = MAX_ENTITY_LOGS):
+        self.limit = limit
+        self.lines = []
+        self.dropped = 0
+        self.extend(lines)
+
+    def append(self, line: str):
+        if len(self.lines) < self.limit:
+            self.lines.append(line)
+        else:
+            self.dropped += 1
+
+    def extend(self, lines: Iterable[str]):
+        for line in lines:
+            self.append(line)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.lines
+        if self.dropped:
+            yield f"... {self.dropped} more log line(s) not kept."
+
+    def __len__(self) -> int:
+        return len(self.lines) + (1 if self.dropped else 0)
+
+    def to_list(self) -> List[str]:
+        return list(self)
+
+
+@dataclass(slots=True)
+class PageRecord:
+    """
+    The data extracted from one page, or merged from several pages of a site.
+    """
+    url: str
+    title: Optional[str] = None
+    industry_sector: Optional[str] = None
+    emails: List[str] = field(default_factory=list)
+    phone_numbers: List[str] = field(default_factory=list)
+    addresses: List[str] = field(default_factory=list)
+    social_media: List[str] = field(default_factory=list)
+    pages: List[str] = field(default_factory=list)  # URLs a merged record was built from
+
+    def to_dict(self) -> Dict:
+        """
+        Flat dict of the record, leaving out empty fields (the url is always written).
+        """
+        return {name: value for name, value in ((f.name, getattr(self, f.name)) for f in fields(self))
+                if name == 'url' or value not in (None, [], "")}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "PageRecord":
+        """
+        Build a record from to_dict() output, or from the nested dict scrape_essential_info
+        used to return ({"metadata", "contact_information", "social_media"}).
+        """
+        if 'metadata' in data or 'contact_information' in data:
+            metadata = data.get('metadata', {})
+            contact = data.get('contact_information', {})
+            return cls(url=metadata.get('website_url'), title=metadata.get('page_title'),
+                       industry_sector=metadata.get('industry_sector'),
+                       social_media=list(data.get('social_media', [])), pages=list(metadata.get('pages', [])),
+                       **{name: list(contact.get(name, [])) for name in CONTACT_FIELDS})
+        return cls(url=data.get('url'), **{f.name: data[f.name] for f in fields(cls) if f.name in data and f.name != 'url'})
+
+
+def as_page_record(data: Union[PageRecord, Dict, None]) -> Optional[PageRecord]:
+    """
+    Accept a PageRecord or a dict of either layout (see PageRecord.from_dict).
+    """
+    if data is None or isinstance(data, PageRecord):
+        return data
+    return PageRecord.from_dict(data)
+
+
+@dataclass(slots=True)
+class PreparedEntity:
+    """
+    An entity whose page was found and extracted, waiting for the LLM to answer its query.
+    """
+    entity: str
+    query: str
+    extracted: PageRecord
+    url: Optional[str] = None
+    logs: LogLines = field(default_factory=LogLines)
+
+
+@dataclass(slots=True)
+class EntityResult:
+    """
+    The final result of one entity: its answer ("notfound" / "LLM error" on failure), the path
+    that produced it ("rule", "llm", "index" or "none"), the page it came from, the failure
+    reason of a failed provider call, and its (capped) log lines.
+    """
+    entity: str
+    answer: str
+    source: str
+    url: Optional[str] = None
+    error: Optional[str] = None
+    logs: LogLines = field(default_factory=LogLines)
+
+    @property
+    def status(self) -> str:
+        """
+        "success", "Not found", or "error" when a provider call failed.
+        """
+        if self.error:
+            return "error"
+        return "success" if self.answer != "notfound" else "Not found"
+
+    def to_dict(self, logs: bool = True) -> Dict:
+        data = {"entity": self.entity, "answer": self.answer, "source": self.source}
+        if self.url is not None:
+            data["url"] = self.url
+        if self.error is not None:
+            data["error"] = self.error
+        if logs and len(self.logs):
+            data["logs"] = self.logs.to_list()
+        return data
+
+    def row(self) -> Dict:
+        """
+        The columns returned to clients for the entity.
+        """
+        return {"entity": self.entity, "email": self.answer, "status": self.status, "source": self.source,
+                "error": self.error}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "EntityResult":
+        return cls(entity=data["entity"], answer=data["answer"], source=data["source"], url=data.get("url"),
+                   error=data.get("error"), logs=LogLines(data.get("logs", ())))
+
+
+@functools.lru_cache(maxsize=None)
+def _msgpack():
+    """
+    The msgpack module, or None (warning once) when it is not installed.
+    """
+    try:
+        import msgpack
+        return msgpack
+    except ImportError:
+        logging.warning("The msgpack record format needs the 'msgpack' package, storing JSON instead.")
+        return None
+
+
+def dumps(record: Union[PageRecord, EntityResult], fmt: str = RECORD_FORMAT) -> Union[str, bytes]:
+    """
+    Encode a record for storage.
+
+    Args:
+        record: The record to encode.
+        fmt (str): "json" (one compact JSON line) or "msgpack" (bytes; JSON when msgpack is not installed).
+    """
+    data = record.to_dict()
+    if fmt == "msgpack":
+        msgpack = _msgpack()
+        if msgpack is not None:
+            return msgpack.packb(data, use_bin_type=True)
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+
+
+def loads(data: Union[str, bytes]) -> Dict:
+    """
+    Decode a stored record written by dumps in either format (JSON text or msgpack bytes).
+    """
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data)
+        if not data.lstrip().startswith(b'{'):
+            import msgpack
+            return msgpack.unpackb(data, raw=False)
+        data = data.decode('utf-8')
+    return json.loads(data)
@@ -0,0 +1,120 @@
+import re
+import logging
+from typing import Dict, List, Optional, Union
+from records import PageRecord, as_page_record
+from extraction import SOCIAL_PLATFORMS
+from settings import env_flag
+
+
+# Answer unambiguous queries from the scraped fields without calling the LLM (RESOLVER_ENABLED=0 to disable)
+RESOLVER_ENABLED = env_flag("RESOLVER_ENABLED")
+
+# Labels of the path that produced an answer
+SOURCE_RULE = "rule"
+SOURCE_LLM = "llm"
+SOURCE_LLM_BATCH = "llm_batch"
+SOURCE_NONE = "none"
+SOURCE_INDEX = "index"
+
+# Checked in order: "email address" is an email query, not an address query (plurals count too)
+INTENT_PATTERNS = [
+    ("email", re.compile(r"\b(?:e-?mails?|mail\s*ids?|mail\s*address(?:es)?|email\s*ids?)\b", re.IGNORECASE)),
+    ("phone", re.compile(r"\b(?:phones?|telephones?|tel|mobiles?|contact\s*(?:numbers?|nos?)|call)\b", re.IGNORECASE)),
+    ("social", re.compile(r"\b(?:social|" + "|".join(SOCIAL_PLATFORMS) + r")\b", re.IGNORECASE)),
+    ("address", re.compile(r"\b(?:address(?:es)?|located|locations?|headquarter(?:s|ed)?|head\s*offices?|hq)\b",
+                           re.IGNORECASE)),
+]
+
+# Cues that an address candidate holds an actual postal address, not just a keyword like "office"
+STREET_CUES = re.compile(r"\b(?:street|st\.|road|rd\.|avenue|ave\.|lane|floor|suite|building|marg|nagar|"
+                         r"sector|block|plot|p\.?o\.? box|zip|pin)\b", re.IGNORECASE)
+POSTAL_CODE = re.compile(r"\b\d{5,6}\b|\b[A-Z]{1,2}\d[A-Z\d]? ?\d[A-Z]{2}\b")
+
+
+def classify_intent(query: str) -> Optional[str]:
+    """
+    Classifies what kind of field a query asks for.
+
+    Classify the user's question alone: an entity name appended to it ("Email Marketing
+    Inc") would otherwise decide the intent.
+
+    Args:
+        query (str): The user's question, e.g. "What is the email of".
+
+    Returns:
+        str: "email", "phone", "social" or "address", or None if the query is not about one field.
+    """
+    for intent, pattern in INTENT_PATTERNS:
+        if pattern.search(query):
+            return intent
+    return None
+
+
+def _unique(values: List[str]) -> List[str]:
+    seen = set()
+    unique = []
+    for value in values:
+        key = value.strip().lower().rstrip('/')
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(value.strip())
+    return unique
+
+
+def looks_like_address(text: str) -> bool:
+    """
+    True if a text has a street or postal-code cue.
+    """
+    return bool(STREET_CUES.search(text) or POSTAL_CODE.search(text))
+
+
+def candidates_for(intent: str, query: str, extracted_data: Union[PageRecord, Dict]) -> List[str]:
+    """
+    Returns the distinct extracted values that could answer a query of the given intent.
+
+    Args:
+        intent (str): The classified intent.
+        query (str): The user's question (used to pick a social platform).
+        extracted_data (PageRecord): The data from scrape_essential_info (a dict is converted).
+
+    Returns:
+        List[str]: The candidate answers.
+    """
+    record = as_page_record(extracted_data)
+    if intent == "email":
+        return _unique(record.emails)
+    if intent == "phone":
+        return _unique(record.phone_numbers)
+    if intent == "address":
+        # Address candidates are any block mentioning "office" or "contact"; keep real addresses only
+        return [address for address in _unique(record.addresses) if looks_like_address(address)]
+    if intent == "social":
+        links = _unique(record.social_media)
+        platforms = [platform for platform in SOCIAL_PLATFORMS if platform in query.lower()]
+        if platforms:
+            links = [link for link in links if any(platform in link.lower() for platform in platforms)]
+        return links
+    return []
+
+
+def resolve_from_fields(query: str, extracted_data: Union[PageRecord, Dict]) -> Optional[str]:
+    """
+    Answers a query straight from the extracted fields when there is exactly one candidate.
+
+    Args:
+        query (str): The user's question, without the entity name.
+        extracted_data (PageRecord): The data from scrape_essential_info (a dict is converted).
+
+    Returns:
+        str: The answer, or None when the intent is unclear or the candidates need disambiguation.
+    """
+    if not RESOLVER_ENABLED or not extracted_data:
+        return None
+    intent = classify_intent(query)
+    if intent is None:
+        return None
+    candidates = candidates_for(intent, query, extracted_data)
+    if len(candidates) != 1:
+        return None
+    logging.info(f"Resolved '{intent}' query from extracted fields without the LLM.")
+    return candidates[0]
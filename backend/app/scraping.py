@@ -1,19 +1,14 @@
 import requests
-import re
-from bs4 import BeautifulSoup
 import logging
-import sys
-from typing import Dict, List, Optional
+from typing import List, Optional, Tuple
 from urllib.parse import urlparse
+from cache import response_cache, PAGE_TTL
+from fetch import fetcher
+from metrics import span
+from parsing import parse_pool
+from singleflight import flights
+from records import PageRecord
 
-# Set stdout encoding to UTF-8
-sys.stdout.reconfigure(encoding='utf-8')
-
-# Configure logging for debugging and error tracking
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
-
-# Initialize a session for reuse across requests
-session = requests.Session()
 
 def is_valid_url(url: str) -> bool:
     """
@@ -28,134 +23,110 @@ def is_valid_url(url: str) -> bool:
     parsed_url = urlparse(url)
     return bool(parsed_url.scheme) and bool(parsed_url.netloc)
 
-def extract_emails(text: str) -> List[str]:
+def fetch_page(url: str, use_cache: bool = True, max_bytes: Optional[int] = None) -> Optional[Tuple[bytes, str]]:
     """
-    Extracts email addresses from the given text.
-    
-    Args:
-        text (str): The text to extract emails from.
-        
-    Returns:
-        List[str]: A list of extracted email addresses.
-    """
-    return list(set(re.findall(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', text)))
+    Downloads a page, reusing the cached copy when it is fresh.
 
-def extract_phone_numbers(text: str) -> List[str]:
-    """
-    Extracts phone numbers from the given text.
-    
-    Args:
-        text (str): The text to extract phone numbers from.
-        
-    Returns:
-        List[str]: A list of extracted phone numbers.
-    """
-    return list(set(re.findall(r'\b(?:\+?(\d{1,3})[-.\s]?)?(?:\(?\d{1,4}\)?[-.\s]?)?\d{1,4}[-.\s]?\d{1,4}[-.\s]?\d{1,9}\b', text)))
+    Stale cached copies are revalidated with a conditional GET (If-None-Match /
+    If-Modified-Since) so unchanged pages are not downloaded again. Concurrent fetches
+    of the same page (e.g. from overlapping uploads) share one download. The body is
+    returned undecoded, so the parser decodes it exactly once.
 
-def extract_addresses(soup: BeautifulSoup) -> List[str]:
-    """
-    Extracts address-related information from the webpage.
-    
     Args:
-        soup (BeautifulSoup): The BeautifulSoup object of the page.
-        
+        url (str): The URL of the webpage to fetch.
+        use_cache (bool): Reuse and store the page in the response cache (default is True).
+        max_bytes (int): Refuse bodies larger than this (defaults to the fetcher's limit).
+
     Returns:
-        List[str]: A list of extracted address-related information.
+        tuple: (raw page HTML, its encoding), or None if it could not be retrieved.
     """
-    address_keywords = ['address', 'location', 'headquarters', 'office', 'contact']
-    address_texts = []
-    div_texts = [div.get_text(strip=True) for div in soup.find_all('div')]
-    paragraphs = [p.get_text(strip=True) for p in soup.find_all('p')]
-    
-    for text in div_texts + paragraphs:
-        if any(keyword in text.lower() for keyword in address_keywords):
-            address_texts.append(text)
-    return address_texts
+    return flights["fetch"].do((url, use_cache, max_bytes), _fetch_page, url, use_cache, max_bytes)
+
+def _cached_page(cached: dict) -> Tuple[bytes, str]:
+    # Entries written before pages were cached as bytes hold the decoded text
+    if isinstance(cached["value"], str):
+        return cached["value"].encode('utf-8'), 'utf-8'
+    return cached["value"], cached["meta"].get("encoding") or 'utf-8'
+
+def _fetch_page(url: str, use_cache: bool, max_bytes: Optional[int]) -> Optional[Tuple[bytes, str]]:
+    cached = response_cache.get("page", url, allow_stale=True) if use_cache else None
+    if cached is not None and not cached["stale"]:
+        logging.info(f"Page cache hit for {url}")
+        return _cached_page(cached)
+
+    headers = {}
+    if cached is not None:
+        if cached["meta"].get("etag"):
+            headers["If-None-Match"] = cached["meta"]["etag"]
+        if cached["meta"].get("last_modified"):
+            headers["If-Modified-Since"] = cached["meta"]["last_modified"]
+
+    # Send a GET request to the URL through the shared pooled fetcher
+    response = fetcher.get(url, headers=headers, max_bytes=max_bytes)
 
-def extract_social_links(soup: BeautifulSoup) -> List[str]:
+    if response.status_code == 304 and cached is not None:
+        logging.info(f"Page not modified, reusing cached copy of {url}")
+        response_cache.touch("page", url, ttl=PAGE_TTL)
+        return _cached_page(cached)
+
+    # Check if the request was successful
+    if response.status_code != 200:
+        logging.error(f"Failed to retrieve content from {url} (Status Code: {response.status_code})")
+        return None
+
+    encoding = response.charset
+    if use_cache:
+        meta = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "encoding": encoding,
+        }
+        response_cache.set("page", url, response.content, ttl=PAGE_TTL, meta=meta)
+    return response.content, encoding
+
+def scrape_essential_info(url: str, use_cache: bool = True) -> Optional[PageRecord]:
     """
-    Extracts social media links from the page.
+    Scrapes essential information from a given URL.
     
     Args:
-        soup (BeautifulSoup): The BeautifulSoup object of the page.
+        url (str): The URL of the webpage to scrape.
+        use_cache (bool): Reuse and store the page in the response cache (default is True).
         
     Returns:
-        List[str]: A list of social media links.
+        PageRecord: The page's metadata, contact information and social media links (see records.py).
     """
-    social_platforms = ['facebook', 'twitter', 'linkedin', 'instagram']
-    social_links = []
-    
-    for a in soup.find_all('a', href=True):
-        link = a['href']
-        if any(platform in link for platform in social_platforms):
-            social_links.append(link)
-    
-    return social_links
+    page = scrape_page(url, use_cache=use_cache)
+    return page[0] if page else None
 
-def scrape_essential_info(url: str) -> Optional[Dict]:
+def scrape_page(url: str, use_cache: bool = True, max_bytes: Optional[int] = None) -> Optional[Tuple[PageRecord, List, int]]:
     """
-    Scrapes essential information from a given URL.
+    Scrapes a page like scrape_essential_info, also returning its links and size for crawling.
     
     Args:
         url (str): The URL of the webpage to scrape.
+        use_cache (bool): Reuse and store the page in the response cache (default is True).
+        max_bytes (int): Refuse pages larger than this.
         
     Returns:
-        dict: A dictionary containing the extracted metadata, contact information, and social media links.
+        tuple: (extracted PageRecord, (href, anchor text) links, page size in bytes), or None on failure.
     """
     if not is_valid_url(url):
         logging.error(f"Invalid URL: {url}")
         return None
     
     try:
-        # Send a GET request to the URL using a session
-        response = session.get(url)
-        
-        # Check if the request was successful
-        if response.status_code != 200:
-            logging.error(f"Failed to retrieve content from {url} (Status Code: {response.status_code})")
+        with span("fetch"):
+            page = fetch_page(url, use_cache=use_cache, max_bytes=max_bytes)
+        if page is None:
             return None
+        content, encoding = page
         
-        # Parse the page content using BeautifulSoup
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Initialize a dictionary to store the essential information
-        extracted_info = {
-            'emails': extract_emails(response.text),
-            'phone_numbers': extract_phone_numbers(response.text),
-            'addresses': extract_addresses(soup),
-            'social_links': extract_social_links(soup),
-            'industry_sector': None,
-            'website_url': url,
-            'page_title': soup.title.string if soup.title else "No title"
-        }
-        
-        # Extract industry sector or business category from meta description or meta keywords
-        meta_description = soup.find('meta', attrs={'name': 'description'})
-        meta_keywords = soup.find('meta', attrs={'name': 'keywords'})
-        
-        if meta_description:
-            extracted_info['industry_sector'] = meta_description.get('content', '')
-        
-        if not extracted_info['industry_sector'] and meta_keywords:
-            extracted_info['industry_sector'] = meta_keywords.get('content', '')
-        
-        # Prepare the data for LLM use: Returning the data in a structured format
-        result = {
-            'metadata': {
-                'website_url': extracted_info['website_url'],
-                'page_title': extracted_info['page_title'],
-                'industry_sector': extracted_info['industry_sector']
-            },
-            'contact_information': {
-                'emails': extracted_info['emails'],
-                'phone_numbers': extracted_info['phone_numbers'],
-                'addresses': extracted_info['addresses']
-            },
-            'social_media': extracted_info['social_links']
-        }
+        with span("parse"):
+            # Parsing and extraction are a pure function of the page bytes, possibly run in a worker process
+            result, links = parse_pool.extract(content, url, encoding)
         
         # Return the structured data
-        return result
+        return result, links, len(content)
 
     except requests.exceptions.RequestException as e:
         logging.error(f"Request error occurred while scraping {url}: {e}")
@@ -165,7 +136,13 @@ def scrape_essential_info(url: str) -> Optional[Dict]:
         return None
 
 if __name__ == "__main__":
-    
+    import sys
+    from settings import configure_logging
+
+    # Set stdout encoding to UTF-8
+    sys.stdout.reconfigure(encoding='utf-8')
+    configure_logging()
+
     # Example test case to check if the module works as expected
     test_url = "https://www.ril.com/contact-us"
     scraped_data = scrape_essential_info(test_url)
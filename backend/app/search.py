@@ -0,0 +1,219 @@
+import os
+import csv
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Union
+from cache import response_cache, open_database, SEARCH_TTL
+from fetch import fetcher
+from ratelimit import Failure, ProviderError, call_with_retries
+from entity_index import normalize_entity
+from settings import env_flag
+
+
+# Bing Web Search endpoint (override with BING_ENDPOINT, e.g. to use the stub in stubs.py)
+BING_ENDPOINT = os.environ.get("BING_ENDPOINT", "https://api.bing.microsoft.com/v7.0/search")
+
+# Web results requested per search; only the best few are scraped (see fanout.FANOUT_TOP_K)
+SEARCH_RESULT_COUNT = int(os.environ.get("SEARCH_RESULT_COUNT", 5))
+
+# Local index of known company sites, consulted before any paid search (LOCAL_SEARCH_ENABLED=0 disables it)
+LOCAL_SEARCH_PATH = os.environ.get("LOCAL_SEARCH_PATH", os.path.join("index", "sites.sqlite3"))
+LOCAL_SEARCH_ENABLED = env_flag("LOCAL_SEARCH_ENABLED")
+
+
+class SearchProvider(ABC):
+    """
+    A source of candidate URLs for an entity.
+
+    Providers return a list of URLs (best first, possibly empty), or a Failure when the
+    search could not be made. They are selected by name through PROVIDERS (see provider_for).
+    """
+    name = "search"
+
+    @abstractmethod
+    def search(self, query: str, entity: Optional[str] = None, count: int = SEARCH_RESULT_COUNT,
+               use_cache: bool = True) -> Union[List[str], Failure]:
+        """
+        Args:
+            query (str): The full search query (question and entity).
+            entity (str): The entity alone, for providers that look entities up by name.
+            count (int): Maximum number of URLs returned.
+            use_cache (bool): Reuse and store results in the response cache, where the provider has one.
+        """
+
+
+class BingSearch(SearchProvider):
+    """
+    Bing Web Search v7 over the shared pooled fetcher, rate limited and retried (see ratelimit.py).
+
+    Only web page results are requested (responseFilter), as plain text, and only `count` of them.
+    """
+    name = "bing"
+
+    def __init__(self, api_key: Optional[str] = None, endpoint: Optional[str] = None):
+        self.api_key = api_key
+        self.endpoint = endpoint
+
+    def search(self, query: str, entity: Optional[str] = None, count: int = SEARCH_RESULT_COUNT,
+               use_cache: bool = True) -> Union[List[str], Failure]:
+        if use_cache:
+            cached = response_cache.get("search", query)
+            # A search for at least `count` results covers this one (even if Bing returned fewer)
+            if cached is not None and cached["meta"].get("count", 0) >= count:
+                logging.info(f"Search cache hit for query: '{query}'")
+                return cached["value"][:count]
+
+        logging.info("Initiating search...")
+        # The endpoint is read at call time so it can be pointed elsewhere (e.g. by stubs.StubProviders)
+        endpoint = self.endpoint or BING_ENDPOINT
+        headers = {"Ocp-Apim-Subscription-Key": self.api_key}
+        params = {"q": query, "count": count, "responseFilter": "Webpages", "textDecorations": "false",
+                  "textFormat": "Raw"}
+
+        def attempt() -> list:
+            # The search API has its own quota, so skip the crawl politeness
+            response = fetcher.get(endpoint, headers=headers, params=params, polite=False)
+            if response.status_code != 200:
+                raise ProviderError(f"Failed to retrieve data (Status Code: {response.status_code})",
+                                    status_code=response.status_code, headers=response.headers)
+            data = response.json()
+            return [result['url'] for result in data.get('webPages', {}).get('value', [])][:count]
+
+        urls = call_with_retries("bing", attempt)
+        if isinstance(urls, Failure):
+            logging.error(f"Error during search: {urls.message}")
+            return urls
+        if use_cache:
+            response_cache.set("search", query, urls, ttl=SEARCH_TTL, meta={"count": count})
+        return urls
+
+
+class LocalSearch(SearchProvider):
+    """
+    Offline provider answering from a SQLite index of known company sites.
+
+    Names are stored under their normalized key (see entity_index.normalize_entity), and a
+    lookup only returns the site of an exact key match: a partial name match could skip the
+    paid search for the wrong company. The index is filled by the pipeline with the entity's
+    own site once one was scraped, and by import_csv from a list of known domains.
+    """
+    name = "local"
+
+    def __init__(self, path: str = LOCAL_SEARCH_PATH, enabled: bool = LOCAL_SEARCH_ENABLED):
+        self.path = path
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = open_database(
+                self.path,
+                "CREATE TABLE IF NOT EXISTS sites ("
+                " key TEXT PRIMARY KEY,"
+                " name TEXT NOT NULL,"
+                " url TEXT NOT NULL,"
+                " source TEXT,"
+                " added_at REAL NOT NULL)",
+            )
+        return self._conn
+
+    def add(self, name: str, url: str, source: str = "manual"):
+        """
+        Index (or replace) the site of an entity.
+        """
+        if not self.enabled:
+            return
+        key = normalize_entity(name)
+        if not key:
+            return
+        try:
+            with self._lock:
+                self._connect().execute("INSERT OR REPLACE INTO sites (key, name, url, source, added_at)"
+                                        " VALUES (?, ?, ?, ?, ?)", (key, name, url, source, time.time()))
+        except sqlite3.Error as e:
+            logging.error(f"Local search index write failed for {name}: {e}")
+
+    def import_csv(self, path: str, name_column: str = "name", url_column: str = "url") -> int:
+        """
+        Index the sites listed in a CSV file; bare domains ("acme.com") are turned into https URLs.
+
+        Returns:
+            int: Number of rows indexed.
+        """
+        added = 0
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                name, url = (row.get(name_column) or "").strip(), (row.get(url_column) or "").strip()
+                if not name or not url:
+                    continue
+                self.add(name, url if "://" in url else f"https://{url}/", source="import")
+                added += 1
+        return added
+
+    def search(self, query: str, entity: Optional[str] = None, count: int = SEARCH_RESULT_COUNT,
+               use_cache: bool = True) -> List[str]:
+        if not self.enabled or not entity:
+            return []
+        key = normalize_entity(entity)
+        if not key:
+            return []
+        try:
+            with self._lock:
+                row = self._connect().execute("SELECT url FROM sites WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            logging.error(f"Local search failed for {entity}: {e}")
+            return []
+        return [row[0]] if row else []
+
+    def stats(self) -> Dict:
+        if not self.enabled:
+            return {"enabled": False}
+        with self._lock:
+            count = self._connect().execute("SELECT COUNT(*) FROM sites").fetchone()[0]
+        return {"enabled": True, "sites": count}
+
+
+# Shared local index, consulted by query.search_urls before any paid search
+local_search = LocalSearch()
+
+# Search providers by name (SEARCH_PROVIDER, see query.py): factories taking the API key
+PROVIDERS: Dict[str, Callable[[Optional[str]], SearchProvider]] = {
+    BingSearch.name: BingSearch,
+    LocalSearch.name: lambda api_key=None: local_search,
+}
+
+
+def provider_for(name: str, api_key: Optional[str] = None) -> SearchProvider:
+    """
+    Create the search provider registered under `name`.
+
+    Raises:
+        ValueError: If no provider is registered under that name.
+    """
+    try:
+        factory = PROVIDERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown search provider {name!r}, expected one of: {', '.join(PROVIDERS)}.") from None
+    return factory(api_key)
+
+
+if __name__ == "__main__":
+    # Import a list of known company sites into the local index:
+    #     python search.py sites.csv [--name-column name] [--url-column url]
+    from settings import configure_logging
+
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Index known company sites (CSV with a name and a url column).")
+    parser.add_argument("csv", help="CSV file of company names and sites (bare domains are accepted)")
+    parser.add_argument("--name-column", default="name", help="column holding the company name (default: name)")
+    parser.add_argument("--url-column", default="url", help="column holding the site (default: url)")
+    args = parser.parse_args()
+    if not local_search.enabled:
+        parser.error("the local search index is disabled (LOCAL_SEARCH_ENABLED=0)")
+    added = local_search.import_csv(args.csv, name_column=args.name_column, url_column=args.url_column)
+    print(f"Indexed {added} sites in {local_search.path}.")
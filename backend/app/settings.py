@@ -0,0 +1,97 @@
+import os
+import logging
+from typing import Optional
+
+
+# Log level and format of the service and the CLI (override with LOG_LEVEL)
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+# Origins allowed to call /api/* from a browser, comma separated (override with CORS_ORIGINS)
+CORS_ORIGINS = os.environ.get("CORS_ORIGINS", "http://localhost:5173")
+
+
+def env_flag(name: str, default: bool = True) -> bool:
+    """
+    Read an on/off environment variable: unset means `default`, "0" and "false" mean off.
+    """
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value not in ("0", "false", "False")
+
+
+def configured_keys() -> tuple:
+    """
+    The (Groq, Bing) API keys: GROQ_API_KEY and BING_API_KEY, else the untracked config.py.
+    """
+    try:
+        import config
+    except ImportError:
+        config = None
+    return (os.environ.get("GROQ_API_KEY") or getattr(config, "groq_api_key", None),
+            os.environ.get("BING_API_KEY") or getattr(config, "Bing_api_key", None))
+
+
+class Config:
+    """
+    Settings of one application instance (web service or CLI), read from the environment once.
+
+    Holds the API keys and the knobs operators tune most (upload folder, cache, workers,
+    provider quotas); the modules read their defaults from `defaults` below. Finer tuning
+    of a single module (fetch timeouts, crawl budget, ...) stays next to the code it tunes.
+    Any field can be overridden with a keyword argument, e.g. Config(upload_folder="/tmp/up").
+    """
+
+    def __init__(self, **overrides):
+        self.groq_api_key, self.bing_api_key = configured_keys()
+
+        # Uploaded files are stored here under a generated name, never the client's filename
+        self.upload_folder = os.environ.get("UPLOAD_FOLDER", "uploads")
+
+        # Location and size bound of the on-disk response cache
+        self.cache_enabled = env_flag("CACHE_ENABLED")
+        self.cache_path = os.environ.get("CACHE_PATH", os.path.join("cache", "responses.sqlite3"))
+        self.cache_max_bytes = int(os.environ.get("CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+        # Entities processed at the same time, and entities answered per LLM request (1 disables batching)
+        self.max_workers = int(os.environ.get("PIPELINE_MAX_WORKERS", 8))
+        self.llm_batch_size = int(os.environ.get("PIPELINE_LLM_BATCH_SIZE", 1))
+
+        # Provider quotas; 0 disables a limit
+        self.groq_rpm = int(os.environ.get("GROQ_RPM", 30))
+        self.groq_tpm = int(os.environ.get("GROQ_TPM", 30000))
+        self.bing_rpm = int(os.environ.get("BING_RPM", 180))
+
+        self.log_level = LOG_LEVEL
+        self.cors_origins = [origin.strip() for origin in CORS_ORIGINS.split(",") if origin.strip()]
+        self.debug = env_flag("FLASK_DEBUG")
+        self.port = int(os.environ.get("PORT", 5000))
+        for name, value in overrides.items():
+            if not hasattr(self, name):
+                raise TypeError(f"Unknown setting: {name}")
+            setattr(self, name, value)
+
+    def __repr__(self) -> str:
+        # Keys are masked so a logged Config does not leak them
+        fields = {name: "***" if name.endswith("_api_key") and value else value for name, value in vars(self).items()}
+        return f"Config({fields})"
+
+
+# Settings of this process; modules take their defaults from here
+defaults = Config()
+
+
+def configure_logging(level: Optional[str] = None):
+    """
+    Configure the root logger once for the whole process.
+
+    Modules only create log records; the entry points (create_app, the CLI and the module
+    demos) call this, so the format and level are set in a single place.
+    """
+    root = logging.getLogger()
+    root.setLevel((level or LOG_LEVEL).upper())
+    if not root.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        root.addHandler(handler)
@@ -0,0 +1,90 @@
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable
+from metrics import metrics
+from settings import env_flag
+
+
+# Concurrent identical searches, page fetches and LLM calls share one call (SINGLEFLIGHT_ENABLED=0 disables it)
+SINGLEFLIGHT_ENABLED = env_flag("SINGLEFLIGHT_ENABLED")
+
+
+class _Call:
+    """
+    One in-flight call and the outcome its followers wait for.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one.
+
+    The first caller of a key (the leader) runs the call; callers arriving with the same
+    key while it runs wait for it and get its result, or its exception re-raised, instead
+    of repeating the work. Nothing is kept once the call returns, so later callers run it
+    again (the response cache handles reuse across time, this handles reuse across threads).
+
+    Results are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, name: str, enabled: bool = SINGLEFLIGHT_ENABLED):
+        self.name = name
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.counters = {"calls": 0, "collapsed": 0}
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs), or wait for the identical call already running under `key`.
+        """
+        if not self.enabled:
+            return fn(*args, **kwargs)
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.counters["calls"] += 1
+            else:
+                call.followers += 1
+                self.counters["collapsed"] += 1
+
+        if not leader:
+            metrics.inc("singleflight_collapsed_total", operation=self.name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        metrics.inc("singleflight_calls_total", operation=self.name)
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+            if call.followers:
+                logging.debug(f"{self.name}: {call.followers} concurrent identical calls shared one result.")
+
+    def stats(self) -> Dict:
+        """
+        Return the calls run, the calls collapsed into them and the calls in flight.
+        """
+        with self._lock:
+            return {"enabled": self.enabled, **self.counters, "in_flight": len(self._calls)}
+
+
+# One group per wrapped operation, reported by /api/singleflight/stats
+flights = {name: SingleFlight(name) for name in ("search", "fetch", "llm", "entity")}
@@ -0,0 +1,133 @@
+import os
+import csv
+import sys
+import json
+import time
+import sqlite3
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+
+
+# Columns written for every finished entity ("position" is its place in the input file)
+COLUMNS = ["position", "entity", "email", "status", "source", "error", "url"]
+
+# SQLite sinks commit at most this often, in seconds (and on close)
+SQLITE_COMMIT_INTERVAL = float(os.environ.get("SINK_SQLITE_COMMIT_INTERVAL", 1.0))
+
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".sqlite": "sqlite", ".sqlite3": "sqlite",
+           ".db": "sqlite"}
+
+
+class Sink(ABC):
+    """
+    Destination of batch results, written one row at a time as entities finish.
+
+    Rows arrive in completion order; their "position" gives the input order back.
+    Sinks are context managers and flush what they hold when closed.
+    """
+
+    @abstractmethod
+    def write(self, row: Dict):
+        """
+        Write one finished entity.
+        """
+
+    def close(self):
+        pass
+
+    def __enter__(self) -> "Sink":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CsvSink(Sink):
+    """
+    Writes one CSV line per row, flushed at once so the file can be followed while it grows.
+    """
+
+    def __init__(self, path: str):
+        self._file = sys.stdout if path == "-" else open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(COLUMNS)
+
+    def write(self, row: Dict):
+        self._writer.writerow([row.get(column) if row.get(column) is not None else "" for column in COLUMNS])
+        self._file.flush()
+
+    def close(self):
+        if self._file is not sys.stdout:
+            self._file.close()
+
+
+class JsonlSink(Sink):
+    """
+    Writes one JSON object per line (the layout of /api/runs/<run_id>/export).
+    """
+
+    def __init__(self, path: str):
+        self._file = sys.stdout if path == "-" else open(path, "w", encoding="utf-8")
+
+    def write(self, row: Dict):
+        self._file.write(json.dumps({column: row.get(column) for column in COLUMNS}, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not sys.stdout:
+            self._file.close()
+
+
+class SqliteSink(Sink):
+    """
+    Upserts rows into a table keyed by input position, committing every SQLITE_COMMIT_INTERVAL.
+
+    Writing to an existing database replaces the rows of positions seen again, so a
+    resumed run completes the table of the interrupted one.
+    """
+
+    def __init__(self, path: str, table: str = "results"):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name {table!r}.")
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (position INTEGER PRIMARY KEY, entity TEXT,"
+                           " email TEXT, status TEXT, source TEXT, error TEXT, url TEXT)")
+        self._insert = (f"INSERT OR REPLACE INTO {table} ({', '.join(COLUMNS)})"
+                        f" VALUES ({', '.join('?' for _ in COLUMNS)})")
+        self._committed_at = time.monotonic()
+
+    def write(self, row: Dict):
+        self._conn.execute(self._insert, [row.get(column) for column in COLUMNS])
+        if time.monotonic() - self._committed_at >= SQLITE_COMMIT_INTERVAL:
+            self._conn.commit()
+            self._committed_at = time.monotonic()
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
+
+
+def open_sink(path: str, fmt: Optional[str] = None) -> Sink:
+    """
+    Open the sink for an output path.
+
+    Args:
+        path (str): Output file, or "-" for standard output (CSV or JSON Lines only).
+        fmt (str): "csv", "jsonl" or "sqlite"; detected from the file extension by default
+                   (JSON Lines for "-" and unknown extensions).
+
+    Returns:
+        Sink: The opened sink.
+    """
+    if fmt is None:
+        fmt = FORMATS.get(os.path.splitext(path)[1].lower(), "jsonl")
+    if fmt == "csv":
+        return CsvSink(path)
+    if fmt == "jsonl":
+        return JsonlSink(path)
+    if fmt == "sqlite":
+        if path == "-":
+            raise ValueError("SQLite output needs a file path.")
+        return SqliteSink(path)
+    raise ValueError(f"Unknown output format {fmt!r}, expected csv, jsonl or sqlite.")
@@ -0,0 +1,278 @@
+import os
+import re
+import json
+import math
+import time
+import random
+import hashlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+from contacts import find_emails, find_phone_numbers
+from context import estimate_tokens
+
+
+# Recorded pages the stub search engine points to (override with STUB_CORPUS)
+STUB_CORPUS = os.environ.get("STUB_CORPUS", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                         "..", "benchmarks", "fixtures", "pages"))
+
+# API key sent to the stubs, so offline runs need no real credentials
+STUB_API_KEY = "stub-key"
+
+DOCUMENT_RE = re.compile(r"Document (\d+):\n\"\"\"\n(.*?)\n\"\"\"\nQuestion \d+: ([^\n]*)", re.DOTALL)
+
+
+class StubServer(ABC):
+    """
+    Local HTTP server standing in for a provider, with configurable latency, quota and errors.
+
+    Args:
+        latency (float): Seconds every response is delayed by.
+        jitter (float): Extra random delay, uniform between 0 and `jitter` seconds.
+        rpm (int): Requests accepted per sliding minute; more get a 429 with Retry-After (0: unlimited).
+        error_rate (float): Fraction of requests answered with a 503.
+        seed (int): Seed of the jitter and error draws, for repeatable runs.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, rpm: int = 0, error_rate: float = 0.0,
+                 seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rpm = rpm
+        self.error_rate = error_rate
+        self.stats = {"requests": 0, "rate_limited": 0, "errors": 0}
+        self._random = random.Random(seed)
+        self._recent = deque()
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self._thread = None
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                stub._serve(self, None)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                stub._serve(self, self.rfile.read(length))
+        return Handler
+
+    def _admit(self) -> Optional[tuple]:
+        # Returns (status, headers, body) for a rejected request, None to handle it
+        with self._lock:
+            self.stats["requests"] += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            failed = self.error_rate and self._random.random() < self.error_rate
+            if self.rpm:
+                now = time.monotonic()
+                while self._recent and now - self._recent[0] >= 60:
+                    self._recent.popleft()
+                if len(self._recent) >= self.rpm:
+                    self.stats["rate_limited"] += 1
+                    retry_after = max(1, math.ceil(60 - (now - self._recent[0])))
+                    body = {"error": {"message": "Rate limit reached.", "code": "rate_limit_exceeded"}}
+                    return 429, {"Retry-After": str(retry_after)}, body
+                self._recent.append(now)
+            if failed:
+                self.stats["errors"] += 1
+        if delay:
+            time.sleep(delay)
+        if failed:
+            return 503, {}, {"error": {"message": "Service unavailable.", "code": "unavailable"}}
+        return None
+
+    def _serve(self, handler: BaseHTTPRequestHandler, body: Optional[bytes]):
+        try:
+            admitted = self._admit() if self.metered(handler.path) else None
+            status, headers, payload = admitted or self.handle(handler.path, body)
+        except Exception as e:
+            logging.error(f"Stub {type(self).__name__} failed on {handler.path}: {e}")
+            status, headers, payload = 500, {}, {"error": {"message": str(e)}}
+        if isinstance(payload, (dict, list)):
+            content = json.dumps(payload).encode("utf-8")
+            headers = dict({"Content-Type": "application/json"}, **headers)
+        else:
+            content = payload
+        handler.send_response(status)
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.send_header("Content-Length", str(len(content)))
+        handler.end_headers()
+        handler.wfile.write(content)
+
+    def metered(self, path: str) -> bool:
+        """
+        Whether a request counts against the quota and gets the latency and errors.
+        """
+        return True
+
+    @abstractmethod
+    def handle(self, path: str, body: Optional[bytes]) -> tuple:
+        """
+        Answer an admitted request; returns (status, headers, JSON payload or bytes).
+        """
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True,
+                                        name=f"stub-{type(self).__name__}")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class StubBing(StubServer):
+    """
+    Stand-in for the Bing Web Search API that also serves the pages it returns.
+
+    Every query gets `results` links into the recorded corpus, under a path derived from
+    the query (so distinct entities never share cached pages), in an order that depends
+    on the query. `/corpus/<query id>/<page>` serves the recorded page.
+    """
+
+    def __init__(self, corpus: str = STUB_CORPUS, results: int = 3, **options):
+        super().__init__(**options)
+        self.corpus = corpus
+        self.pages = sorted(name for name in os.listdir(corpus) if name.endswith(".html"))
+        self.results = results
+        self._cache = {}
+
+    @property
+    def endpoint(self) -> str:
+        return self.base_url + "/v7.0/search"
+
+    def search(self, query: str) -> List[str]:
+        digest = hashlib.sha1(query.encode("utf-8")).hexdigest()
+        start = int(digest[:8], 16) % len(self.pages)
+        order = self.pages[start:] + self.pages[:start]
+        return [f"{self.base_url}/corpus/{digest[:12]}/{page}" for page in order[:self.results]]
+
+    def metered(self, path: str) -> bool:
+        # Only the search API is metered, the corpus pages are served as fast as possible
+        return path.startswith("/v7.0/")
+
+    def page(self, name: str) -> Optional[bytes]:
+        if name not in self.pages:
+            return None
+        if name not in self._cache:
+            with open(os.path.join(self.corpus, name), "rb") as f:
+                self._cache[name] = f.read()
+        return self._cache[name]
+
+    def handle(self, path: str, body: Optional[bytes]) -> tuple:
+        parsed = urlparse(path)
+        if parsed.path == "/v7.0/search":
+            params = parse_qs(parsed.query)
+            query = params.get("q", [""])[0]
+            urls = self.search(query)[:int(params.get("count", [len(self.pages)])[0])]
+            return 200, {}, {"webPages": {"value": [{"name": url.rsplit("/", 1)[-1], "url": url} for url in urls]}}
+        parts = parsed.path.strip("/").split("/")
+        content = self.page(parts[-1]) if len(parts) == 3 and parts[0] == "corpus" else None
+        if content is None:
+            return 404, {"Content-Type": "text/html"}, b"<html><body>Not found</body></html>"
+        return 200, {"Content-Type": "text/html; charset=utf-8"}, content
+
+
+class StubGroq(StubServer):
+    """
+    Stand-in for Groq's OpenAI-compatible chat completions endpoint.
+
+    Answers by reading the first email (or phone number, when the question asks for one)
+    out of the prompt's content, and reports token usage estimated like the real client does.
+    JSON-mode requests are answered per document, as the batched prompts expect.
+    """
+
+    @property
+    def endpoint(self) -> str:
+        return self.base_url
+
+    @staticmethod
+    def answer(content: str, question: str) -> str:
+        if re.search(r"phone|mobile|telephone|number", question, re.IGNORECASE):
+            found = find_phone_numbers(content)
+        else:
+            found = find_emails(content)
+        return sorted(found)[0] if found else "notfound"
+
+    def handle(self, path: str, body: Optional[bytes]) -> tuple:
+        if not urlparse(path).path.endswith("/chat/completions"):
+            return 404, {}, {"error": {"message": f"Unknown path {path}"}}
+        request = json.loads(body or b"{}")
+        messages = request.get("messages", [])
+        prompt = messages[-1]["content"] if messages else ""
+        if (request.get("response_format") or {}).get("type") == "json_object":
+            answers = [{"id": int(number), "answer": self.answer(text, question)}
+                       for number, text, question in DOCUMENT_RE.findall(prompt)]
+            content = json.dumps({"answers": answers})
+        else:
+            question = prompt.rsplit("Question:", 1)[-1]
+            content = self.answer(prompt, question)
+
+        prompt_tokens = sum(estimate_tokens(message.get("content", "")) for message in messages)
+        completion_tokens = estimate_tokens(content)
+        return 200, {}, {
+            "id": f"chatcmpl-stub-{self.stats['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                         "finish_reason": "stop", "logprobs": None}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+
+class StubProviders:
+    """
+    Run the stub Bing and Groq servers and point the application at them.
+
+    Used as a context manager: the search endpoint, the Groq base URL and the API keys of
+    settings.defaults (set to STUB_API_KEY meanwhile) are restored on exit.
+
+    Args:
+        bing (dict): StubBing options (latency, jitter, rpm, error_rate, corpus, results).
+        groq (dict): StubGroq options (latency, jitter, rpm, error_rate).
+    """
+
+    def __init__(self, bing: Optional[Dict] = None, groq: Optional[Dict] = None):
+        self.bing = StubBing(**(bing or {}))
+        self.groq = StubGroq(**(groq or {}))
+        self._saved = None
+
+    def __enter__(self) -> "StubProviders":
+        import search
+        import LLM_groq
+        from settings import defaults
+        self.bing.start()
+        self.groq.start()
+        self._saved = (search.BING_ENDPOINT, LLM_groq.GROQ_BASE_URL, defaults.bing_api_key, defaults.groq_api_key)
+        search.BING_ENDPOINT = self.bing.endpoint
+        LLM_groq.GROQ_BASE_URL = self.groq.endpoint
+        defaults.bing_api_key = defaults.groq_api_key = STUB_API_KEY
+        return self
+
+    def __exit__(self, *exc):
+        import search
+        import LLM_groq
+        from settings import defaults
+        search.BING_ENDPOINT, LLM_groq.GROQ_BASE_URL, defaults.bing_api_key, defaults.groq_api_key = self._saved
+        self.bing.stop()
+        self.groq.stop()
+
+    def stats(self) -> Dict:
+        return {"bing": dict(self.bing.stats), "groq": dict(self.groq.stats)}
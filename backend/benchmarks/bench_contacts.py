@@ -0,0 +1,109 @@
+"""
+Microbenchmark of the contact extractors (emails and phone numbers).
+
+Compares the previous per-call re.findall patterns with the precompiled patterns of
+app/contacts.py over the fixture pages and a few adversarial inputs that make the old
+patterns backtrack. The new extractors are first checked against the PARITY cases, the
+shapes the old patterns found (or rightly missed); the benchmark stops if one differs.
+
+Usage (from the backend directory):
+    python benchmarks/bench_contacts.py [--repeat 5]
+"""
+import os
+import re
+import sys
+import time
+import glob
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from contacts import find_emails, find_phone_numbers  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "pages")
+
+# (text, expected emails, expected phone numbers)
+PARITY = [
+    ("Write to sales@fabrikam-robotics.example", ["sales@fabrikam-robotics.example"], []),
+    ("info [at] example [dot] com", ["info@example.com"], []),
+    ("Tel: +49 89 5551 2300", [], ["+498955512300"]),
+    ("Call (555) 123-4567 today", [], ["5551234567"]),
+    ("Phone 555-1234", [], ["5551234"]),
+    ("Phone 555-1234, fax 555-9876.", [], ["5551234", "5559876"]),
+    ("Published 2024-01-15, covering 2019-2024", [], []),
+    ("SKU 372808-58 at 19.99", [], []),
+    ("logo@2x.png", [], []),
+]
+
+
+def legacy_emails(text):
+    return list(set(re.findall(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', text)))
+
+
+def legacy_phones(text):
+    return list(set(re.findall(r'\b(?:\+?(\d{1,3})[-.\s]?)?(?:\(?\d{1,4}\)?[-.\s]?)?\d{1,4}[-.\s]?\d{1,4}[-.\s]?\d{1,9}\b', text)))
+
+
+def load_inputs():
+    inputs = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            inputs.append((os.path.basename(path), f.read()))
+    # Long dotted identifiers (minified bundles, base64 blobs) backtrack in the old email pattern
+    inputs.append(("adversarial_dotted", "a.b" * 20000))
+    inputs.append(("adversarial_digits", ("1234 " * 20000) + "x"))
+    return inputs
+
+
+def check_parity() -> bool:
+    ok = True
+    for text, emails, phones in PARITY:
+        found = (find_emails(text), find_phone_numbers(text, default_country_code=""))
+        if found != (emails, phones):
+            print(f"Parity mismatch for {text!r}: expected {(emails, phones)}, found {found}", file=sys.stderr)
+            ok = False
+    return ok
+
+
+def measure(func, text, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(text)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="runs per input, the best time is reported")
+    args = parser.parse_args()
+
+    if not check_parity():
+        sys.exit(1)
+
+    header = f"{'input':<26}{'KB':>8}{'old ms':>10}{'new ms':>10}{'speedup':>9}{'old MB/s':>10}{'new MB/s':>10}  old/new matches"
+    print(header)
+    print("-" * len(header))
+    total_old = total_new = total_bytes = 0.0
+    for name, text in load_inputs():
+        size = len(text.encode("utf-8"))
+        old_emails_t, old_emails = measure(legacy_emails, text, args.repeat)
+        old_phones_t, old_phones = measure(legacy_phones, text, args.repeat)
+        new_emails_t, new_emails = measure(find_emails, text, args.repeat)
+        new_phones_t, new_phones = measure(find_phone_numbers, text, args.repeat)
+        old_t = old_emails_t + old_phones_t
+        new_t = new_emails_t + new_phones_t
+        total_old += old_t
+        total_new += new_t
+        total_bytes += size
+        print(f"{name:<26}{size / 1024:>8.0f}{old_t * 1000:>10.1f}{new_t * 1000:>10.1f}{old_t / new_t:>8.1f}x"
+              f"{size / old_t / 1e6:>10.1f}{size / new_t / 1e6:>10.1f}"
+              f"  {len(old_emails) + len(old_phones)}/{len(new_emails) + len(new_phones)}")
+    print("-" * len(header))
+    print(f"{'total':<26}{total_bytes / 1024:>8.0f}{total_old * 1000:>10.1f}{total_new * 1000:>10.1f}"
+          f"{total_old / total_new:>8.1f}x{total_bytes / total_old / 1e6:>10.1f}{total_bytes / total_new / 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Before/after benchmark of the boilerplate-stripping pre-stage of page extraction.
+
+Runs app/extraction.extract_page over the fixture pages with PAGE_REDUCTION_ENABLED off
+(email and phone patterns over the raw markup, every matching div as an address candidate)
+and on (patterns over the reduced text, innermost blocks, JSON-LD and mailto:/tel: links),
+then formats each record for the LLM as LLM_groq.format_scraped_data does.
+
+Reports per page the extraction time, the characters the patterns scan, the address
+candidates kept (count and characters), the emails and phone numbers found and the
+estimated tokens of the LLM context.
+
+Usage (from the backend directory):
+    python benchmarks/bench_extraction.py [--repeat 5] [--query "What is the address of company"]
+"""
+import os
+import sys
+import time
+import glob
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+import extraction  # noqa: E402
+from context import build_context  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def load_pages():
+    pages = []
+    for pattern in ("pages/*.html", "site/*.html"):
+        for path in sorted(glob.glob(os.path.join(FIXTURES, pattern))):
+            with open(path, "rb") as f:
+                pages.append((os.path.relpath(path, FIXTURES), f.read()))
+    return pages
+
+
+def pair(old, new) -> str:
+    return f"{old:.0f}/{new:.0f}"
+
+
+def measure(content, reduce, query, repeat):
+    """
+    Best extraction and formatting time of `repeat` runs, with the last run's outputs.
+    """
+    extraction.PAGE_REDUCTION_ENABLED = reduce
+    best_extract = best_format = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        record, _ = extraction.extract_page(content, "https://www.example.com/")
+        middle = time.perf_counter()
+        _, report = build_context(record, query=query)
+        best_extract = min(best_extract, middle - start)
+        best_format = min(best_format, time.perf_counter() - middle)
+
+    if reduce:
+        page_info = extraction.walk_document(extraction.parse_html(str(content, "utf-8")), reduce=True)
+        scanned = len(page_info["text"])
+    else:
+        scanned = len(str(content, "utf-8"))
+    return {
+        "extract": best_extract,
+        "format": best_format,
+        "scanned": scanned,
+        "addresses": len(record.addresses),
+        "address_chars": sum(len(address) for address in record.addresses),
+        "contacts": len(record.emails) + len(record.phone_numbers),
+        "tokens": report["tokens"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="runs per page, the best time is reported")
+    parser.add_argument("--query", default="What is the address of company", help="query used to build the context")
+    args = parser.parse_args()
+
+    header = (f"{'page':<32}{'KB':>6}{'old ms':>9}{'new ms':>9}{'speedup':>9}{'scan KB':>13}"
+              f"{'addresses':>13}{'addr chars':>14}{'contacts':>10}{'tokens':>11}")
+    print(header)
+    print("-" * len(header))
+    totals = {"old": 0.0, "new": 0.0, "bytes": 0, "old_scan": 0, "new_scan": 0, "old_chars": 0, "new_chars": 0}
+    for name, content in load_pages():
+        old = measure(content, False, args.query, args.repeat)
+        new = measure(content, True, args.query, args.repeat)
+        old_time = old["extract"] + old["format"]
+        new_time = new["extract"] + new["format"]
+        totals["old"] += old_time
+        totals["new"] += new_time
+        totals["bytes"] += len(content)
+        totals["old_scan"] += old["scanned"]
+        totals["new_scan"] += new["scanned"]
+        totals["old_chars"] += old["address_chars"]
+        totals["new_chars"] += new["address_chars"]
+        print(f"{name:<32}{len(content) / 1024:>6.0f}{old_time * 1000:>9.1f}{new_time * 1000:>9.1f}"
+              f"{old_time / new_time:>8.1f}x{pair(old['scanned'] / 1024, new['scanned'] / 1024):>13}"
+              f"{pair(old['addresses'], new['addresses']):>13}{pair(old['address_chars'], new['address_chars']):>14}"
+              f"{pair(old['contacts'], new['contacts']):>10}{pair(old['tokens'], new['tokens']):>11}")
+    print("-" * len(header))
+    print(f"{'total':<32}{totals['bytes'] / 1024:>6.0f}{totals['old'] * 1000:>9.1f}{totals['new'] * 1000:>9.1f}"
+          f"{totals['old'] / totals['new']:>8.1f}x{pair(totals['old_scan'] / 1024, totals['new_scan'] / 1024):>13}"
+          f"{'':>13}{pair(totals['old_chars'], totals['new_chars']):>14}")
+    print("\nold = raw page (PAGE_REDUCTION_ENABLED=0), new = reduced page; pairs are old/new.")
+
+
+if __name__ == "__main__":
+    main()
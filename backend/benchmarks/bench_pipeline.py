@@ -0,0 +1,258 @@
+"""
+End-to-end benchmark of /api/process, fully offline.
+
+Bing and Groq are replaced by the local stubs of app/stubs.py (with configurable latency,
+rate limits and errors) and search results point to the recorded pages in fixtures/pages.
+Each scenario runs in a fresh subprocess and reports entities/second, p50/p99 latency of
+every pipeline stage (search, fetch, parse, format, llm) and the peak memory (max RSS).
+
+Scenarios:
+    single  one entity per request, `--repeat` requests
+    batch   one request with `--entities` entities
+
+With --history FILE the results are compared with the last run of the same configuration
+in that JSON Lines file and appended to it together with the git commit, so regressions
+show up between commits. Nothing is written without it.
+
+Usage (from the backend directory):
+    python benchmarks/bench_pipeline.py [--entities 200] [--workers 8] [--groq-latency 0.2]
+    python benchmarks/bench_pipeline.py --history /tmp/bench.jsonl --fail-on-regression 0.2   # exit 1 if 20% slower
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+from collections import Counter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(HERE, "..", "app")
+SCENARIOS = ("single", "batch")
+
+
+def configure_environment(args, workdir: str):
+    # Measure the work itself: no cache, no entity or site index, no checkpoints, no crawl delay, quotas matching the stubs
+    os.environ.update({
+        "CACHE_ENABLED": "0",
+        "CHECKPOINT_ENABLED": "0",
+        "ENTITY_INDEX_ENABLED": "0",
+        "LOCAL_SEARCH_ENABLED": "0",
+        "FETCH_CRAWL_DELAY": "0",
+        "FETCH_PER_HOST_LIMIT": str(max(64, args.workers * 4)),
+        "PARSE_WORKERS": str(args.parse_workers),
+        "GROQ_RPM": str(args.groq_rpm),
+        "GROQ_TPM": "0",
+        "BING_RPM": str(args.bing_rpm),
+        "UPLOAD_FOLDER": os.path.join(workdir, "uploads"),
+        "PROFILE_DIR": os.path.join(workdir, "profiles"),
+    })
+    sys.path.insert(0, APP)
+
+
+def run_scenario(args) -> dict:
+    """
+    Run one scenario in this process and return its measurements.
+    """
+    import resource
+    import logging
+    import tempfile
+
+    workdir = tempfile.mkdtemp(prefix="bench-pipeline-")
+    configure_environment(args, workdir)
+    logging.disable(logging.WARNING)
+
+    from metrics import metrics
+    from stubs import StubProviders
+    import file_processing
+
+    client = file_processing.create_app().test_client()
+    stub_options = {
+        "bing": {"latency": args.bing_latency, "jitter": args.jitter, "rpm": args.bing_rpm,
+                 "error_rate": args.error_rate},
+        "groq": {"latency": args.groq_latency, "jitter": args.jitter, "rpm": args.groq_rpm,
+                 "error_rate": args.error_rate},
+    }
+
+    def post(entities):
+        body = "entity\n" + "\n".join(entities) + "\n"
+        response = client.post("/api/process", data={
+            "file": (io.BytesIO(body.encode("utf-8")), "entities.csv"),
+            "query": args.query,
+            "column": "entity",
+            "max_workers": str(args.workers),
+            "llm_batch_size": str(args.llm_batch_size),
+            "no_checkpoint": "1",
+        }, content_type="multipart/form-data")
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/process returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        return response.get_json()["results"]
+
+    with StubProviders(**stub_options) as stubs:
+        # Warm up imports, parsers and connection pools outside the measurement
+        post(["Warmup Company"])
+        metrics.reset()
+        metrics.keep_samples()
+
+        statuses = Counter()
+        started = time.perf_counter()
+        if args.scenario == "single":
+            count = args.repeat
+            for number in range(count):
+                statuses.update(result["status"] for result in post([f"Single Company {number}"]))
+        else:
+            count = args.entities
+            statuses.update(result["status"] for result in post([f"Batch Company {number}" for number in range(count)]))
+        elapsed = time.perf_counter() - started
+        stub_stats = stubs.stats()
+
+    stages = metrics.percentiles("stage_duration_seconds")
+    return {
+        "entities": count,
+        "seconds": round(elapsed, 3),
+        "entities_per_second": round(count / elapsed, 2) if elapsed else None,
+        "stages": {stage: {"count": values["count"], "p50_ms": round(values["p50"] * 1000, 2),
+                           "p99_ms": round(values["p99"] * 1000, 2)} for stage, values in stages.items()},
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                             / (1024 * 1024 if sys.platform == "darwin" else 1024), 1),
+        "statuses": dict(statuses),
+        "stubs": stub_stats,
+    }
+
+
+def git_commit() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=HERE,
+                                    capture_output=True, text=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": "unknown", "dirty": None}
+
+
+def scenario_config(args) -> dict:
+    return {name: getattr(args, name) for name in ("entities", "repeat", "workers", "parse_workers", "llm_batch_size", "query",
+                                                    "bing_latency", "groq_latency", "jitter", "bing_rpm",
+                                                    "groq_rpm", "error_rate")}
+
+
+def load_previous(path: str, config: dict):
+    """
+    The last entry of the history file run with the same configuration, or None.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    previous = None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get("config") == config:
+                previous = entry
+    return previous
+
+
+def save_entry(path: str, config: dict, **results):
+    """
+    Append the results to the history file, with the git commit and the Python version.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    entry = dict(git_commit(), timestamp=time.strftime("%Y-%m-%dT%H:%M:%S"), python=platform.python_version(),
+                 config=config, **results)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+    print(f"\nResults appended to {path}")
+
+
+def change(new, old) -> str:
+    if not old or new is None:
+        return ""
+    return f" ({(new - old) / old:+.0%})"
+
+
+def report(results: dict, previous) -> list:
+    """
+    Print the results next to the previous run and return the regressions found.
+    """
+    regressions = []
+    for name, result in results.items():
+        old = (previous or {}).get("scenarios", {}).get(name, {})
+        print(f"\n{name}: {result['entities']} entities in {result['seconds']}s, "
+              f"{result['entities_per_second']} entities/s{change(result['entities_per_second'], old.get('entities_per_second'))}, "
+              f"peak RSS {result['peak_rss_mb']} MB{change(result['peak_rss_mb'], old.get('peak_rss_mb'))}, "
+              f"statuses {result['statuses']}")
+        header = f"  {'stage':<10}{'count':>7}{'p50 ms':>10}{'':>9}{'p99 ms':>10}{'':>9}"
+        print(header)
+        for stage, values in result["stages"].items():
+            before = old.get("stages", {}).get(stage, {})
+            print(f"  {stage:<10}{values['count']:>7}{values['p50_ms']:>10.1f}{change(values['p50_ms'], before.get('p50_ms')):>9}"
+                  f"{values['p99_ms']:>10.1f}{change(values['p99_ms'], before.get('p99_ms')):>9}")
+        if old.get("entities_per_second"):
+            regressions.append((name, result["entities_per_second"], old["entities_per_second"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=SCENARIOS, action="append", help="scenarios to run (default: all)")
+    parser.add_argument("--entities", type=int, default=200, help="entities of the batch scenario")
+    parser.add_argument("--repeat", type=int, default=20, help="requests of the single scenario")
+    parser.add_argument("--workers", type=int, default=8, help="max_workers of each request")
+    parser.add_argument("--parse-workers", default="0", help="PARSE_WORKERS of the app (0, a count or auto)")
+    parser.add_argument("--llm-batch-size", type=int, default=1, help="llm_batch_size of each request")
+    parser.add_argument("--query", default="What is the email of the company")
+    parser.add_argument("--bing-latency", type=float, default=0.05, help="seconds per stub search")
+    parser.add_argument("--groq-latency", type=float, default=0.2, help="seconds per stub completion")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency of both stubs")
+    parser.add_argument("--bing-rpm", type=int, default=0, help="stub and client search quota (0: none)")
+    parser.add_argument("--groq-rpm", type=int, default=0, help="stub and client completion quota (0: none)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub calls failing with 503")
+    parser.add_argument("--history", metavar="FILE", help="JSON Lines file to compare with and append the results to")
+    parser.add_argument("--no-save", action="store_true", help="compare with --history without appending to it")
+    parser.add_argument("--fail-on-regression", type=float, default=None, metavar="FRACTION",
+                        help="exit with status 1 if throughput dropped by more than this fraction")
+    parser.add_argument("--run-scenario", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scenario:
+        args.scenario = args.run_scenario
+        print(json.dumps(run_scenario(args)))
+        return
+
+    results = {}
+    for name in args.scenario or SCENARIOS:
+        # A fresh interpreter per scenario keeps the peak memory of one from hiding the other's
+        command = [sys.executable, os.path.abspath(__file__), "--run-scenario", name] + sys.argv[1:]
+        process = subprocess.run(command, capture_output=True, text=True)
+        if process.returncode != 0:
+            print(process.stderr, file=sys.stderr)
+            sys.exit(f"Scenario {name} failed.")
+        results[name] = json.loads(process.stdout.strip().splitlines()[-1])
+
+    config = scenario_config(args)
+    previous = load_previous(args.history, config)
+    if previous:
+        print(f"Compared with {previous['commit']} ({previous['timestamp']})")
+    regressions = report(results, previous)
+
+    if args.history and not args.no_save:
+        save_entry(args.history, config, scenarios=results)
+
+    if args.fail_on_regression is not None:
+        slower = [(name, new, old) for name, new, old in regressions if new < old * (1 - args.fail_on_regression)]
+        for name, new, old in slower:
+            print(f"Regression in {name}: {new} entities/s, was {old}", file=sys.stderr)
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Cold-start benchmark of the web service, the CLI and a parse worker.
+
+Each target is started `--repeat` times in a fresh interpreter; the time spent importing
+and building it (excluding the interpreter's own startup) and the whole process wall time
+are reported as median / min, next to the last run of the same configuration.
+
+Targets:
+    service  import file_processing and build the app with create_app()
+    cli      import the main.py CLI
+    worker   import what a spawned parse worker loads (extraction.extract_page)
+
+`--importtime` also lists the slowest modules of each target (python -X importtime).
+With --history FILE the results are compared with and appended to that JSON Lines file.
+
+Usage (from the backend directory):
+    python benchmarks/bench_startup.py [--repeat 10] [--importtime 10] [--history /tmp/startup.jsonl]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+from bench_pipeline import APP, change, load_previous, save_entry
+
+TARGETS = {
+    "service": "import file_processing; file_processing.create_app()",
+    "cli": "import main",
+    "worker": "from extraction import extract_page",
+}
+
+# Runs the target and prints how long the imports took, in seconds
+PROBE = "import time; started = time.perf_counter(); {code}; print(time.perf_counter() - started)"
+
+
+def run_target(code: str, workdir: str) -> tuple:
+    """
+    Start one fresh interpreter on the target and return (import seconds, process seconds).
+    """
+    env = dict(os.environ, UPLOAD_FOLDER=os.path.join(workdir, "uploads"), LOG_LEVEL="WARNING")
+    started = time.perf_counter()
+    process = subprocess.run([sys.executable, "-c", PROBE.format(code=code)], cwd=APP, env=env,
+                             capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if process.returncode != 0:
+        sys.exit(f"Target failed:\n{process.stderr}")
+    return float(process.stdout.strip().splitlines()[-1]), elapsed
+
+
+def slowest_imports(code: str, workdir: str, count: int) -> list:
+    """
+    Return the `count` top-level imports of the target with the largest cumulative time.
+    """
+    env = dict(os.environ, UPLOAD_FOLDER=os.path.join(workdir, "uploads"), LOG_LEVEL="WARNING")
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=APP, env=env,
+                             capture_output=True, text=True)
+    modules = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Only the modules the target imports and their direct imports (nesting is shown by indentation)
+        if len(name) - len(name.lstrip()) <= 3:
+            modules.append((name.strip(), int(cumulative) / 1000))
+    return sorted(modules, key=lambda module: -module[1])[:count]
+
+
+def main():
+    import tempfile
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=TARGETS, action="append", help="targets to start (default: all)")
+    parser.add_argument("--repeat", type=int, default=10, help="fresh interpreters per target")
+    parser.add_argument("--importtime", type=int, default=0, metavar="N", help="list the N slowest imports")
+    parser.add_argument("--history", metavar="FILE", help="JSON Lines file to compare with and append the results to")
+    parser.add_argument("--no-save", action="store_true", help="compare with --history without appending to it")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-startup-")
+    config = {"repeat": args.repeat}
+    previous = load_previous(args.history, config)
+    if previous:
+        print(f"Compared with {previous['commit']} ({previous['timestamp']})")
+
+    results = {}
+    print(f"{'target':<10}{'import ms':>11}{'':>9}{'min ms':>9}{'process ms':>12}{'':>9}")
+    for name in args.target or TARGETS:
+        runs = [run_target(TARGETS[name], workdir) for _ in range(args.repeat)]
+        imports = [run[0] * 1000 for run in runs]
+        processes = [run[1] * 1000 for run in runs]
+        result = results[name] = {
+            "import_ms": round(statistics.median(imports), 1),
+            "import_min_ms": round(min(imports), 1),
+            "process_ms": round(statistics.median(processes), 1),
+        }
+        old = (previous or {}).get("targets", {}).get(name, {})
+        print(f"{name:<10}{result['import_ms']:>11.1f}{change(result['import_ms'], old.get('import_ms')):>9}"
+              f"{result['import_min_ms']:>9.1f}{result['process_ms']:>12.1f}"
+              f"{change(result['process_ms'], old.get('process_ms')):>9}")
+        for module, milliseconds in slowest_imports(TARGETS[name], workdir, args.importtime) if args.importtime else ():
+            print(f"    {module:<40}{milliseconds:>8.1f} ms")
+
+    if args.history and not args.no_save:
+        save_entry(args.history, config, targets=results)
+
+
+if __name__ == "__main__":
+    main()
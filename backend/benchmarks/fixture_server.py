@@ -0,0 +1,75 @@
+"""
+Local HTTP server for the recorded fixtures, so crawling and scraping can run offline.
+
+Serves a directory (by default fixtures/site) on 127.0.0.1. `{base}` in .txt and .xml
+files (robots.txt, sitemap.xml) is replaced by the server's own base URL.
+
+Usage (from the backend directory):
+    python benchmarks/fixture_server.py [--port 8765] [--directory benchmarks/fixtures/site]
+
+Or from Python:
+    with FixtureServer() as base_url:
+        crawl_site(base_url + "/")
+"""
+import os
+import argparse
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+SITE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "site")
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if os.path.isfile(path) and path.endswith((".txt", ".xml")):
+            with open(path, encoding="utf-8") as f:
+                body = f.read().replace("{base}", self.server.base_url).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain" if path.endswith(".txt") else "application/xml")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return None
+        return super().send_head()
+
+
+class FixtureServer:
+    """
+    Serves a fixture directory in a background thread; use as a context manager yielding the base URL.
+    """
+
+    def __init__(self, directory: str = SITE, port: int = 0):
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), partial(FixtureHandler, directory=directory))
+        self.server.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return self.server.base_url
+
+    def __enter__(self) -> str:
+        self.thread.start()
+        return self.base_url
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--directory", default=SITE)
+    args = parser.parse_args()
+    server = FixtureServer(args.directory, args.port)
+    print(f"Serving {args.directory} at {server.base_url}")
+    server.server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The application modules and the fixture server are imported by their flat module names
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND, "app"))
+sys.path.insert(0, os.path.join(BACKEND, "benchmarks"))
@@ -0,0 +1,51 @@
+"""
+Crawls the recorded fixture site (benchmarks/fixtures/site) served by the local fixture server.
+"""
+import threading
+
+import pytest
+
+from fixture_server import FixtureServer
+import crawl
+from fetch import fetcher
+
+
+@pytest.fixture
+def site(monkeypatch):
+    # No politeness delay against the local server
+    monkeypatch.setattr(fetcher, "crawl_delay", 0.0)
+    with FixtureServer() as base_url:
+        yield base_url
+
+
+def test_crawl_follows_contact_pages_and_honors_robots(site):
+    record = crawl.crawl_site(site + "/", use_cache=False, max_pages=4, max_depth=1)
+
+    assert record.pages[0] == site + "/"
+    assert set(record.pages) == {site + "/", site + "/contact.html", site + "/impressum.html", site + "/about/"}
+    assert "sales@fabrikam-robotics.example" in record.emails
+    # Disallowed by robots.txt, off-site in the sitemap, or without a contact cue
+    assert not any("/private/" in page or "other.example" in page or "/blog/" in page for page in record.pages)
+
+
+def test_deeper_links_resolve_against_their_own_page(site):
+    # about/index.html links to the relative "offices.html", which is /about/offices.html
+    record = crawl.crawl_site(site + "/", use_cache=False, max_pages=6, max_depth=2)
+
+    assert site + "/about/offices.html" in record.pages
+    assert site + "/offices.html" not in record.pages
+    assert "+494055527100" in record.phone_numbers
+
+
+def test_crawl_stops_when_the_budget_is_spent(site):
+    record = crawl.crawl_site(site + "/", use_cache=False, max_pages=2, max_depth=2)
+
+    assert len(record.pages) == 2
+
+
+def test_cancelled_crawl_stops_after_the_current_page(site):
+    cancel = threading.Event()
+    cancel.set()
+    record = crawl.crawl_site(site + "/", use_cache=False, max_pages=4, max_depth=1, cancel=cancel)
+
+    assert record.pages == [site + "/"]
@@ -0,0 +1,18 @@
+"""
+Reads input files through app/ingest.py.
+"""
+import pytest
+
+import ingest
+
+
+def test_parse_error_in_a_later_chunk_raises_ingest_error(tmp_path):
+    path = tmp_path / "entities.csv"
+    # The header and first chunk are fine, the last row opens a quote it never closes
+    path.write_text('company\nAcme\nGlobex\nInitech\n"Umbrella\n')
+
+    entities = ingest.iter_entities(str(path), chunksize=2)
+
+    assert next(entities) == "Acme"
+    with pytest.raises(ingest.IngestError):
+        list(entities)
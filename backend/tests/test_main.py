@@ -0,0 +1,43 @@
+"""
+Runs the batch CLI (app/main.py) offline against the stub providers.
+"""
+import json
+
+import pytest
+
+import main
+from cache import response_cache
+from checkpoints import checkpoint_store
+from entity_index import entity_index
+from fetch import fetcher
+from search import local_search
+from settings import defaults
+
+
+@pytest.fixture
+def no_credentials(monkeypatch):
+    # As in a checkout without config.py or key variables
+    monkeypatch.delenv("GROQ_API_KEY", raising=False)
+    monkeypatch.delenv("BING_API_KEY", raising=False)
+    monkeypatch.setattr(defaults, "groq_api_key", None)
+    monkeypatch.setattr(defaults, "bing_api_key", None)
+    # All stub pages are served from one local host; no politeness delay between them
+    monkeypatch.setattr(fetcher, "crawl_delay", 0.0)
+    # --dry-run switches the stores off for the process; put them back afterwards
+    for store in (response_cache, entity_index, local_search, checkpoint_store):
+        monkeypatch.setattr(store, "enabled", store.enabled)
+
+
+def test_dry_run_needs_no_api_keys(no_credentials, tmp_path):
+    source = tmp_path / "companies.csv"
+    source.write_text("entity\nAcme Industries\nContoso Energy\nFabrikam Retail\nNorthwind Traders\n")
+    output = tmp_path / "results.jsonl"
+
+    status = main.main([str(source), "-q", "What is email of company", "--dry-run", "--no-progress",
+                        "-o", str(output)])
+
+    assert status == 0
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert len(rows) == 4
+    assert all(row["error"] is None for row in rows), rows
+    assert defaults.groq_api_key is None and defaults.bing_api_key is None